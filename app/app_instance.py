@@ -1,4 +1,5 @@
 from fastapi import FastAPI
+from app.responses import JSONResponse
+from app.startup import lifespan
 
-app = FastAPI()
-
+app = FastAPI(default_response_class=JSONResponse, lifespan=lifespan)
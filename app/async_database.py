@@ -0,0 +1,169 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from app.config import DB_EXECUTOR_THREADS
+from app.connection_pool import ConnectionPool, PoolTimeoutError
+
+# Every blocking SQLite call runs on this dedicated executor, so async handlers never block the event loop
+# and database work no longer competes with everything else for AnyIO's default threadpool
+_executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_THREADS, thread_name_prefix="db")
+
+
+# The caller's context is carried over to the executor thread, so the database layer knows which request it serves
+async def run_in_db_executor(function, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_executor, functools.partial(context.run, function, *args, **kwargs))
+
+
+def _deliver(pool: ConnectionPool, future: asyncio.Future, connection):
+    if future.done():
+        # The borrower timed out or went away while the connection was being handed over
+        pool.release(connection)
+    else:
+        future.set_result(connection)
+
+
+async def acquire_connection(pool: ConnectionPool):
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def hand_off(connection):
+        try:
+            loop.call_soon_threadsafe(_deliver, pool, future, connection)
+        except RuntimeError:
+            pool.release(connection)
+
+    # An exhausted pool parks the request on a future instead of an executor thread, so borrowers
+    # waiting for a connection cannot starve the requests that hold one
+    connection = await run_in_db_executor(pool.acquire_or_wait, hand_off)
+    if connection is not None:
+        return connection
+    try:
+        return await asyncio.wait_for(future, pool.timeout)
+    except asyncio.TimeoutError:
+        pool.cancel_wait(hand_off)
+        raise PoolTimeoutError(f"No database connection available after {pool.timeout} seconds")
+
+
+async def release_connection(pool: ConnectionPool, connection, commit: bool = True):
+    def finish():
+        try:
+            if commit:
+                connection.commit()
+        finally:
+            pool.release(connection)
+
+    await run_in_db_executor(finish)
+
+
+# Rows as dicts keyed by the query's column aliases, zipped in one pass so handlers can hand them
+# straight to the JSON encoder instead of rebuilding each row by position
+def rows_as_dicts(description, rows) -> list:
+    fields = [column[0] for column in description]
+    return [dict(zip(fields, row)) for row in rows]
+
+
+class AsyncCursor:
+    # Awaitable counterpart of sqlite3.Cursor; each call is a hop to the database executor. `replica` marks a
+    # cursor on a read replica, whose rows may trail the primary.
+    def __init__(self, cursor, replica: bool = False):
+        self._cursor = cursor
+        self.replica = replica
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    # "sqlite" or "postgres", for the few queries that have to be spelled differently per backend
+    @property
+    def dialect(self) -> str:
+        return getattr(self._cursor.connection, "dialect", "sqlite")
+
+    async def execute(self, sql: str, parameters=()):
+        await run_in_db_executor(self._cursor.execute, sql, parameters)
+        return self
+
+    async def executemany(self, sql: str, seq_of_parameters):
+        await run_in_db_executor(self._cursor.executemany, sql, seq_of_parameters)
+        return self
+
+    async def fetchone(self):
+        return await run_in_db_executor(self._cursor.fetchone)
+
+    async def fetchmany(self, size: int):
+        return await run_in_db_executor(self._cursor.fetchmany, size)
+
+    async def fetchall(self):
+        return await run_in_db_executor(self._cursor.fetchall)
+
+    async def fetchone_dict(self):
+        row = await run_in_db_executor(self._cursor.fetchone)
+        return None if row is None else rows_as_dicts(self._cursor.description, [row])[0]
+
+    # Rows are fetched before the description is read: a PostgreSQL server-side cursor has none until then
+    def _fetch_dicts(self, fetch, *args) -> list:
+        rows = fetch(*args)
+        return rows_as_dicts(self._cursor.description, rows) if rows else []
+
+    async def fetchmany_dicts(self, size: int):
+        return await run_in_db_executor(self._fetch_dicts, self._cursor.fetchmany, size)
+
+    async def fetchall_dicts(self):
+        return await run_in_db_executor(self._fetch_dicts, self._cursor.fetchall)
+
+    async def commit(self):
+        await run_in_db_executor(self._cursor.connection.commit)
+
+    # Runs `function(cursor, *args)` in a single executor hop, for work that issues several statements
+    async def run(self, function, *args):
+        return await run_in_db_executor(function, self._cursor, *args)
+
+    async def close(self):
+        await run_in_db_executor(self._cursor.close)
+
+
+class LazyAsyncCursor(AsyncCursor):
+    # Borrows its connection from `pool` on the first statement, so a request answered from a cache (a cached
+    # entity or a 304 for it) never takes a pool slot. `dialect` is known up front, before any connection exists.
+    def __init__(self, pool: ConnectionPool, replica: bool = False, dialect: str = "sqlite"):
+        super().__init__(None, replica)
+        self._pool = pool
+        self._connection = None
+        self._dialect = dialect
+
+    @property
+    def dialect(self) -> str:
+        return self._dialect
+
+    async def _open(self):
+        if self._connection is None:
+            self._connection = await acquire_connection(self._pool)
+            self._cursor = self._connection.cursor()
+
+    async def execute(self, sql: str, parameters=()):
+        await self._open()
+        return await super().execute(sql, parameters)
+
+    async def executemany(self, sql: str, seq_of_parameters):
+        await self._open()
+        return await super().executemany(sql, seq_of_parameters)
+
+    async def run(self, function, *args):
+        await self._open()
+        return await super().run(function, *args)
+
+    # Returns the connection, if one was borrowed; read cursors never have anything to commit
+    async def release(self):
+        if self._connection is not None:
+            connection, self._connection, self._cursor = self._connection, None, None
+            await release_connection(self._pool, connection, commit=False)
@@ -0,0 +1,74 @@
+import threading
+import time
+from collections import OrderedDict
+from app.config import ENTITY_CACHE_MAX_ENTRIES, ENTITY_CACHE_TTL
+
+
+class EntityCache:
+    # In-process LRU cache of single-entity GET payloads keyed by (entity type, id), with a TTL as a backstop.
+    # Write handlers invalidate the exact keys they touched once their transaction has committed.
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped on every invalidation; a read that started before a write must not cache what it read
+        self._generation = 0
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, kind: str, entity_id: int):
+        key = (kind, entity_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._counters["misses"] += 1
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self._counters["expirations"] += 1
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            return value
+
+    def set(self, kind: str, entity_id: int, value, generation: int):
+        if not self.enabled:
+            return
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[(kind, entity_id)] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end((kind, entity_id))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def invalidate(self, kind: str, *entity_ids: int):
+        with self._lock:
+            self._generation += 1
+            for entity_id in entity_ids:
+                if self._entries.pop((kind, entity_id), None) is not None:
+                    self._counters["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "max_entries": self.max_entries, "ttl": self.ttl,
+                    **self._counters}
+
+
+entity_cache = EntityCache(ENTITY_CACHE_MAX_ENTRIES, ENTITY_CACHE_TTL)
@@ -0,0 +1,65 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from fastapi import Request, status
+from fastapi.responses import Response
+
+
+def make_etag(*parts) -> str:
+    return '"' + "-".join(str(part) for part in parts) + '"'
+
+
+# Different pages, filters or formats of one collection are different representations, so they get their own ETag
+def query_fingerprint(request: Request) -> str:
+    accept = request.headers.get("accept", "")
+    return hashlib.blake2s(f"{request.url.query}|{accept}".encode(), digest_size=4).hexdigest()
+
+
+def parse_timestamp(value: str):
+    if not value:
+        return None
+    return datetime.strptime(value, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
+
+
+def latest(*timestamps):
+    parsed = [timestamp for timestamp in map(parse_timestamp, timestamps) if timestamp is not None]
+    return max(parsed) if parsed else None
+
+
+def validator_headers(etag: str, last_modified: datetime = None) -> dict:
+    headers = {"ETag": etag}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+    return headers
+
+
+def is_not_modified(request: Request, etag: str, last_modified: datetime = None) -> bool:
+    # If-None-Match takes precedence over If-Modified-Since and uses the weak comparison
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        candidates = [candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")]
+        return "*" in candidates or etag in candidates
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            return last_modified <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def not_modified_response(etag: str, last_modified: datetime = None) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=validator_headers(etag, last_modified))
+
+
+def collection_version_query(count: int) -> str:
+    placeholders = ", ".join("?" for _ in range(count))
+    return f"SELECT name, revision, updated_at FROM collection_versions WHERE name IN ({placeholders})"
+
+
+async def collection_version(db, *names: str):
+    await db.execute(collection_version_query(len(names)), names)
+    versions = {name: (revision, updated_at) for name, revision, updated_at in await db.fetchall()}
+    revisions = [versions.get(name, (0, None))[0] for name in names]
+    return revisions, latest(*(versions.get(name, (0, None))[1] for name in names))
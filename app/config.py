@@ -7,6 +7,105 @@ DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./data/my_todo.db")
 # Default test database URL
 TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL", "sqlite:///./data/my_test_todo.db")
 
+# Comma-separated read replicas of DATABASE_URL. GET handlers read from a replica that passed its last health check
+# (every REPLICA_HEALTH_CHECK_INTERVAL seconds) and trails the primary by at most REPLICA_MAX_LAG seconds, and from
+# the primary otherwise; a client that wrote within READ_YOUR_WRITES_WINDOW seconds keeps reading from the primary
+DATABASE_REPLICA_URLS = os.getenv("DATABASE_REPLICA_URLS", "")
+REPLICA_MAX_LAG = float(os.getenv("REPLICA_MAX_LAG", "5"))
+REPLICA_HEALTH_CHECK_INTERVAL = float(os.getenv("REPLICA_HEALTH_CHECK_INTERVAL", "2"))
+# Longest a replica or /healthz database check waits for a pooled connection; then a replica counts as unreachable
+# and /healthz reports the pool saturated, so checks never hold a database executor thread for the full DB_POOL_TIMEOUT
+DB_PROBE_TIMEOUT = float(os.getenv("DB_PROBE_TIMEOUT", "1"))
+READ_YOUR_WRITES_WINDOW = float(os.getenv("READ_YOUR_WRITES_WINDOW", "5"))
+
+# Connection pool settings; DB_POOL_SIZE is the number of requests that can hold a connection at once
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "40"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_MAX_LIFETIME = float(os.getenv("DB_POOL_MAX_LIFETIME", "3600"))
+DB_POOL_HEALTH_CHECK_INTERVAL = float(os.getenv("DB_POOL_HEALTH_CHECK_INTERVAL", "30"))
+
+# Write transactions that hit SQLITE_BUSY are replayed up to DB_WRITE_RETRIES times, waiting an exponentially
+# growing (jittered) backoff between attempts, starting at DB_WRITE_RETRY_BACKOFF seconds
+DB_WRITE_RETRIES = int(os.getenv("DB_WRITE_RETRIES", "5"))
+DB_WRITE_RETRY_BACKOFF = float(os.getenv("DB_WRITE_RETRY_BACKOFF", "0.01"))
+DB_WRITE_RETRY_MAX_BACKOFF = float(os.getenv("DB_WRITE_RETRY_MAX_BACKOFF", "0.5"))
+
+# Optional single-writer pipeline: write handlers queue their transactions to one writer task that group-commits
+# up to WRITE_BATCH_MAX_SIZE of them at a time, waiting at most WRITE_BATCH_MAX_LATENCY seconds for a batch to fill
+WRITE_PIPELINE = os.getenv("WRITE_PIPELINE", "false").lower() in ("1", "true", "yes")
+WRITE_BATCH_MAX_SIZE = int(os.getenv("WRITE_BATCH_MAX_SIZE", "64"))
+WRITE_BATCH_MAX_LATENCY = float(os.getenv("WRITE_BATCH_MAX_LATENCY", "0.002"))
+
+# Threads of the dedicated executor that runs every blocking SQLite call for the async handlers
+DB_EXECUTOR_THREADS = int(os.getenv("DB_EXECUTOR_THREADS", "16"))
+
+# PRAGMA profile applied to every new SQLite connection. WAL lets readers run while a writer commits,
+# synchronous=NORMAL is durable in WAL mode, cache_size is in KiB when negative and busy_timeout in ms.
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-64000")),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", "268435456")),
+    "temp_store": os.getenv("SQLITE_TEMP_STORE", "MEMORY"),
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT", "5000")),
+}
+
+# Keyset pagination of the listing endpoints; clients can never ask for more than MAX_PAGE_SIZE rows at once
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", "100"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "1000"))
+
+# Rows fetched from the cursor per chunk when streaming NDJSON exports
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "500"))
+
+# Upper bound on the number of tasks accepted by one POST /todo-items/{list_id}/bulk request
+MAX_BULK_TASKS = int(os.getenv("MAX_BULK_TASKS", "10000"))
+
+# Read-through cache of single user/list/task lookups; 0 entries disables it. The cache is per process, so
+# python -m app.serve turns it off when it runs more than one worker
+ENTITY_CACHE_MAX_ENTRIES = int(os.getenv("ENTITY_CACHE_MAX_ENTRIES", "10000"))
+ENTITY_CACHE_TTL = float(os.getenv("ENTITY_CACHE_TTL", "60"))
+
+# Startup warm-up, run once per worker before it accepts requests: WARMUP_CONNECTIONS connections are opened in each
+# of the read and write pools (the read ones with the hot GET statements already compiled) and the entity cache is
+# filled with up to ENTITY_CACHE_PRELOAD of the newest users, lists and tasks each
+WARMUP_CONNECTIONS = int(os.getenv("WARMUP_CONNECTIONS", "4"))
+ENTITY_CACHE_PRELOAD = int(os.getenv("ENTITY_CACHE_PRELOAD", "1000"))
+
+# GET /healthz and /readyz answer from a database probe that runs at most once per HEALTH_CHECK_CACHE_TTL seconds
+HEALTH_CHECK_CACHE_TTL = float(os.getenv("HEALTH_CHECK_CACHE_TTL", "5"))
+
+# JSON encoder for response bodies: "auto" uses orjson when installed and falls back to the standard library
+JSON_SERIALIZER = os.getenv("JSON_SERIALIZER", "auto")
+
+# Prometheus metrics at GET /metrics; when disabled the request and SQL instrumentation is not installed at all
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Statements slower than SLOW_QUERY_THRESHOLD seconds (execute plus fetches) are appended to SLOW_QUERY_LOG as JSON
+# lines with their redacted parameters, the route that issued them and their query plan; an empty path disables it
+SLOW_QUERY_LOG = os.getenv("SLOW_QUERY_LOG", "")
+SLOW_QUERY_THRESHOLD = float(os.getenv("SLOW_QUERY_THRESHOLD", "0.1"))
+
+# Production server (python -m app.serve): worker processes (0 = one per available core; every worker has its own
+# DB_POOL_SIZE connections), requests served before a worker is replaced (0 = never) with up to
+# SERVER_MAX_REQUESTS_JITTER more so workers do not restart together, seconds in-flight requests get on shutdown
+# and the listen backlog
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "0"))
+SERVER_MAX_REQUESTS = int(os.getenv("SERVER_MAX_REQUESTS", "10000"))
+SERVER_MAX_REQUESTS_JITTER = int(os.getenv("SERVER_MAX_REQUESTS_JITTER", "1000"))
+SERVER_GRACEFUL_SHUTDOWN_TIMEOUT = int(os.getenv("SERVER_GRACEFUL_SHUTDOWN_TIMEOUT", "30"))
+SERVER_BACKLOG = int(os.getenv("SERVER_BACKLOG", "2048"))
+
+# Key derivation for new password hashes ("scrypt" or "pbkdf2_sha256") and its cost parameters; stored hashes keep
+# the parameters they were made with and are upgraded on the next successful login
+PASSWORD_HASHER = os.getenv("PASSWORD_HASHER", "scrypt")
+SCRYPT_N = int(os.getenv("SCRYPT_N", "16384"))
+SCRYPT_R = int(os.getenv("SCRYPT_R", "8"))
+SCRYPT_P = int(os.getenv("SCRYPT_P", "1"))
+PBKDF2_ITERATIONS = int(os.getenv("PBKDF2_ITERATIONS", "600000"))
+
+# Threads dedicated to password hashing, so expensive hashes cannot take over the database executor
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+
 
 def get_test_db():
     db_url = os.getenv("TEST_DATABASE_URL", "sqlite:///./data/my_test_todo.db")
@@ -0,0 +1,222 @@
+import queue
+from collections import deque
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+
+class PoolTimeoutError(Exception):
+    pass
+
+
+class _PooledConnection:
+    def __init__(self, connection: sqlite3.Connection):
+        self.connection = connection
+        self.created_at = time.monotonic()
+        self.last_used_at = self.created_at
+
+
+class ConnectionPool:
+    # Keeps up to `size` long-lived connections open so requests borrow a warm connection
+    # instead of paying file open, schema parse and page-cache warm-up on every call.
+    def __init__(self, connect, size: int, timeout: float = 30.0, max_lifetime: float = 3600.0,
+                 health_check_interval: float = 30.0):
+        self._connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.health_check_interval = health_check_interval
+
+        # LIFO so the most recently used (warmest) connection is handed out first
+        self._idle = queue.LifoQueue()
+        self._waiters = deque()
+        self._checked_out = {}
+        self._lock = threading.Lock()
+        self._opened = 0
+        self._closed = False
+        self._counters = {
+            "acquired": 0,
+            "released": 0,
+            "created": 0,
+            "recycled": 0,
+            "health_check_failures": 0,
+            "waits": 0,
+            "timeouts": 0,
+        }
+
+    def _open(self) -> _PooledConnection:
+        entry = _PooledConnection(self._connect())
+        with self._lock:
+            self._counters["created"] += 1
+        return entry
+
+    def _discard(self, entry: _PooledConnection):
+        try:
+            entry.connection.close()
+        except sqlite3.Error:
+            pass
+        with self._lock:
+            self._opened -= 1
+
+    def _is_healthy(self, entry: _PooledConnection, now: float) -> bool:
+        if now - entry.last_used_at < self.health_check_interval:
+            return True
+        try:
+            entry.connection.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            with self._lock:
+                self._counters["health_check_failures"] += 1
+            return False
+
+    def _checkout(self, block: bool = True, waiter=None, timeout: float = None) -> _PooledConnection:
+        with self._lock:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+            can_open = self._opened < self.size
+            if can_open:
+                self._opened += 1
+            elif waiter is not None:
+                # Registered under the lock so a concurrent release cannot slip past the waiter
+                self._waiters.append(waiter)
+                self._counters["waits"] += 1
+                return None
+            elif not block:
+                return None
+
+        if can_open:
+            try:
+                return self._open()
+            except Exception:
+                with self._lock:
+                    self._opened -= 1
+                raise
+
+        timeout = self.timeout if timeout is None else timeout
+        with self._lock:
+            self._counters["waits"] += 1
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            with self._lock:
+                self._counters["timeouts"] += 1
+            raise PoolTimeoutError(f"No database connection available after {timeout} seconds")
+
+    def _check_in(self, entry: _PooledConnection) -> sqlite3.Connection:
+        now = time.monotonic()
+
+        # Recycle connections past their max lifetime or failing the health check
+        if now - entry.created_at >= self.max_lifetime or not self._is_healthy(entry, now):
+            with self._lock:
+                self._counters["recycled"] += 1
+            self._discard(entry)
+            with self._lock:
+                self._opened += 1
+            try:
+                entry = self._open()
+            except Exception:
+                with self._lock:
+                    self._opened -= 1
+                raise
+
+        with self._lock:
+            self._checked_out[id(entry.connection)] = entry
+            self._counters["acquired"] += 1
+        return entry.connection
+
+    # `timeout` overrides the pool's wait for a free connection, for checks that must give up quickly
+    def acquire(self, timeout: float = None) -> sqlite3.Connection:
+        if self._closed:
+            raise PoolTimeoutError("Connection pool is closed")
+        return self._check_in(self._checkout(timeout=timeout))
+
+    # Non-blocking acquire for callers that cannot park a thread: returns a connection right away, or
+    # registers `waiter` to be called with the next released connection and returns None
+    def acquire_or_wait(self, waiter):
+        if self._closed:
+            raise PoolTimeoutError("Connection pool is closed")
+        entry = self._checkout(waiter=waiter)
+        return None if entry is None else self._check_in(entry)
+
+    def cancel_wait(self, waiter) -> bool:
+        with self._lock:
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                return False
+            self._counters["timeouts"] += 1
+            return True
+
+    def release(self, connection: sqlite3.Connection):
+        with self._lock:
+            entry = self._checked_out.pop(id(connection), None)
+            self._counters["released"] += 1
+        if entry is None:
+            return
+
+        # Never hand out a connection with a transaction left open by the previous borrower
+        try:
+            if connection.in_transaction:
+                connection.rollback()
+        except sqlite3.Error:
+            self._discard(entry)
+            return
+
+        if self._closed:
+            self._discard(entry)
+            return
+
+        entry.last_used_at = time.monotonic()
+        with self._lock:
+            waiter = self._waiters.popleft() if self._waiters else None
+            if waiter is None:
+                self._idle.put(entry)
+                return
+            self._checked_out[id(connection)] = entry
+            self._counters["acquired"] += 1
+        waiter(connection)
+
+    @contextmanager
+    def connection(self, timeout: float = None):
+        connection = self.acquire(timeout)
+        try:
+            yield connection
+        finally:
+            self.release(connection)
+
+    # Opens up to `count` connections ahead of the first requests and runs `prepare(connection)` on each, so
+    # borrowers find them idle and warm; returns how many were warmed
+    def warm(self, count: int, prepare=None) -> int:
+        connections = []
+        try:
+            for _ in range(min(count, self.size)):
+                connections.append(self.acquire())
+                if prepare is not None:
+                    prepare(connections[-1])
+        finally:
+            for connection in connections:
+                self.release(connection)
+        return len(connections)
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                entry = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(entry)
+
+    def stats(self) -> dict:
+        with self._lock:
+            in_use = len(self._checked_out)
+            return {
+                "size": self.size,
+                "open": self._opened,
+                "in_use": in_use,
+                "idle": self._opened - in_use,
+                **self._counters,
+            }
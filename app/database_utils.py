@@ -1,88 +1,273 @@
-import hashlib
 import sqlite3
 import os
-from app.config import DATABASE_URL, TEST_DATABASE_URL
+import threading
+import time
+from contextlib import contextmanager
+from fastapi import Request
+from app.config import (DATABASE_URL, TEST_DATABASE_URL, DB_POOL_SIZE, DB_POOL_TIMEOUT, DB_POOL_MAX_LIFETIME,
+                        DB_POOL_HEALTH_CHECK_INTERVAL, SQLITE_PRAGMAS, DB_WRITE_RETRIES, DB_WRITE_RETRY_BACKOFF,
+                        DB_WRITE_RETRY_MAX_BACKOFF, WRITE_PIPELINE, WRITE_BATCH_MAX_SIZE, WRITE_BATCH_MAX_LATENCY,
+                        DATABASE_REPLICA_URLS, REPLICA_MAX_LAG, REPLICA_HEALTH_CHECK_INTERVAL,
+                        READ_YOUR_WRITES_WINDOW, DB_PROBE_TIMEOUT)
+from app.async_database import LazyAsyncCursor, run_in_db_executor
+from app.conditional import parse_timestamp
+from app.connection_pool import ConnectionPool
+from app.metrics import GaugeCallback, connection_factory, registry
+from app.migrations import migrate
+from app import postgres
+from app.replicas import ReplicaSet
+from app.transactions import TransactionManager, WritePipeline
 
+# Pools are keyed by (database path, read_only)
+_pools = {}
+_pools_lock = threading.Lock()
+_transaction_managers = {}
+# Replica sets are keyed by (primary, replicas)
+_replica_sets = {}
 
-def get_db():
+# Set by ReadYourWritesMiddleware after a write: the time of the client's latest write
+READ_YOUR_WRITES_COOKIE = "last_write"
+
+PRAGMA_NAMES = {"journal_mode", "synchronous", "cache_size", "mmap_size", "temp_store", "busy_timeout"}
+
+
+def get_database_path() -> str:
     db_url = os.getenv("DATABASE_URL", DATABASE_URL)
-    connection = sqlite3.connect(db_url.split(":///./")[1])
-    cursor = connection.cursor()
+    return db_url.replace("sqlite:///", "", 1)
+
+
+def get_replica_paths() -> list:
+    urls = os.getenv("DATABASE_REPLICA_URLS", DATABASE_REPLICA_URLS)
+    return [url.strip().replace("sqlite:///", "", 1) for url in urls.split(",") if url.strip()]
+
+
+def apply_pragmas(connection: sqlite3.Connection, pragmas: dict):
+    for name, value in pragmas.items():
+        # PRAGMA values cannot be bound as parameters, so only accept known names and plain values
+        if name not in PRAGMA_NAMES or not str(value).lstrip("-").isalnum():
+            raise ValueError(f"Invalid SQLite PRAGMA {name}={value!r}")
+        connection.execute(f"PRAGMA {name}={value}")
+
+
+# `database` is a SQLite file path or a postgresql:// URL; both backends hand out sqlite3-compatible connections
+def connect(database: str, pragmas: dict = None, read_only: bool = False) -> sqlite3.Connection:
+    if postgres.is_postgres_url(database):
+        return postgres.connect(database, read_only=read_only)
+    pragmas = SQLITE_PRAGMAS if pragmas is None else pragmas
+    if read_only:
+        # journal_mode is stored in the database header; setting it is a write, which read-only connections (and
+        # replica files in particular) leave to the primary's writers
+        pragmas = {name: value for name, value in pragmas.items() if name != "journal_mode"}
+    # Pooled connections are borrowed and returned from different worker threads
+    connection = sqlite3.connect(database, check_same_thread=False, factory=connection_factory())
+    apply_pragmas(connection, pragmas)
+    if read_only:
+        # Any statement that would write fails, so read handlers can never take the write lock
+        connection.execute("PRAGMA query_only = ON")
+    return connection
+
+
+def _get_pool(database: str, read_only: bool) -> ConnectionPool:
+    key = (database, read_only)
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = ConnectionPool(lambda: connect(database, read_only=read_only), size=DB_POOL_SIZE,
+                                      timeout=DB_POOL_TIMEOUT, max_lifetime=DB_POOL_MAX_LIFETIME,
+                                      health_check_interval=DB_POOL_HEALTH_CHECK_INTERVAL)
+                _pools[key] = pool
+    return pool
+
+
+def get_pool(database: str = None) -> ConnectionPool:
+    return _get_pool(database or get_database_path(), read_only=False)
+
+
+def get_read_pool(database: str = None) -> ConnectionPool:
+    return _get_pool(database or get_database_path(), read_only=True)
+
+
+# Total revision and latest change of the collections, compared between the primary and its replicas. A pool with
+# no free connection within DB_PROBE_TIMEOUT raises, which counts as a failed check.
+def collection_watermark(database: str) -> tuple:
+    with get_read_pool(database).connection(timeout=DB_PROBE_TIMEOUT) as connection:
+        revision, updated_at = connection.execute(
+            "SELECT SUM(revision), MAX(updated_at) FROM collection_versions").fetchone()
+    return revision or 0, parse_timestamp(updated_at)
+
+
+def get_replica_set() -> ReplicaSet:
+    replicas = tuple(get_replica_paths())
+    if not replicas:
+        return None
+    key = (get_database_path(), replicas)
+    replica_set = _replica_sets.get(key)
+    if replica_set is None:
+        with _pools_lock:
+            replica_set = _replica_sets.setdefault(key, ReplicaSet(
+                key[0], list(replicas), collection_watermark, max_lag=REPLICA_MAX_LAG,
+                check_interval=REPLICA_HEALTH_CHECK_INTERVAL))
+    return replica_set
+
+
+def reads_own_writes(request: Request) -> bool:
+    try:
+        last_write = float(request.cookies.get(READ_YOUR_WRITES_COOKIE, ""))
+    except ValueError:
+        return False
+    return time.time() - last_write < READ_YOUR_WRITES_WINDOW
+
+
+# The read pool for a request: a replica's when replicas are configured and one is fit to serve it, the primary's
+# otherwise
+async def choose_read_pool(request: Request = None) -> ConnectionPool:
+    replica_set = get_replica_set()
+    if replica_set is None:
+        return get_read_pool()
+    if replica_set.refresh_due():
+        await run_in_db_executor(replica_set.refresh)
+    return get_read_pool(replica_set.choose(primary_only=request is not None and reads_own_writes(request)))
+
+
+def _create_transaction_manager(pool: ConnectionPool, pipeline: bool) -> TransactionManager:
+    if pipeline:
+        return WritePipeline(pool, DB_WRITE_RETRIES, DB_WRITE_RETRY_BACKOFF, DB_WRITE_RETRY_MAX_BACKOFF,
+                             max_batch_size=WRITE_BATCH_MAX_SIZE, max_latency=WRITE_BATCH_MAX_LATENCY)
+    return TransactionManager(pool, DB_WRITE_RETRIES, DB_WRITE_RETRY_BACKOFF, DB_WRITE_RETRY_MAX_BACKOFF)
+
+
+def get_transaction_manager(database: str = None, pipeline: bool = None) -> TransactionManager:
+    database = database or get_database_path()
+    pipeline = WRITE_PIPELINE if pipeline is None else pipeline
+    key = (database, pipeline)
+    manager = _transaction_managers.get(key)
+    if manager is None:
+        pool = get_pool(database)
+        with _pools_lock:
+            manager = _transaction_managers.setdefault(key, _create_transaction_manager(pool, pipeline))
+    return manager
+
+
+# Lets the write pipelines commit what is still queued
+async def close_transaction_managers():
+    with _pools_lock:
+        managers = list(_transaction_managers.values())
+    for manager in managers:
+        await manager.close()
+
+
+def close_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+        _transaction_managers.clear()
+        _replica_sets.clear()
+
+
+# Connection counts and pool counters of every open pool, labelled by database file and role
+def pool_metrics():
+    with _pools_lock:
+        pools = list(_pools.items())
+    for (database, read_only), pool in pools:
+        labels = {"database": os.path.basename(database), "pool": "read" if read_only else "write"}
+        for name, value in pool.stats().items():
+            yield {**labels, "stat": name}, value
+
+
+registry.register(GaugeCallback("db_pool", "Connection pool sizes and counters.", pool_metrics))
+
+
+# Health, lag and routing counters of the configured replicas
+def replica_metrics():
+    with _pools_lock:
+        replica_sets = list(_replica_sets.values())
+    for replica_set in replica_sets:
+        for replica in replica_set.replicas:
+            labels = {"replica": os.path.basename(replica.database)}
+            yield {**labels, "stat": "healthy"}, int(replica.healthy)
+            if replica.lag is not None:
+                yield {**labels, "stat": "lag_seconds"}, replica.lag
+        for name, value in replica_set.stats().items():
+            yield {"replica": "all", "stat": name}, value
+
+
+registry.register(GaugeCallback("db_replica", "Read replica health, lag and routing counters.", replica_metrics))
+
+
+def _read_cursor(pool: ConnectionPool) -> LazyAsyncCursor:
+    dialect = "postgres" if postgres.is_postgres_url(get_database_path()) else "sqlite"
+    return LazyAsyncCursor(pool, replica=pool is not get_read_pool(), dialect=dialect)
+
+
+# Cursor on a read-only connection for GET handlers; there is never anything to commit. The connection is only
+# borrowed once the handler runs a statement, so cache hits skip the pool. The chosen pool is kept on the request
+# for work that outlives the dependency, such as streamed responses.
+async def get_read_db(request: Request):
+    pool = request.state.read_pool = await choose_read_pool(request)
+    cursor = _read_cursor(pool)
     try:
         yield cursor
     finally:
-        connection.commit()
-        connection.close()
+        await cursor.release()
 
 
-def hash_password(password: str) -> str:
-    hash_algorithm = hashlib.sha256()
-    hash_algorithm.update(password.encode('utf-8'))
-    hashed_password = hash_algorithm.hexdigest()
-    return hashed_password
+# Like get_read_db, but never on a replica: for reads a lagging copy must not answer, such as the credentials a
+# login checks
+async def get_primary_read_db():
+    cursor = _read_cursor(get_read_pool())
+    try:
+        yield cursor
+    finally:
+        await cursor.release()
 
 
-def initialize_db():
-    db_url = os.getenv("DATABASE_URL", DATABASE_URL)
-    connection = sqlite3.connect(db_url.split(":///./")[1])
-    cursor = connection.cursor()
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY,
-            username TEXT NOT NULL,
-            email TEXT NOT NULL,
-            password TEXT NOT NULL
-        );
-    """)
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS todo_lists (
-            id INTEGER PRIMARY KEY,
-            user_id INTEGER NOT NULL,
-            title TEXT NOT NULL,
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        );
-    """)
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS todo_items (
-            id INTEGER PRIMARY KEY,
-            list_id INTEGER NOT NULL,
-            context TEXT NOT NULL,
-            completed BOOLEAN NOT NULL,
-            FOREIGN KEY (list_id) REFERENCES todo_lists (id)
-        );
-    """)
-    connection.commit()
-    connection.close()
-
-
-def initialize_test_db():
+# Write handlers run their statements through the transaction manager
+async def get_transactions() -> TransactionManager:
+    return get_transaction_manager()
+
+
+# Inserts `rows` with an INSERT ... VALUES (?, ...) statement and returns the new ids in row order
+def insert_returning_ids(cursor, sql: str, rows: list) -> list:
+    if isinstance(cursor, postgres.PostgresCursor):
+        return cursor.insert_returning_ids(sql, rows)
+    # Write transactions hold SQLite's write lock from BEGIN IMMEDIATE until commit, so the new ids are contiguous
+    cursor.executemany(sql, rows)
+    last_id = cursor.execute("SELECT last_insert_rowid()").fetchone()[0]
+    return list(range(last_id - len(rows) + 1, last_id + 1))
+
+
+# A cursor for reading a large result in batches. sqlite3 cursors step through the result as rows are fetched;
+# PostgreSQL gets a server-side cursor, so memory stays flat on both backends.
+def streaming_cursor(connection):
+    if isinstance(connection, postgres.PostgresConnection):
+        return connection.streaming_cursor()
+    return connection.cursor()
+
+
+
+# Runs the reads in the block in one transaction, so they all see the same snapshot of the database. SQLite keeps the
+# snapshot from the first read after BEGIN; PostgreSQL only keeps it past one statement under REPEATABLE READ.
+@contextmanager
+def read_snapshot(cursor):
+    postgres_backend = isinstance(cursor, postgres.PostgresCursor)
+    cursor.execute("BEGIN ISOLATION LEVEL REPEATABLE READ" if postgres_backend else "BEGIN")
+    try:
+        yield cursor
+    finally:
+        # Nothing was written, so ending it either way is the same
+        cursor.connection.rollback()
+
+def initialize_db(database: str = None) -> int:
+    connection = connect(database or get_database_path())
+    try:
+        return migrate(connection)
+    finally:
+        connection.close()
+
+
+def initialize_test_db() -> int:
     db_url = os.getenv("TEST_DATABASE_URL", TEST_DATABASE_URL)
-    connection = sqlite3.connect(db_url.split(":///./")[1])
-    cursor = connection.cursor()
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY,
-            username TEXT NOT NULL,
-            email TEXT NOT NULL,
-            password TEXT NOT NULL
-        );
-    """)
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS todo_lists (
-            id INTEGER PRIMARY KEY,
-            user_id INTEGER NOT NULL,
-            title TEXT NOT NULL,
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        );
-    """)
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS todo_items (
-            id INTEGER PRIMARY KEY,
-            list_id INTEGER NOT NULL,
-            context TEXT NOT NULL,
-            completed BOOLEAN NOT NULL,
-            FOREIGN KEY (list_id) REFERENCES todo_lists (id)
-        );
-    """)
-    connection.commit()
-    connection.close()
+    return initialize_db(db_url.replace("sqlite:///", "", 1))
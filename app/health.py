@@ -0,0 +1,96 @@
+import threading
+import time
+from datetime import datetime, timezone
+from app.async_database import run_in_db_executor
+from app.config import DB_PROBE_TIMEOUT, HEALTH_CHECK_CACHE_TTL
+from app.connection_pool import PoolTimeoutError
+from app.database_utils import get_database_path, get_pool, get_read_pool
+from app.migrations import current_version, load_migrations
+
+# Both backends number their migrations alike, so one expected version serves either
+EXPECTED_SCHEMA_VERSION = max((version for version, _, _ in load_migrations()), default=0)
+
+
+def pool_availability(database: str) -> dict:
+    availability = {}
+    for role, pool in (("write", get_pool(database)), ("read", get_read_pool(database))):
+        stats = pool.stats()
+        availability[role] = {"size": stats["size"], "in_use": stats["in_use"], "idle": stats["idle"]}
+    return availability
+
+
+# Blocking. Never touches a data table: the probe is a SELECT 1 and the schema_version lookup on a pooled read
+# connection. The probe waits at most DB_PROBE_TIMEOUT for a connection rather than the full DB_POOL_TIMEOUT, and
+# when none frees up it reports the pool saturated without failing the check: under load every connection is busy
+# serving requests, and the pool hands freed connections to waiting requests before the probe.
+def probe_database(database: str = None) -> dict:
+    database = database or get_database_path()
+    result = {
+        "status": "error",
+        "checked_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "pools": pool_availability(database),
+        "pool_saturated": False,
+        "expected_schema_version": EXPECTED_SCHEMA_VERSION,
+    }
+
+    started = time.perf_counter()
+    try:
+        with get_read_pool(database).connection(timeout=DB_PROBE_TIMEOUT) as connection:
+            connection.execute("SELECT 1").fetchone()
+            result["schema_version"] = current_version(connection)
+    except PoolTimeoutError:
+        result["pool_saturated"] = True
+        result["status"] = "ok"
+        return result
+    except Exception as e:
+        result["error"] = str(e)
+        return result
+    finally:
+        result["probe_ms"] = round((time.perf_counter() - started) * 1000, 3)
+
+    if result["schema_version"] < EXPECTED_SCHEMA_VERSION:
+        result["error"] = "Schema is not up to date"
+    else:
+        result["status"] = "ok"
+    return result
+
+
+class HealthCheck:
+    # Runs `probe()` at most once per `ttl` seconds and hands out the cached result in between, so however often
+    # the orchestrator polls, the database sees one probe per interval per worker
+    def __init__(self, probe, ttl: float):
+        self._probe = probe
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._result = None
+        self._expires_at = 0.0
+
+    def _fresh(self):
+        if self._result is not None and time.monotonic() < self._expires_at:
+            return self._result
+        return None
+
+    # Blocking. While a probe is in flight, other callers get the previous result instead of waiting for it; only
+    # the very first callers, with nothing to report yet, wait
+    def check(self) -> dict:
+        if not self._lock.acquire(blocking=self._result is None):
+            return self._result
+        try:
+            result = self._fresh()
+            if result is None:
+                result = self._result = self._probe()
+                self._expires_at = time.monotonic() + self.ttl
+            return result
+        finally:
+            self._lock.release()
+
+    async def result(self) -> dict:
+        # A cached result is answered on the event loop, without a hop to the database executor
+        return self._fresh() or await run_in_db_executor(self.check)
+
+    def reset(self):
+        with self._lock:
+            self._result = None
+
+
+database_health = HealthCheck(probe_database, HEALTH_CHECK_CACHE_TTL)
@@ -1,43 +1,26 @@
-import os
-from fastapi import Request
 from app.app_instance import app
-from fastapi.responses import JSONResponse
-from app.routers import users, todo_lists, todo_items
+from app.config import METRICS_ENABLED, SLOW_QUERY_LOG
+from app.middleware import (MetricsMiddleware, ReadYourWritesMiddleware, RequestScopeMiddleware,
+                            TrailingSlashMiddleware)
+from app.routers import users, todo_lists, todo_items, search, monitoring
+from app.database_utils import get_replica_paths
 
 
 app.include_router(users.router)
 app.include_router(todo_lists.router)
 app.include_router(todo_items.router)
+app.include_router(search.router)
+app.include_router(monitoring.router)
 
-# Load DATABASE_URL from environment variables
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./data/my_todo.db")
+# Redirects the requests in case the users adds "/" at the end of the endpoints
+app.add_middleware(TrailingSlashMiddleware)
 
-# Ensure directories exist if using SQLite
-if DATABASE_URL.startswith("sqlite:///"):
-    db_path = DATABASE_URL.replace("sqlite:///", "")
-    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+if get_replica_paths():
+    app.add_middleware(ReadYourWritesMiddleware)
 
+if SLOW_QUERY_LOG:
+    app.add_middleware(RequestScopeMiddleware)
 
-# This function redirects the requests in case the users adds "/" at the end of the endpoints
-@app.middleware("http")
-async def remove_trailing_slash(request: Request, call_next):
-    if request.url.path == "/users/":
-        return JSONResponse(
-            status_code=301,
-            content={"message": "Moved Permanently", "location": "/users"}
-        )
-
-    if request.url.path == "/todo-lists/":
-        return JSONResponse(
-            status_code=301,
-            content={"message": "Moved Permanently", "location": "/todo-lists"}
-        )
-
-    if request.url.path == "/todo-items/":
-        return JSONResponse(
-            status_code=301,
-            content={"message": "Moved Permanently", "location": "/todo-items"}
-        )
-
-    response = await call_next(request)
-    return response
+# Outermost, so redirects are measured too
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
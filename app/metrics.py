@@ -0,0 +1,226 @@
+import bisect
+import sqlite3
+import threading
+import time
+from app.config import METRICS_ENABLED
+from app.slow_queries import slow_query_log
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+ROW_BUCKETS = (0, 1, 10, 100, 1_000, 10_000, 100_000)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: tuple = (), amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def collect(self) -> list:
+        with self._lock:
+            values = dict(self._values)
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(dict(zip(self.labelnames, labels)))} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        # Per label set: [count per bucket (non-cumulative, last one is +Inf), sum, count]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def collect(self) -> list:
+        with self._lock:
+            snapshot = {labels: (list(counts), total, count) for labels, (counts, total, count) in self._series.items()}
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in sorted(snapshot.items()):
+            label_dict = dict(zip(self.labelnames, labels))
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, float("inf")), counts):
+                cumulative += bucket_count
+                bucket_labels = _format_labels({**label_dict, "le": _format_value(float(bound))})
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(label_dict)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(label_dict)} {count}")
+        return lines
+
+
+class GaugeCallback:
+    # A gauge family computed when scraped; `callback` returns (labels dict, value) pairs
+    def __init__(self, name: str, documentation: str, callback):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+
+    def collect(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        for labels, value in self.callback():
+            lines.append(f"{self.name}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    # Prometheus text exposition format 0.0.4
+    def render(self) -> str:
+        return "\n".join(line for metric in self._metrics for line in metric.collect()) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route template and status code.", ("method", "route", "status")))
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "Time from receiving a request to sending the last body byte.",
+    ("method", "route")))
+http_response_size = registry.register(Histogram(
+    "http_response_size_bytes", "Response body size.", ("method", "route"), buckets=SIZE_BUCKETS))
+db_statement_duration = registry.register(Histogram(
+    "db_statement_duration_seconds", "Time spent in sqlite3 execute/executemany by statement type.",
+    ("operation",)))
+db_rows_returned = registry.register(Histogram(
+    "db_rows_returned", "Rows returned by one fetch call.", ("operation",), buckets=ROW_BUCKETS))
+
+
+def statement_operation(sql: str) -> str:
+    words = sql.lstrip().split(None, 1)
+    return words[0].upper() if words else ""
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    # Times statements and counts fetched rows for the metrics and the slow-query log; only used when one of
+    # them is enabled, so the plain sqlite3 cursor pays nothing otherwise. A SELECT does most of its work while
+    # rows are fetched, so the time of a statement is its execute call plus every fetch that follows it.
+    _operation = ""
+    _sql = ""
+    _parameters = ()
+    _elapsed = 0.0
+    _rows = 0
+    _logged = False
+
+    def _begin(self, sql, parameters):
+        self._operation = statement_operation(sql)
+        self._sql = sql
+        self._parameters = parameters
+        self._elapsed = 0.0
+        self._rows = 0
+        self._logged = False
+
+    def _account(self, elapsed: float, rows: int = 0):
+        self._elapsed += elapsed
+        self._rows += rows
+        # Logged once, when the statement's running total first reaches the threshold
+        if slow_query_log is not None and not self._logged and self._elapsed >= slow_query_log.threshold:
+            self._logged = True
+            slow_query_log.record(self.connection, self._sql, self._parameters, self._operation, self._elapsed,
+                                  self._rows)
+
+    def execute(self, sql, parameters=()):
+        self._begin(sql, parameters)
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            elapsed = time.perf_counter() - started
+            if METRICS_ENABLED:
+                db_statement_duration.observe((self._operation,), elapsed)
+            self._account(elapsed)
+
+    def executemany(self, sql, seq_of_parameters):
+        if slow_query_log is not None:
+            seq_of_parameters = list(seq_of_parameters)
+        # The first parameter set stands in for all of them in the slow-query log
+        self._begin(sql, seq_of_parameters[0] if slow_query_log is not None and seq_of_parameters else ())
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            elapsed = time.perf_counter() - started
+            if METRICS_ENABLED:
+                db_statement_duration.observe((self._operation,), elapsed)
+            self._account(elapsed)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        rows = 0 if row is None else 1
+        if METRICS_ENABLED:
+            db_rows_returned.observe((self._operation,), rows)
+        self._account(time.perf_counter() - started, rows)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        if METRICS_ENABLED:
+            db_rows_returned.observe((self._operation,), len(rows))
+        self._account(time.perf_counter() - started, len(rows))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        if METRICS_ENABLED:
+            db_rows_returned.observe((self._operation,), len(rows))
+        self._account(time.perf_counter() - started, len(rows))
+        return rows
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    # The C implementations of the shortcut methods create a plain cursor without going through cursor()
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def connection_factory():
+    return InstrumentedConnection if METRICS_ENABLED or slow_query_log is not None else sqlite3.Connection
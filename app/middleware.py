@@ -0,0 +1,106 @@
+import time
+from fastapi import status
+from app.config import READ_YOUR_WRITES_WINDOW
+from app import metrics
+from app.database_utils import READ_YOUR_WRITES_COOKIE
+from app.slow_queries import current_scope
+from app.responses import JSONResponse
+
+
+# Redirects "/users/" to "/users" (and likewise for every other route) at the ASGI layer, so requests
+# without a trailing slash pass straight through without the per-request cost of BaseHTTPMiddleware
+class TrailingSlashMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            path = scope["path"]
+            if path != "/" and path.endswith("/"):
+                # Leading slashes (and backslashes, which browsers read as slashes) are collapsed to one: a
+                # Location of "//host" would send the client to another site
+                location = "/" + path.lstrip("/\\").rstrip("/")
+                if scope.get("query_string"):
+                    location += "?" + scope["query_string"].decode("latin-1")
+                response = JSONResponse(status_code=status.HTTP_301_MOVED_PERMANENTLY,
+                                        content={"message": "Moved Permanently", "location": location},
+                                        headers={"location": location})
+                await response(scope, receive, send)
+                return
+
+        await self.app(scope, receive, send)
+
+
+# Records request count, duration and response size per route template. The route is read from the scope
+# after the app has run, since FastAPI's router stores the matched route in it.
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+        response_size = 0
+
+        async def send_with_metrics(message):
+            nonlocal status_code, response_size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                response_size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            route = scope.get("route")
+            # Unmatched paths share one label so scanners cannot blow up the number of series
+            route_path = getattr(route, "path", "unmatched")
+            method = scope["method"]
+            metrics.http_requests.inc((method, route_path, str(status_code)))
+            metrics.http_request_duration.observe((method, route_path), time.perf_counter() - started)
+            metrics.http_response_size.observe((method, route_path), response_size)
+
+
+# Makes the request's scope available to the database layer, which labels slow statements with its route
+class RequestScopeMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = current_scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_scope.reset(token)
+
+
+# Marks clients that just wrote with a short-lived cookie, so their next reads go to the primary instead of a
+# replica that may not have their write yet
+class ReadYourWritesMiddleware:
+    SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in self.SAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                cookie = (f"{READ_YOUR_WRITES_COOKIE}={time.time():.3f}; Max-Age={int(READ_YOUR_WRITES_WINDOW)}; "
+                          "Path=/; HttpOnly; SameSite=Lax")
+                message = {**message, "headers": [*message.get("headers", []), (b"set-cookie", cookie.encode())]}
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
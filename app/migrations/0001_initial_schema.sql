@@ -0,0 +1,21 @@
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY,
+    username TEXT NOT NULL,
+    email TEXT NOT NULL,
+    password TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS todo_lists (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    FOREIGN KEY (user_id) REFERENCES users (id)
+);
+
+CREATE TABLE IF NOT EXISTS todo_items (
+    id INTEGER PRIMARY KEY,
+    list_id INTEGER NOT NULL,
+    context TEXT NOT NULL,
+    completed BOOLEAN NOT NULL,
+    FOREIGN KEY (list_id) REFERENCES todo_lists (id)
+);
@@ -0,0 +1,4 @@
+-- Lookups, cascading deletes and joins filter on the foreign key columns
+CREATE INDEX IF NOT EXISTS idx_todo_items_list_id ON todo_items (list_id);
+
+CREATE INDEX IF NOT EXISTS idx_todo_lists_user_id ON todo_lists (user_id);
@@ -0,0 +1,54 @@
+-- Per-row revision counters and modification times, maintained by the write handlers
+ALTER TABLE users ADD COLUMN revision INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE users ADD COLUMN updated_at TEXT;
+
+ALTER TABLE todo_lists ADD COLUMN revision INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE todo_lists ADD COLUMN updated_at TEXT;
+
+ALTER TABLE todo_items ADD COLUMN revision INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE todo_items ADD COLUMN updated_at TEXT;
+
+-- Per-collection versions, bumped by triggers so cascades and bulk inserts are covered too
+CREATE TABLE IF NOT EXISTS collection_versions (
+    name TEXT PRIMARY KEY,
+    revision INTEGER NOT NULL DEFAULT 1,
+    updated_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT OR IGNORE INTO collection_versions (name) VALUES ('users'), ('todo_lists'), ('todo_items');
+
+CREATE TRIGGER IF NOT EXISTS users_version_insert AFTER INSERT ON users BEGIN
+    UPDATE collection_versions SET revision = revision + 1, updated_at = CURRENT_TIMESTAMP WHERE name = 'users';
+END;
+
+CREATE TRIGGER IF NOT EXISTS users_version_update AFTER UPDATE ON users BEGIN
+    UPDATE collection_versions SET revision = revision + 1, updated_at = CURRENT_TIMESTAMP WHERE name = 'users';
+END;
+
+CREATE TRIGGER IF NOT EXISTS users_version_delete AFTER DELETE ON users BEGIN
+    UPDATE collection_versions SET revision = revision + 1, updated_at = CURRENT_TIMESTAMP WHERE name = 'users';
+END;
+
+CREATE TRIGGER IF NOT EXISTS todo_lists_version_insert AFTER INSERT ON todo_lists BEGIN
+    UPDATE collection_versions SET revision = revision + 1, updated_at = CURRENT_TIMESTAMP WHERE name = 'todo_lists';
+END;
+
+CREATE TRIGGER IF NOT EXISTS todo_lists_version_update AFTER UPDATE ON todo_lists BEGIN
+    UPDATE collection_versions SET revision = revision + 1, updated_at = CURRENT_TIMESTAMP WHERE name = 'todo_lists';
+END;
+
+CREATE TRIGGER IF NOT EXISTS todo_lists_version_delete AFTER DELETE ON todo_lists BEGIN
+    UPDATE collection_versions SET revision = revision + 1, updated_at = CURRENT_TIMESTAMP WHERE name = 'todo_lists';
+END;
+
+CREATE TRIGGER IF NOT EXISTS todo_items_version_insert AFTER INSERT ON todo_items BEGIN
+    UPDATE collection_versions SET revision = revision + 1, updated_at = CURRENT_TIMESTAMP WHERE name = 'todo_items';
+END;
+
+CREATE TRIGGER IF NOT EXISTS todo_items_version_update AFTER UPDATE ON todo_items BEGIN
+    UPDATE collection_versions SET revision = revision + 1, updated_at = CURRENT_TIMESTAMP WHERE name = 'todo_items';
+END;
+
+CREATE TRIGGER IF NOT EXISTS todo_items_version_delete AFTER DELETE ON todo_items BEGIN
+    UPDATE collection_versions SET revision = revision + 1, updated_at = CURRENT_TIMESTAMP WHERE name = 'todo_items';
+END;
@@ -0,0 +1,39 @@
+-- Full-text indexes over task contexts and list titles. Both are external-content tables, so the text is stored
+-- once in the source table and the triggers below keep the indexes in step with every write.
+CREATE VIRTUAL TABLE IF NOT EXISTS todo_items_fts USING fts5(
+    context, content='todo_items', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS todo_lists_fts USING fts5(
+    title, content='todo_lists', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+
+CREATE TRIGGER IF NOT EXISTS todo_items_fts_insert AFTER INSERT ON todo_items BEGIN
+    INSERT INTO todo_items_fts (rowid, context) VALUES (new.id, new.context);
+END;
+
+CREATE TRIGGER IF NOT EXISTS todo_items_fts_delete AFTER DELETE ON todo_items BEGIN
+    INSERT INTO todo_items_fts (todo_items_fts, rowid, context) VALUES ('delete', old.id, old.context);
+END;
+
+CREATE TRIGGER IF NOT EXISTS todo_items_fts_update AFTER UPDATE OF context ON todo_items BEGIN
+    INSERT INTO todo_items_fts (todo_items_fts, rowid, context) VALUES ('delete', old.id, old.context);
+    INSERT INTO todo_items_fts (rowid, context) VALUES (new.id, new.context);
+END;
+
+CREATE TRIGGER IF NOT EXISTS todo_lists_fts_insert AFTER INSERT ON todo_lists BEGIN
+    INSERT INTO todo_lists_fts (rowid, title) VALUES (new.id, new.title);
+END;
+
+CREATE TRIGGER IF NOT EXISTS todo_lists_fts_delete AFTER DELETE ON todo_lists BEGIN
+    INSERT INTO todo_lists_fts (todo_lists_fts, rowid, title) VALUES ('delete', old.id, old.title);
+END;
+
+CREATE TRIGGER IF NOT EXISTS todo_lists_fts_update AFTER UPDATE OF title ON todo_lists BEGIN
+    INSERT INTO todo_lists_fts (todo_lists_fts, rowid, title) VALUES ('delete', old.id, old.title);
+    INSERT INTO todo_lists_fts (rowid, title) VALUES (new.id, new.title);
+END;
+
+-- Index the rows that existed before this migration
+INSERT INTO todo_items_fts (todo_items_fts) VALUES ('rebuild');
+INSERT INTO todo_lists_fts (todo_lists_fts) VALUES ('rebuild');
@@ -0,0 +1,121 @@
+-- Without AUTOINCREMENT SQLite hands the id of a deleted highest row to the next insert, and since revisions start
+-- at 1 a new row could repeat the old one's ETag ("user-1-1") and be answered with a 304. The tables are rebuilt
+-- with AUTOINCREMENT so ids are never reused; ids, revisions and timestamps are copied as they are. Dropping a
+-- table drops its indexes and triggers, so those are recreated below; the full-text indexes key on the unchanged
+-- ids and stay valid.
+CREATE TABLE users_new (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL,
+    email TEXT NOT NULL,
+    password TEXT NOT NULL,
+    revision INTEGER NOT NULL DEFAULT 1,
+    updated_at TEXT
+);
+
+INSERT INTO users_new (id, username, email, password, revision, updated_at)
+    SELECT id, username, email, password, revision, updated_at FROM users;
+
+DROP TABLE users;
+
+ALTER TABLE users_new RENAME TO users;
+
+CREATE TABLE todo_lists_new (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    revision INTEGER NOT NULL DEFAULT 1,
+    updated_at TEXT,
+    FOREIGN KEY (user_id) REFERENCES users (id)
+);
+
+INSERT INTO todo_lists_new (id, user_id, title, revision, updated_at)
+    SELECT id, user_id, title, revision, updated_at FROM todo_lists;
+
+DROP TABLE todo_lists;
+
+ALTER TABLE todo_lists_new RENAME TO todo_lists;
+
+CREATE TABLE todo_items_new (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    list_id INTEGER NOT NULL,
+    context TEXT NOT NULL,
+    completed BOOLEAN NOT NULL,
+    revision INTEGER NOT NULL DEFAULT 1,
+    updated_at TEXT,
+    FOREIGN KEY (list_id) REFERENCES todo_lists (id)
+);
+
+INSERT INTO todo_items_new (id, list_id, context, completed, revision, updated_at)
+    SELECT id, list_id, context, completed, revision, updated_at FROM todo_items;
+
+DROP TABLE todo_items;
+
+ALTER TABLE todo_items_new RENAME TO todo_items;
+
+CREATE INDEX IF NOT EXISTS idx_todo_lists_user_id ON todo_lists (user_id);
+
+CREATE INDEX IF NOT EXISTS idx_todo_items_list_id ON todo_items (list_id);
+
+CREATE INDEX IF NOT EXISTS idx_todo_items_list_id_completed ON todo_items (list_id, completed);
+
+CREATE TRIGGER IF NOT EXISTS users_version_insert AFTER INSERT ON users BEGIN
+    UPDATE collection_versions SET revision = revision + 1, updated_at = CURRENT_TIMESTAMP WHERE name = 'users';
+END;
+
+CREATE TRIGGER IF NOT EXISTS users_version_update AFTER UPDATE ON users BEGIN
+    UPDATE collection_versions SET revision = revision + 1, updated_at = CURRENT_TIMESTAMP WHERE name = 'users';
+END;
+
+CREATE TRIGGER IF NOT EXISTS users_version_delete AFTER DELETE ON users BEGIN
+    UPDATE collection_versions SET revision = revision + 1, updated_at = CURRENT_TIMESTAMP WHERE name = 'users';
+END;
+
+CREATE TRIGGER IF NOT EXISTS todo_lists_version_insert AFTER INSERT ON todo_lists BEGIN
+    UPDATE collection_versions SET revision = revision + 1, updated_at = CURRENT_TIMESTAMP WHERE name = 'todo_lists';
+END;
+
+CREATE TRIGGER IF NOT EXISTS todo_lists_version_update AFTER UPDATE ON todo_lists BEGIN
+    UPDATE collection_versions SET revision = revision + 1, updated_at = CURRENT_TIMESTAMP WHERE name = 'todo_lists';
+END;
+
+CREATE TRIGGER IF NOT EXISTS todo_lists_version_delete AFTER DELETE ON todo_lists BEGIN
+    UPDATE collection_versions SET revision = revision + 1, updated_at = CURRENT_TIMESTAMP WHERE name = 'todo_lists';
+END;
+
+CREATE TRIGGER IF NOT EXISTS todo_items_version_insert AFTER INSERT ON todo_items BEGIN
+    UPDATE collection_versions SET revision = revision + 1, updated_at = CURRENT_TIMESTAMP WHERE name = 'todo_items';
+END;
+
+CREATE TRIGGER IF NOT EXISTS todo_items_version_update AFTER UPDATE ON todo_items BEGIN
+    UPDATE collection_versions SET revision = revision + 1, updated_at = CURRENT_TIMESTAMP WHERE name = 'todo_items';
+END;
+
+CREATE TRIGGER IF NOT EXISTS todo_items_version_delete AFTER DELETE ON todo_items BEGIN
+    UPDATE collection_versions SET revision = revision + 1, updated_at = CURRENT_TIMESTAMP WHERE name = 'todo_items';
+END;
+
+CREATE TRIGGER IF NOT EXISTS todo_items_fts_insert AFTER INSERT ON todo_items BEGIN
+    INSERT INTO todo_items_fts (rowid, context) VALUES (new.id, new.context);
+END;
+
+CREATE TRIGGER IF NOT EXISTS todo_items_fts_delete AFTER DELETE ON todo_items BEGIN
+    INSERT INTO todo_items_fts (todo_items_fts, rowid, context) VALUES ('delete', old.id, old.context);
+END;
+
+CREATE TRIGGER IF NOT EXISTS todo_items_fts_update AFTER UPDATE OF context ON todo_items BEGIN
+    INSERT INTO todo_items_fts (todo_items_fts, rowid, context) VALUES ('delete', old.id, old.context);
+    INSERT INTO todo_items_fts (rowid, context) VALUES (new.id, new.context);
+END;
+
+CREATE TRIGGER IF NOT EXISTS todo_lists_fts_insert AFTER INSERT ON todo_lists BEGIN
+    INSERT INTO todo_lists_fts (rowid, title) VALUES (new.id, new.title);
+END;
+
+CREATE TRIGGER IF NOT EXISTS todo_lists_fts_delete AFTER DELETE ON todo_lists BEGIN
+    INSERT INTO todo_lists_fts (todo_lists_fts, rowid, title) VALUES ('delete', old.id, old.title);
+END;
+
+CREATE TRIGGER IF NOT EXISTS todo_lists_fts_update AFTER UPDATE OF title ON todo_lists BEGIN
+    INSERT INTO todo_lists_fts (todo_lists_fts, rowid, title) VALUES ('delete', old.id, old.title);
+    INSERT INTO todo_lists_fts (rowid, title) VALUES (new.id, new.title);
+END;
@@ -0,0 +1,76 @@
+import os
+import re
+import sqlite3
+from datetime import datetime, timezone
+
+MIGRATIONS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# PostgreSQL has its own scripts with the same version numbers, so both backends report the same schema version
+POSTGRES_MIGRATIONS_DIR = os.path.join(MIGRATIONS_DIR, "postgres")
+
+# Serializes migrations across workers on PostgreSQL, where BEGIN does not lock the database like BEGIN IMMEDIATE
+POSTGRES_MIGRATION_LOCK = 0x6D79746F
+
+# Migration scripts are named NNNN_description.sql and applied in version order
+MIGRATION_FILE_PATTERN = re.compile(r"^(\d{4})_(\w+)\.sql$")
+
+
+def load_migrations(directory: str = MIGRATIONS_DIR) -> list:
+    migrations = []
+    for file_name in os.listdir(directory):
+        match = MIGRATION_FILE_PATTERN.match(file_name)
+        if match:
+            with open(os.path.join(directory, file_name), encoding="utf-8") as migration_file:
+                migrations.append((int(match.group(1)), match.group(2), migration_file.read()))
+    return sorted(migrations)
+
+
+def split_statements(script: str):
+    statement = ""
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            yield statement.strip()
+            statement = ""
+
+
+def current_version(connection: sqlite3.Connection) -> int:
+    row = connection.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+
+def migrate(connection: sqlite3.Connection) -> int:
+    postgres = getattr(connection, "dialect", "sqlite") == "postgres"
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TEXT NOT NULL
+        );
+    """)
+    connection.commit()
+
+    version = current_version(connection)
+    for migration_version, name, script in load_migrations(POSTGRES_MIGRATIONS_DIR if postgres else MIGRATIONS_DIR):
+        if migration_version <= version:
+            continue
+
+        # Each migration runs in its own write transaction; the version is re-checked under the lock
+        # so several workers starting at once apply every migration exactly once
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            if postgres:
+                connection.execute("SELECT pg_advisory_xact_lock(?)", (POSTGRES_MIGRATION_LOCK,))
+            if current_version(connection) < migration_version:
+                # PostgreSQL runs a whole script at once, which keeps function bodies with semicolons intact
+                for statement in [script] if postgres else split_statements(script):
+                    connection.execute(statement)
+                connection.execute("INSERT INTO schema_version (version, name, applied_at) VALUES (?, ?, ?)",
+                                   (migration_version, name, datetime.now(timezone.utc).isoformat()))
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        version = migration_version
+
+    return version
@@ -0,0 +1,21 @@
+-- PostgreSQL counterpart of the SQLite schema. completed is an integer because the application binds and
+-- returns it as 0/1, which is how SQLite stores BOOLEAN.
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    username TEXT NOT NULL,
+    email TEXT NOT NULL,
+    password TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS todo_lists (
+    id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users (id),
+    title TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS todo_items (
+    id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    list_id INTEGER NOT NULL REFERENCES todo_lists (id),
+    context TEXT NOT NULL,
+    completed INTEGER NOT NULL
+);
@@ -0,0 +1,35 @@
+-- Per-row revision counters and modification times, maintained by the write handlers. TIMESTAMP(0) in a UTC
+-- session reads back as the same text SQLite stores.
+ALTER TABLE users ADD COLUMN IF NOT EXISTS revision INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE users ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP(0);
+
+ALTER TABLE todo_lists ADD COLUMN IF NOT EXISTS revision INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE todo_lists ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP(0);
+
+ALTER TABLE todo_items ADD COLUMN IF NOT EXISTS revision INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE todo_items ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP(0);
+
+-- Per-collection versions, bumped once per statement so cascades and bulk inserts are covered too
+CREATE TABLE IF NOT EXISTS collection_versions (
+    name TEXT PRIMARY KEY,
+    revision INTEGER NOT NULL DEFAULT 1,
+    updated_at TIMESTAMP(0) NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO collection_versions (name) VALUES ('users'), ('todo_lists'), ('todo_items') ON CONFLICT DO NOTHING;
+
+CREATE OR REPLACE FUNCTION bump_collection_version() RETURNS trigger AS $$
+BEGIN
+    UPDATE collection_versions SET revision = revision + 1, updated_at = CURRENT_TIMESTAMP WHERE name = TG_TABLE_NAME;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER users_version AFTER INSERT OR UPDATE OR DELETE ON users
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_collection_version();
+
+CREATE TRIGGER todo_lists_version AFTER INSERT OR UPDATE OR DELETE ON todo_lists
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_collection_version();
+
+CREATE TRIGGER todo_items_version AFTER INSERT OR UPDATE OR DELETE ON todo_items
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_collection_version();
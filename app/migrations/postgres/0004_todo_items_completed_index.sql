@@ -0,0 +1,3 @@
+-- Serves ?completed= filters combined with a list or user on /todo-items, the common "my pending tasks" query;
+-- id is part of the key so keyset pagination stays in index order within a list
+CREATE INDEX IF NOT EXISTS idx_todo_items_list_id_completed ON todo_items (list_id, completed, id);
@@ -0,0 +1,5 @@
+-- Full-text indexes over task contexts and list titles. The "simple" configuration lower-cases without stemming,
+-- like SQLite's unicode61 tokenizer; the search query has to use the same expressions to hit the indexes.
+CREATE INDEX IF NOT EXISTS idx_todo_items_context_fts ON todo_items USING GIN (to_tsvector('simple', context));
+
+CREATE INDEX IF NOT EXISTS idx_todo_lists_title_fts ON todo_lists USING GIN (to_tsvector('simple', title));
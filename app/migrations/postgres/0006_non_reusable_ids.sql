@@ -0,0 +1,4 @@
+-- The SQLite script rebuilds the tables with AUTOINCREMENT so deleted ids are never handed out again. Identity
+-- columns draw from sequences that never go back, so there is nothing to change here; the script only keeps the
+-- version numbers of both backends in step.
+SELECT 1;
@@ -17,5 +17,10 @@ class ToDoTask(BaseModel):
     completed: int
 
 
+class Login(BaseModel):
+    username: str
+    password: str
+
+
 class DeleteUser(BaseModel):
     user_id: int
@@ -0,0 +1,55 @@
+import base64
+import binascii
+from app.config import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+
+
+class InvalidPageTokenError(ValueError):
+    pass
+
+
+def _encode_token(prefix: str, value: int) -> str:
+    return base64.urlsafe_b64encode(f"{prefix}:{value}".encode()).decode().rstrip("=")
+
+
+def _decode_token(prefix: str, token: str) -> int:
+    if not token:
+        return 0
+    try:
+        decoded = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+        token_prefix, value = decoded.split(":", 1)
+        if token_prefix != prefix:
+            raise ValueError(token_prefix)
+        return int(value)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidPageTokenError(f"Invalid page token: {token}")
+
+
+# Page tokens are opaque to clients; they wrap the last id of the previous page (keyset on id)
+def encode_page_token(last_id: int) -> str:
+    return _encode_token("id", last_id)
+
+
+def decode_page_token(token: str) -> int:
+    return _decode_token("id", token)
+
+
+# Relevance-ordered results have no stable key to seek on, so their tokens wrap an offset instead
+def encode_offset_token(offset: int) -> str:
+    return _encode_token("offset", offset)
+
+
+def decode_offset_token(token: str) -> int:
+    return _decode_token("offset", token)
+
+
+def page_size(limit: int = None) -> int:
+    return min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+
+
+# Queries fetch one row more than the page size so we know whether another page exists;
+# id_field is the position or column alias of the row id
+def paginate(rows: list, limit: int, id_field=0):
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_page_token(rows[-1][id_field])
+    return rows, None
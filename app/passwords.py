@@ -0,0 +1,162 @@
+import asyncio
+import base64
+import binascii
+import functools
+import hashlib
+import hmac
+import os
+from concurrent.futures import ThreadPoolExecutor
+from app.config import PASSWORD_HASHER, SCRYPT_N, SCRYPT_R, SCRYPT_P, PBKDF2_ITERATIONS, PASSWORD_HASH_WORKERS
+
+SALT_SIZE = 16
+
+# Hashing is deliberately slow, so it gets its own small pool: a burst of sign-ups queues here
+# instead of occupying the threads that serve database reads
+_hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password")
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.b64encode(data).decode().rstrip("=")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.b64decode(data + "=" * (-len(data) % 4))
+
+
+class ScryptHasher:
+    # Encoded as scrypt$n$r$p$salt$key so a hash can always be verified with the parameters it was made with
+    algorithm = "scrypt"
+
+    def __init__(self, n: int, r: int, p: int, key_size: int = 64):
+        self.n = n
+        self.r = r
+        self.p = p
+        self.key_size = key_size
+
+    def _derive(self, password: str, salt: bytes, n: int, r: int, p: int, key_size: int) -> bytes:
+        # OpenSSL needs room for the 128*r*(n+2) work area plus the 128*r*p block
+        maxmem = 128 * r * (n + 2 + p) + 2 ** 20
+        return hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=r, p=p, maxmem=maxmem, dklen=key_size)
+
+    def hash(self, password: str) -> str:
+        salt = os.urandom(SALT_SIZE)
+        key = self._derive(password, salt, self.n, self.r, self.p, self.key_size)
+        return f"{self.algorithm}${self.n}${self.r}${self.p}${_b64encode(salt)}${_b64encode(key)}"
+
+    def verify(self, password: str, encoded: str) -> bool:
+        _, n, r, p, salt, key = encoded.split("$")
+        expected = _b64decode(key)
+        return hmac.compare_digest(self._derive(password, _b64decode(salt), int(n), int(r), int(p), len(expected)),
+                                   expected)
+
+    def needs_rehash(self, encoded: str) -> bool:
+        return not encoded.startswith(f"{self.algorithm}${self.n}${self.r}${self.p}$")
+
+
+class Pbkdf2Hasher:
+    # Encoded as pbkdf2_sha256$iterations$salt$key
+    algorithm = "pbkdf2_sha256"
+
+    def __init__(self, iterations: int, key_size: int = 32):
+        self.iterations = iterations
+        self.key_size = key_size
+
+    def hash(self, password: str) -> str:
+        salt = os.urandom(SALT_SIZE)
+        key = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, self.iterations, self.key_size)
+        return f"{self.algorithm}${self.iterations}${_b64encode(salt)}${_b64encode(key)}"
+
+    def verify(self, password: str, encoded: str) -> bool:
+        _, iterations, salt, key = encoded.split("$")
+        expected = _b64decode(key)
+        derived = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), _b64decode(salt), int(iterations),
+                                      len(expected))
+        return hmac.compare_digest(derived, expected)
+
+    def needs_rehash(self, encoded: str) -> bool:
+        return not encoded.startswith(f"{self.algorithm}${self.iterations}$")
+
+
+class LegacySha256Hasher:
+    # The original unsalted hex SHA-256; only verified, so those hashes can be replaced on login
+    algorithm = "sha256"
+
+    def hash(self, password: str) -> str:
+        return hashlib.sha256(password.encode("utf-8")).hexdigest()
+
+    def verify(self, password: str, encoded: str) -> bool:
+        return hmac.compare_digest(self.hash(password), encoded)
+
+    def needs_rehash(self, encoded: str) -> bool:
+        return True
+
+
+HASHERS = {
+    ScryptHasher.algorithm: ScryptHasher(SCRYPT_N, SCRYPT_R, SCRYPT_P),
+    Pbkdf2Hasher.algorithm: Pbkdf2Hasher(PBKDF2_ITERATIONS),
+}
+
+LEGACY_HASHER = LegacySha256Hasher()
+
+
+def get_hasher(name: str = None):
+    name = name or PASSWORD_HASHER
+    if name not in HASHERS:
+        raise ValueError(f"Unknown password hasher: {name}")
+    return HASHERS[name]
+
+
+def identify_hasher(encoded: str):
+    algorithm = encoded.split("$", 1)[0]
+    if algorithm in HASHERS:
+        return HASHERS[algorithm]
+    if len(encoded) == 64 and all(char in "0123456789abcdef" for char in encoded):
+        return LEGACY_HASHER
+    return None
+
+
+# Returns whether the password matches, and a replacement hash when the stored one uses a legacy format
+# or outdated parameters
+def check_password(password: str, encoded: str, hasher=None):
+    stored_hasher = identify_hasher(encoded or "")
+    try:
+        valid = stored_hasher is not None and stored_hasher.verify(password, encoded)
+    except (ValueError, binascii.Error):
+        valid = False
+    if not valid:
+        return False, None
+
+    hasher = hasher or get_hasher()
+    if stored_hasher.algorithm == hasher.algorithm and not hasher.needs_rehash(encoded):
+        return True, None
+    return True, hasher.hash(password)
+
+
+
+# Stands in for the stored hash when a login names a username that does not exist; made once per hasher, so it
+# carries the same parameters as the hashes of real users
+@functools.lru_cache(maxsize=None)
+def dummy_hash(hasher) -> str:
+    return hasher.hash(_b64encode(os.urandom(SALT_SIZE)))
+
+
+# Fails like check_password() does for a wrong password, after doing the same work, so the response time does not
+# tell which usernames exist
+def check_unknown_user(password: str, hasher=None):
+    hasher = hasher or get_hasher()
+    hasher.verify(password, dummy_hash(hasher))
+    return False, None
+
+async def hash_password(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_executor, get_hasher().hash, password)
+
+
+async def verify_password(password: str, encoded: str):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_executor, check_password, password, encoded)
+
+
+async def verify_unknown_user(password: str):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_executor, check_unknown_user, password)
@@ -0,0 +1,212 @@
+import contextlib
+import itertools
+import re
+import sqlite3
+
+# psycopg2 is only needed when DATABASE_URL points at PostgreSQL
+try:
+    import psycopg2
+    import psycopg2.extensions
+    import psycopg2.extras
+except ImportError:
+    psycopg2 = None
+
+POSTGRES_URL_PREFIXES = ("postgres://", "postgresql://")
+
+# SQLSTATEs for serialization failures, deadlocks and lock timeouts. They are raised as SQLITE_BUSY, so the
+# transaction manager rolls back and replays them like any other busy write.
+BUSY_SQLSTATES = {"40001", "40P01", "55P03"}
+
+# The SQLite-only statements the routers and the transaction manager issue, spelled the PostgreSQL way. Writes
+# serialize on row locks instead of one database lock, so BEGIN IMMEDIATE becomes a plain BEGIN.
+STATEMENT_TRANSLATIONS = {
+    "BEGIN IMMEDIATE": "BEGIN",
+    "SELECT last_insert_rowid()": "SELECT lastval()",
+}
+
+TIMESTAMP_OID = 1114
+
+# Names for server-side cursors, unique within the process
+_cursor_names = itertools.count()
+
+# String literals are matched first so that a ? or % inside one is left alone
+_PLACEHOLDER_PATTERN = re.compile(r"'(?:[^']|'')*'|\?|%")
+
+
+def is_postgres_url(database: str) -> bool:
+    return database.startswith(POSTGRES_URL_PREFIXES)
+
+
+# Rewrites qmark placeholders to psycopg2's %s; literal percent signs are doubled so they survive formatting
+def translate_sql(sql: str) -> str:
+    sql = STATEMENT_TRANSLATIONS.get(sql.strip(), sql)
+
+    def replace(match):
+        token = match.group()
+        if token == "?":
+            return "%s"
+        return token.replace("%", "%%")
+
+    return _PLACEHOLDER_PATTERN.sub(replace, sql)
+
+
+# Bound the way sqlite3 binds them: booleans are stored as 0/1
+def adapt_parameters(parameters) -> tuple:
+    return tuple(int(value) if isinstance(value, bool) else value for value in parameters)
+
+
+def _translate_error(error) -> sqlite3.Error:
+    if isinstance(error, psycopg2.IntegrityError):
+        translated = sqlite3.IntegrityError(str(error).strip())
+    elif isinstance(error, psycopg2.DataError):
+        translated = sqlite3.DataError(str(error).strip())
+    elif isinstance(error, psycopg2.InterfaceError):
+        translated = sqlite3.InterfaceError(str(error).strip())
+    else:
+        translated = sqlite3.OperationalError(str(error).strip())
+    if getattr(error, "pgcode", None) in BUSY_SQLSTATES:
+        translated.sqlite_errorcode = sqlite3.SQLITE_BUSY
+    return translated
+
+
+# psycopg2 errors are re-raised as their sqlite3 counterparts, so the pool, the transaction manager and the
+# handlers need no backend-specific error handling
+@contextlib.contextmanager
+def _sqlite_errors():
+    try:
+        yield
+    except psycopg2.Error as e:
+        raise _translate_error(e) from e
+
+
+class PostgresCursor:
+    # The part of the sqlite3.Cursor interface the application uses, on top of a psycopg2 cursor. A `name` makes it
+    # a server-side cursor, which leaves the result on the server and fetches it batch by batch.
+    def __init__(self, connection: "PostgresConnection", name: str = None):
+        self.connection = connection
+        self.arraysize = 1
+        self._cursor = connection.raw.cursor(name) if name else connection.raw.cursor()
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    # Like SQLite's last_insert_rowid(): the id generated by the connection's most recent insert
+    @property
+    def lastrowid(self):
+        with _sqlite_errors():
+            self._cursor.execute("SELECT lastval()")
+            return self._cursor.fetchone()[0]
+
+    def execute(self, sql: str, parameters=()):
+        with _sqlite_errors():
+            if parameters:
+                self._cursor.execute(translate_sql(sql), adapt_parameters(parameters))
+            else:
+                self._cursor.execute(STATEMENT_TRANSLATIONS.get(sql.strip(), sql))
+        return self
+
+    def executemany(self, sql: str, seq_of_parameters):
+        with _sqlite_errors():
+            psycopg2.extras.execute_batch(self._cursor, translate_sql(sql),
+                                          [adapt_parameters(parameters) for parameters in seq_of_parameters])
+        return self
+
+    # Multi-row INSERT ... VALUES (?, ...) returning the new ids in row order. Ids from concurrent inserts can
+    # interleave, so unlike SQLite they cannot be derived from the last id and the row count.
+    def insert_returning_ids(self, sql: str, rows: list) -> list:
+        head, values = re.split(r"\bVALUES\b", sql, maxsplit=1, flags=re.IGNORECASE)
+        with _sqlite_errors():
+            returned = psycopg2.extras.execute_values(
+                self._cursor, f"{head}VALUES %s RETURNING id", [adapt_parameters(row) for row in rows],
+                template=translate_sql(values.strip()), page_size=len(rows), fetch=True)
+        return [row[0] for row in returned]
+
+    def fetchone(self):
+        with _sqlite_errors():
+            return self._cursor.fetchone()
+
+    def fetchmany(self, size: int = None):
+        with _sqlite_errors():
+            return self._cursor.fetchmany(self.arraysize if size is None else size)
+
+    def fetchall(self):
+        with _sqlite_errors():
+            return self._cursor.fetchall()
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def close(self):
+        self._cursor.close()
+
+
+class PostgresConnection:
+    # The part of the sqlite3.Connection interface the application uses. The psycopg2 connection runs in
+    # autocommit mode, so transactions start only where the code issues BEGIN, as with sqlite3's defaults for
+    # the explicit transactions the transaction manager and the migrations use.
+    dialect = "postgres"
+
+    def __init__(self, raw):
+        self.raw = raw
+
+    # Autocommit is only off while a streaming cursor's transaction is open (see streaming_cursor)
+    @property
+    def in_transaction(self) -> bool:
+        return not self.raw.autocommit or \
+            self.raw.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def cursor(self) -> PostgresCursor:
+        return PostgresCursor(self)
+
+    def execute(self, sql: str, parameters=()) -> PostgresCursor:
+        return self.cursor().execute(sql, parameters)
+
+    # A plain psycopg2 cursor reads the whole result into memory at execute(). Server-side cursors only live
+    # inside a transaction and psycopg2 refuses them in autocommit mode, so autocommit is switched off until the
+    # transaction ends; returning the connection to the pool rolls it back.
+    def streaming_cursor(self) -> PostgresCursor:
+        with _sqlite_errors():
+            self.raw.autocommit = False
+        return PostgresCursor(self, name=f"stream_{next(_cursor_names)}")
+
+    # Ends the transaction through psycopg2 when autocommit is off, since it only tracks transactions it began
+    def _end_transaction(self, statement: str):
+        if self.raw.autocommit:
+            self.execute(statement)
+            return
+        with _sqlite_errors():
+            self.raw.commit() if statement == "COMMIT" else self.raw.rollback()
+            self.raw.autocommit = True
+
+    def executemany(self, sql: str, seq_of_parameters) -> PostgresCursor:
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def commit(self):
+        if self.in_transaction:
+            self._end_transaction("COMMIT")
+
+    def rollback(self):
+        if self.in_transaction:
+            self._end_transaction("ROLLBACK")
+
+    def close(self):
+        with _sqlite_errors():
+            self.raw.close()
+
+
+def connect(url: str, read_only: bool = False) -> PostgresConnection:
+    if psycopg2 is None:
+        raise RuntimeError("DATABASE_URL points at PostgreSQL, but psycopg2 is not installed")
+    with _sqlite_errors():
+        # Timestamps are kept in UTC and handed back as text in SQLite's format, so ETags, Last-Modified and the
+        # JSON bodies are the same on both backends
+        raw = psycopg2.connect(url, options="-c timezone=UTC -c datestyle=ISO")
+        raw.set_session(readonly=read_only, autocommit=True)
+    timestamp_as_text = psycopg2.extensions.new_type((TIMESTAMP_OID,), "SQLITE_TIMESTAMP", lambda value, _: value)
+    psycopg2.extensions.register_type(timestamp_as_text, raw)
+    return PostgresConnection(raw)
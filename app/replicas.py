@@ -0,0 +1,86 @@
+import itertools
+import math
+import threading
+import time
+from datetime import datetime, timezone
+
+
+# How far a replica trails the primary, from the collection version watermarks of both (see collection_versions).
+# A replica that has applied every write is 0 seconds behind. Otherwise it is missing writes made after its own
+# latest one, so the time since that write is an upper bound on its staleness; erring high only costs a read
+# on the primary.
+def measure_lag(primary_revision: int, replica_revision: int, replica_updated_at: datetime, now: datetime = None):
+    if replica_revision >= primary_revision:
+        return 0.0
+    if replica_updated_at is None:
+        return math.inf
+    now = now or datetime.now(timezone.utc)
+    return max(0.0, (now - replica_updated_at).total_seconds())
+
+
+class Replica:
+    def __init__(self, database: str):
+        self.database = database
+        self.healthy = False
+        self.lag = None
+
+
+class ReplicaSet:
+    # Routes reads round-robin over the replicas that passed their last health check and trail the primary by at
+    # most `max_lag` seconds, and to the primary when none does. `watermark(database)` returns the database's
+    # (revision, updated_at) and raises when it cannot be reached; it is called at most once per `check_interval`.
+    def __init__(self, primary: str, replicas: list, watermark, max_lag: float, check_interval: float):
+        self.primary = primary
+        self.replicas = [Replica(database) for database in replicas]
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._watermark = watermark
+        self._next = itertools.count()
+        self._lock = threading.Lock()
+        self._checked_at = None
+        self._counters = {"replica_reads": 0, "primary_reads": 0, "fallbacks": 0, "health_check_failures": 0}
+
+    def refresh_due(self) -> bool:
+        return self._checked_at is None or time.monotonic() - self._checked_at >= self.check_interval
+
+    # Blocking; runs on the database executor. Concurrent callers leave the check to whoever got there first.
+    def refresh(self):
+        with self._lock:
+            if not self.refresh_due():
+                return
+            self._checked_at = time.monotonic()
+
+        try:
+            primary_revision, _ = self._watermark(self.primary)
+        except Exception:
+            # Without the primary's watermark the lags cannot be measured; keep the last known ones
+            primary_revision = None
+
+        for replica in self.replicas:
+            try:
+                revision, updated_at = self._watermark(replica.database)
+            except Exception:
+                replica.healthy = False
+                with self._lock:
+                    self._counters["health_check_failures"] += 1
+                continue
+            replica.healthy = True
+            if primary_revision is not None:
+                replica.lag = measure_lag(primary_revision, revision, updated_at)
+
+    def choose(self, primary_only: bool = False) -> str:
+        with self._lock:
+            if primary_only:
+                self._counters["primary_reads"] += 1
+                return self.primary
+            eligible = [replica for replica in self.replicas
+                        if replica.healthy and replica.lag is not None and replica.lag <= self.max_lag]
+            if not eligible:
+                self._counters["fallbacks"] += 1
+                return self.primary
+            self._counters["replica_reads"] += 1
+            return eligible[next(self._next) % len(eligible)].database
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._counters)
@@ -0,0 +1,37 @@
+import json
+from fastapi.responses import JSONResponse as StandardJSONResponse
+from app.config import JSON_SERIALIZER
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _dumps_stdlib(content) -> bytes:
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def _dumps_orjson(content) -> bytes:
+    return orjson.dumps(content)
+
+
+def select_serializer(name: str):
+    if name == "stdlib":
+        return _dumps_stdlib
+    if name == "orjson":
+        if orjson is None:
+            raise RuntimeError("JSON_SERIALIZER=orjson but orjson is not installed")
+        return _dumps_orjson
+    if name == "auto":
+        return _dumps_orjson if orjson is not None else _dumps_stdlib
+    raise ValueError(f"Unknown JSON_SERIALIZER {name!r}, expected auto, orjson or stdlib")
+
+
+# Serializer used for every response body; orjson when installed, otherwise the standard library encoder
+dumps = select_serializer(JSON_SERIALIZER)
+
+
+class JSONResponse(StandardJSONResponse):
+    def render(self, content) -> bytes:
+        return dumps(content)
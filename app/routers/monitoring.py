@@ -0,0 +1,55 @@
+from fastapi import status, APIRouter, Request
+from fastapi.responses import PlainTextResponse
+from app.cache import entity_cache
+from app.config import METRICS_ENABLED
+from app.health import database_health
+from app.metrics import registry
+from app.responses import JSONResponse
+
+router = APIRouter()
+
+
+# Hit, miss and eviction counters of the single-entity read-through cache
+@router.get("/cache/stats", status_code=status.HTTP_200_OK)
+async def get_cache_stats():
+    return JSONResponse(content={"entity_cache": entity_cache.stats()}, status_code=status.HTTP_200_OK)
+
+
+# Prometheus scrape endpoint: request, SQL and connection pool metrics in the text exposition format
+@router.get("/metrics", status_code=status.HTTP_200_OK)
+async def get_metrics():
+    if not METRICS_ENABLED:
+        return JSONResponse(content={"error": "Metrics are disabled"}, status_code=status.HTTP_404_NOT_FOUND)
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+# Liveness probe: the worker's event loop is answering. Touches neither the database nor any lock, so a busy
+# database never gets a healthy worker restarted.
+@router.get("/livez", status_code=status.HTTP_200_OK)
+async def get_liveness():
+    return JSONResponse(content={"status": "alive"}, status_code=status.HTTP_200_OK)
+
+
+# Database health: pool availability and saturation, the latency of a trivial probe query and the schema version,
+# cached for HEALTH_CHECK_CACHE_TTL seconds
+@router.get("/healthz", status_code=status.HTTP_200_OK)
+async def get_health():
+    database = await database_health.result()
+    healthy = database["status"] == "ok"
+    return JSONResponse(content={"status": "ok" if healthy else "error", "database": database},
+                        status_code=status.HTTP_200_OK if healthy else status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+# Readiness probe for load balancers: 503 until this worker has migrated the schema and warmed its connection pools,
+# statements and entity cache (see app.startup), once it starts shutting down, and while the database check fails
+@router.get("/readyz", status_code=status.HTTP_200_OK)
+async def get_readiness(request: Request):
+    if not getattr(request.app.state, "ready", False):
+        return JSONResponse(content={"status": "not ready", "error": "Warm-up has not finished"},
+                            status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
+    database = await database_health.result()
+    if database["status"] != "ok":
+        return JSONResponse(content={"status": "not ready", "database": database},
+                            status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
+    return JSONResponse(content={"status": "ready", "warmup": request.app.state.warmup, "database": database},
+                        status_code=status.HTTP_200_OK)
@@ -0,0 +1,77 @@
+from fastapi import status, Depends, APIRouter, Query, Request
+from app.config import DEFAULT_PAGE_SIZE
+from app.conditional import (collection_version, is_not_modified, make_etag, not_modified_response,
+                             query_fingerprint, validator_headers)
+from app.async_database import AsyncCursor
+from app.database_utils import get_read_db
+from app.pagination import decode_offset_token, encode_offset_token, page_size, InvalidPageTokenError
+from app.responses import JSONResponse
+from app.search_index import build_match_expression, build_tsquery, InvalidSearchQueryError
+
+router = APIRouter()
+
+SNIPPET_TOKENS = 12
+
+# Tasks and lists matching the expression, best bm25 rank first; matched terms are wrapped in <mark> in the snippets
+SEARCH_QUERY = (
+    "SELECT kind, id, list_id, snippet, rank FROM ("
+    "SELECT 'task' AS kind, todo_items.id AS id, todo_items.list_id AS list_id, "
+    f"snippet(todo_items_fts, 0, '<mark>', '</mark>', '…', {SNIPPET_TOKENS}) AS snippet, "
+    "bm25(todo_items_fts) AS rank "
+    "FROM todo_items_fts JOIN todo_items ON todo_items.id = todo_items_fts.rowid "
+    "WHERE todo_items_fts MATCH ? "
+    "UNION ALL "
+    "SELECT 'list', todo_lists_fts.rowid, todo_lists_fts.rowid, "
+    f"snippet(todo_lists_fts, 0, '<mark>', '</mark>', '…', {SNIPPET_TOKENS}), bm25(todo_lists_fts) "
+    "FROM todo_lists_fts WHERE todo_lists_fts MATCH ?"
+    ") ORDER BY rank, kind, id LIMIT ? OFFSET ?")
+
+# The PostgreSQL version over the GIN expression indexes; ts_rank grows with relevance, so it is negated to sort
+# like bm25
+HEADLINE_OPTIONS = f"StartSel=<mark>, StopSel=</mark>, MaxWords={SNIPPET_TOKENS}, MinWords={SNIPPET_TOKENS // 2}"
+POSTGRES_SEARCH_QUERY = (
+    "WITH search_terms AS (SELECT to_tsquery('simple', ?) AS query) "
+    "SELECT kind, id, list_id, snippet, rank FROM ("
+    "SELECT 'task' AS kind, todo_items.id AS id, todo_items.list_id AS list_id, "
+    f"ts_headline('simple', context, query, '{HEADLINE_OPTIONS}') AS snippet, "
+    "-ts_rank(to_tsvector('simple', context), query) AS rank "
+    "FROM todo_items, search_terms WHERE to_tsvector('simple', context) @@ query "
+    "UNION ALL "
+    "SELECT 'list', todo_lists.id, todo_lists.id, "
+    f"ts_headline('simple', title, query, '{HEADLINE_OPTIONS}'), -ts_rank(to_tsvector('simple', title), query) "
+    "FROM todo_lists, search_terms WHERE to_tsvector('simple', title) @@ query"
+    ") AS results ORDER BY rank, kind, id LIMIT ? OFFSET ?")
+
+
+@router.get("/search", status_code=status.HTTP_200_OK)
+async def search(request: Request, q: str, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1), after: str = None,
+                 db: AsyncCursor = Depends(get_read_db)):
+    try:
+        postgres = db.dialect == "postgres"
+        expression = build_tsquery(q) if postgres else build_match_expression(q)
+        offset = decode_offset_token(after)
+        limit = page_size(limit)
+
+        revisions, last_modified = await collection_version(db, "todo_items", "todo_lists")
+        etag = make_etag("search", *revisions, query_fingerprint(request))
+        if is_not_modified(request, etag, last_modified):
+            return not_modified_response(etag, last_modified)
+
+        if postgres:
+            cursor = await db.execute(POSTGRES_SEARCH_QUERY, (expression, limit + 1, offset))
+        else:
+            cursor = await db.execute(SEARCH_QUERY, (expression, expression, limit + 1, offset))
+        results = await cursor.fetchall_dicts()
+        next_page = None
+        if len(results) > limit:
+            results = results[:limit]
+            next_page = encode_offset_token(offset + limit)
+
+        return JSONResponse(content={"results": results, "next_page": next_page}, status_code=status.HTTP_200_OK,
+                            headers=validator_headers(etag, last_modified))
+
+    except (InvalidPageTokenError, InvalidSearchQueryError) as e:
+        return JSONResponse(content={"error": str(e)}, status_code=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        error_detail = {"error": "Internal Server Error", "details": str(e)}
+        return JSONResponse(content=error_detail, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
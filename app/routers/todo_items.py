@@ -1,37 +1,114 @@
-from fastapi import HTTPException, status, Depends, APIRouter
+from fastapi import HTTPException, status, Depends, APIRouter, Query, Request
+from typing import List
+from app.config import DEFAULT_PAGE_SIZE, STREAM_BATCH_SIZE, MAX_BULK_TASKS
 from app.models import ToDoTask
-from app.database_utils import get_db
-from fastapi.responses import JSONResponse
+from app.async_database import (AsyncCursor, acquire_connection, release_connection, rows_as_dicts,
+                                run_in_db_executor)
+from app.cache import entity_cache
+from app.conditional import (collection_version, is_not_modified, latest, make_etag, not_modified_response,
+                             query_fingerprint, validator_headers)
+from app.connection_pool import ConnectionPool
+from app.database_utils import get_read_db, get_transactions, insert_returning_ids, streaming_cursor
+from app.transactions import TransactionManager
+from app.pagination import decode_page_token, page_size, paginate, InvalidPageTokenError
+from app.responses import JSONResponse, dumps
+from fastapi.responses import StreamingResponse
 import sqlite3
 
 router = APIRouter()
 
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+TODO_TASKS_SELECT = (
+    "SELECT todo_items.id AS task_id, todo_items.list_id AS list_id, "
+    "todo_lists.title AS list_title, todo_items.context AS context, "
+    "todo_items.completed AS completed "
+    "FROM todo_items "
+    "LEFT JOIN todo_lists ON todo_items.list_id = todo_lists.id")
+
+# Each filter compiles to one parameterised predicate that an index (or the rowid) can serve
+TASK_FILTERS = {
+    "list_id": "todo_items.list_id = ?",
+    "user_id": "todo_items.list_id IN (SELECT id FROM todo_lists WHERE user_id = ?)",
+    "completed": "todo_items.completed = ?",
+    "max_id": "todo_items.id <= ?",
+}
+
+
+# Builds the task listing for the tasks after the keyset position `after` that match the given filters.
+# min_id is folded into that position: SQLite bounds a rowid range search by one lower bound only.
+def build_tasks_query(after: int = 0, min_id: int = None, **filters):
+    if min_id is not None:
+        after = max(after, min_id - 1)
+    active = {name: value for name, value in filters.items() if value is not None}
+    clauses = ["todo_items.id > ?"] + [TASK_FILTERS[name] for name in active]
+    query = f"{TODO_TASKS_SELECT} WHERE {' AND '.join(clauses)} ORDER BY todo_items.id"
+    return query, [after, *active.values()]
+
+
+TODO_TASKS_QUERY, _ = build_tasks_query()
+
+TODO_TASK_QUERY = (
+    "SELECT todo_items.id AS task_id, todo_items.list_id AS list_id, todo_items.context AS task, "
+    "todo_items.completed AS completed, todo_items.revision AS revision, todo_items.updated_at AS updated_at "
+    "FROM todo_items WHERE todo_items.id = ?;")
+
+
+# A task as the entity cache holds it: (payload, ETag, Last-Modified), or None when there is no such task
+def load_todo_task(cursor, task_id: int):
+    cursor.execute(TODO_TASK_QUERY, (task_id,))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    task = rows_as_dicts(cursor.description, [row])[0]
+    etag = make_etag("task", task_id, task.pop("revision"))
+    return task, etag, latest(task.pop("updated_at"))
+
+
+# Yields one JSON document per line, reading the cursor in batches so memory stays flat for any table size.
+# The generator borrows its own pooled connection because it keeps running after the handler has returned.
+async def stream_todo_tasks(pool: ConnectionPool, query: str, parameters: list):
+    connection = await acquire_connection(pool)
+    try:
+        cursor = await AsyncCursor(await run_in_db_executor(streaming_cursor, connection)).execute(query, parameters)
+        while True:
+            tasks = await cursor.fetchmany_dicts(STREAM_BATCH_SIZE)
+            if not tasks:
+                break
+            yield b"".join(dumps(task) + b"\n" for task in tasks)
+    finally:
+        await release_connection(pool, connection, commit=False)
+
 
 @router.get("/todo-items", status_code=status.HTTP_200_OK)
-def get_todo_tasks(db: sqlite3.Connection = Depends(get_db)):
+async def get_todo_tasks(request: Request, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1), after: str = None,
+                         stream: bool = False, list_id: int = None, user_id: int = None, completed: bool = None,
+                         min_id: int = None, max_id: int = None, db: AsyncCursor = Depends(get_read_db)):
     try:
-        cursor = db.execute(
-            "SELECT todo_items.id AS todo_task_id, todo_items.list_id AS list_id, "
-            "todo_items.context AS task, todo_items.completed AS status, "
-            "todo_lists.title AS title "
-            "FROM todo_items "
-            "LEFT JOIN todo_lists ON todo_items.list_id = todo_lists.id;")
-
-        todo_items = cursor.fetchall()
-
-        structured_tasks = [
-            {
-                "task_id": task[0],
-                "list_id": task[1],
-                "list_title": task[4],
-                "context": task[2],
-                "completed": task[3],
-            }
-            for task in todo_items
-        ]
-
-        return JSONResponse(content={"todo_tasks": structured_tasks}, status_code=status.HTTP_200_OK)
+        query, parameters = build_tasks_query(decode_page_token(after), list_id=list_id, user_id=user_id,
+                                              completed=None if completed is None else int(completed),
+                                              min_id=min_id, max_id=max_id)
+
+        # Tasks carry their list's title, so the listing changes with either table
+        revisions, last_modified = await collection_version(db, "todo_items", "todo_lists")
+        etag = make_etag("todo-items", *revisions, query_fingerprint(request))
+        if is_not_modified(request, etag, last_modified):
+            return not_modified_response(etag, last_modified)
+
+        if stream or NDJSON_MEDIA_TYPE in request.headers.get("accept", ""):
+            return StreamingResponse(stream_todo_tasks(request.state.read_pool, query, parameters),
+                                     media_type=NDJSON_MEDIA_TYPE, headers=validator_headers(etag, last_modified))
+
+        limit = page_size(limit)
+        cursor = await db.execute(query + " LIMIT ?;", (*parameters, limit + 1))
+
+        todo_items, next_page = paginate(await cursor.fetchall_dicts(), limit, "task_id")
+
+        return JSONResponse(content={"todo_tasks": todo_items, "next_page": next_page},
+                            status_code=status.HTTP_200_OK, headers=validator_headers(etag, last_modified))
 
+    except InvalidPageTokenError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         error_detail = {"error": "Internal Server Error", "details": str(e)}
         return JSONResponse(content=error_detail, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -39,42 +116,80 @@ def get_todo_tasks(db: sqlite3.Connection = Depends(get_db)):
 
 # Get specific task by task_id
 @router.get("/todo-items/{task_id}", status_code=status.HTTP_200_OK)
-def get_specific_task(task_id: int, db: sqlite3.Connection = Depends(get_db)):
+async def get_specific_task(task_id: int, request: Request, db: AsyncCursor = Depends(get_read_db)):
     try:
-        cursor = db.execute(
-            "SELECT todo_items.id AS task_id, todo_items.list_id, todo_items.context AS title, "
-            "todo_items.completed AS completed "
-            "FROM todo_items "
-            "WHERE todo_items.id = ?;", (task_id,))
-        todo_items = cursor.fetchone()
-        if todo_items is None:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Task not found")
+        cached = entity_cache.get("task", task_id)
+        if cached is None:
+            generation = entity_cache.generation
+            cached = await db.run(load_todo_task, task_id)
+            if cached is None:
+                return JSONResponse(content={"error": "Task not found"}, status_code=status.HTTP_404_NOT_FOUND)
+            if not db.replica:
+                entity_cache.set("task", task_id, cached, generation)
+
+        todo_items, etag, last_modified = cached
+        if is_not_modified(request, etag, last_modified):
+            return not_modified_response(etag, last_modified)
+        return JSONResponse(content={"specific_task": todo_items}, status_code=status.HTTP_200_OK,
+                            headers=validator_headers(etag, last_modified))
+
+    except Exception as e:
+        error_detail = {"error": "Internal Server Error", "details": str(e)}
+        return JSONResponse(content=error_detail, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
 
-        structured_task = {
-            "task_id": todo_items[0],
-            "list_id": todo_items[1],
-            "task": todo_items[2],
-            "completed": todo_items[3]
-        }
+def insert_tasks(cursor, list_id: int, tasks: List[ToDoTask]):
+    cursor.execute("SELECT id FROM todo_lists WHERE id=?", (list_id,))
+    if cursor.fetchone() is None:
+        return None
 
-        return JSONResponse(content={"specific_task": structured_task}, status_code=status.HTTP_200_OK)
+    return insert_returning_ids(cursor, "INSERT INTO todo_items (list_id, context, completed, updated_at) "
+                                        "VALUES (?, ?, ?, CURRENT_TIMESTAMP)",
+                                [(list_id, task.context, task.completed) for task in tasks])
 
+
+# Create many tasks for a list in a single transaction; declared before the route below so that
+# "bulk" is not taken for a user_id
+@router.post("/todo-items/{list_id}/bulk", status_code=status.HTTP_201_CREATED)
+async def create_todo_tasks_bulk(list_id: int, tasks: List[ToDoTask],
+                                 transactions: TransactionManager = Depends(get_transactions)):
+    try:
+        if len(tasks) > MAX_BULK_TASKS:
+            return JSONResponse(content={"error": f"At most {MAX_BULK_TASKS} tasks can be created per request"},
+                                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        if not tasks:
+            return JSONResponse(content={"task_ids": [], "message": "No tasks to insert"},
+                                status_code=status.HTTP_201_CREATED)
+
+        task_ids = await transactions.write(insert_tasks, list_id, tasks)
+        if task_ids is None:
+            return JSONResponse(content={"error": "List not found"}, status_code=status.HTTP_404_NOT_FOUND)
+
+        return JSONResponse(content={"task_ids": task_ids, "message": "Tasks inserted successfully"},
+                            status_code=status.HTTP_201_CREATED)
     except Exception as e:
         error_detail = {"error": "Internal Server Error", "details": str(e)}
         return JSONResponse(content=error_detail, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+# Returns the new task id, or None when the list does not exist
+def insert_task(cursor, list_id: int, context: str, completed: int):
+    cursor.execute("SELECT id FROM todo_lists WHERE id=?", (list_id,))
+    if cursor.fetchone() is None:
+        return None
+
+    cursor.execute("INSERT INTO todo_items (list_id, context, completed, updated_at) "
+                   "VALUES (?, ?, ?, CURRENT_TIMESTAMP)", [list_id, context, completed])
+    return cursor.lastrowid
+
+
 # Create a new task for specific list and user
 @router.post("/todo-items/{list_id}/{user_id}", status_code=status.HTTP_201_CREATED)
-def create_todo_task(list_id: int, user: ToDoTask, db: sqlite3.Connection = Depends(get_db)):
+async def create_todo_task(list_id: int, user: ToDoTask, transactions: TransactionManager = Depends(get_transactions)):
     try:
-        existing_list = db.execute("SELECT id FROM todo_lists WHERE id=?", (list_id,)).fetchone()
-        if not existing_list:
+        if await transactions.write(insert_task, list_id, user.context, user.completed) is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="List not found")
 
-        db.execute("INSERT INTO todo_items (list_id, context, completed) VALUES (?, ?, ?)",
-                   [list_id, user.context, user.completed])
-
         return JSONResponse(content={"message": "Task inserted successfully"},
                             status_code=status.HTTP_201_CREATED)
     except Exception as e:
@@ -82,17 +197,22 @@ def create_todo_task(list_id: int, user: ToDoTask, db: sqlite3.Connection = Depe
         return JSONResponse(content=error_detail, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+# Returns the ids of the updated tasks; empty when the list has none
+def update_list_tasks(cursor, list_id: int, context: str, completed: int) -> list:
+    cursor.execute("UPDATE todo_items SET context=?, completed=?, revision = revision + 1, "
+                   "updated_at = CURRENT_TIMESTAMP WHERE list_id=? RETURNING id", (context, completed, list_id))
+    return [row[0] for row in cursor.fetchall()]
+
+
 # Update specific task from a list
 @router.put("/todo-items/{list_id}")
-def update_user(list_id: int, user: ToDoTask, db: sqlite3.Connection = Depends(get_db)):
+async def update_user(list_id: int, user: ToDoTask, transactions: TransactionManager = Depends(get_transactions)):
     try:
-        existing_task = db.execute("SELECT * FROM todo_items WHERE list_id=?", (list_id,)).fetchone()
-
-        if existing_task is None:
+        task_ids = await transactions.write(update_list_tasks, list_id, user.context, user.completed)
+        if not task_ids:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Task not found")
 
-        db.execute("UPDATE todo_items SET context=?, completed=? WHERE list_id=?",
-                   (user.context, user.completed, list_id))
+        entity_cache.invalidate("task", *task_ids)
 
         return JSONResponse(content={"message": "Task updated successfully"}, status_code=status.HTTP_201_CREATED)
 
@@ -101,14 +221,21 @@ def update_user(list_id: int, user: ToDoTask, db: sqlite3.Connection = Depends(g
         return JSONResponse(content=error_detail, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+def delete_task(cursor, task_id: int) -> int:
+    cursor.execute("DELETE FROM todo_items WHERE id = ?", [task_id])
+    return cursor.rowcount
+
+
 # Delete task from a specific list
 @router.delete("/todo-items/{task_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_todo_item(task_id: int, db: sqlite3.Connection = Depends(get_db)):
+async def delete_todo_item(task_id: int, transactions: TransactionManager = Depends(get_transactions)):
     try:
 
-        result = db.execute("DELETE FROM todo_items WHERE id = ?", [task_id])
+        deleted_tasks = await transactions.write(delete_task, task_id)
+
+        entity_cache.invalidate("task", task_id)
 
-        if result.rowcount == 0:
+        if deleted_tasks == 0:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Todo not found")
 
         return JSONResponse(content={"message": "Task deleted successfully"}, status_code=status.HTTP_200_OK)
@@ -1,23 +1,119 @@
-from fastapi import HTTPException, status, Depends, APIRouter
+from fastapi import HTTPException, status, Depends, APIRouter, Query, Request
+from app.config import DEFAULT_PAGE_SIZE
+from app.conditional import (collection_version, is_not_modified, latest, make_etag, not_modified_response,
+                             query_fingerprint, validator_headers)
 from app.models import ToDoList
-from app.database_utils import get_db
-from fastapi.responses import JSONResponse
+from app.async_database import AsyncCursor, rows_as_dicts
+from app.cache import entity_cache
+from app.database_utils import get_read_db, get_transactions, read_snapshot
+from app.transactions import TransactionManager
+from app.pagination import decode_page_token, page_size, paginate, InvalidPageTokenError
+from app.responses import JSONResponse
 import sqlite3
 
 router = APIRouter()
 
+USER_LISTS_QUERY = "SELECT id AS list_id, title FROM todo_lists WHERE user_id = ? ORDER BY id"
+
+USER_LIST_TASKS_QUERY = (
+    "SELECT todo_items.list_id, todo_items.id, todo_items.context, todo_items.completed "
+    "FROM todo_lists JOIN todo_items ON todo_items.list_id = todo_lists.id "
+    "WHERE todo_lists.user_id = ? ORDER BY todo_items.id")
+
+TODO_LISTS_PAGE_QUERY = (
+    "SELECT todo_lists.id AS list_id, todo_lists.title AS title, users.id AS user_id "
+    "FROM todo_lists JOIN users ON todo_lists.user_id = users.id "
+    "WHERE todo_lists.id > ? ORDER BY todo_lists.id LIMIT ?;")
+
+TODO_LIST_QUERY = (
+    "SELECT todo_lists.id AS list_id, todo_lists.title AS title, users.id AS user_id, users.username, "
+    "todo_lists.revision AS revision, todo_lists.updated_at AS updated_at, "
+    "users.revision AS user_revision, users.updated_at AS user_updated_at "
+    "FROM todo_lists JOIN users ON todo_lists.user_id = users.id WHERE todo_lists.id = ?")
+
+LIST_INCLUDES = {"items"}
+
+
+# A list as the entity cache holds it: (payload, ETag, Last-Modified), or None when there is no such list
+def load_todo_list(cursor, list_id: int):
+    cursor.execute(TODO_LIST_QUERY, (list_id,))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    todo_list = rows_as_dicts(cursor.description, [row])[0]
+    # The payload embeds the owner's username, so the owner's revision is part of the version
+    etag = make_etag("list", list_id, todo_list.pop("revision"), todo_list.pop("user_revision"))
+    return todo_list, etag, latest(todo_list.pop("updated_at"), todo_list.pop("user_updated_at"))
+
+
+# A user's lists and, optionally, all of their tasks: one query per table however many lists there are,
+# with the tasks attached to their lists in memory
+def fetch_user_lists(cursor, user_id: int, include_items: bool):
+    # The lists and their tasks are read from one snapshot, so every task belongs to a list that was read
+    with read_snapshot(cursor):
+        cursor.execute("SELECT id FROM users WHERE id = ?", (user_id,))
+        if cursor.fetchone() is None:
+            return None
+
+        cursor.execute(USER_LISTS_QUERY, (user_id,))
+        todo_lists = rows_as_dicts(cursor.description, cursor.fetchall())
+        if include_items:
+            tasks_by_list = {}
+            for todo_list in todo_lists:
+                todo_list["tasks"] = tasks_by_list[todo_list["list_id"]] = []
+            for list_id, task_id, context, completed in cursor.execute(USER_LIST_TASKS_QUERY, (user_id,)):
+                tasks_by_list[list_id].append({"task_id": task_id, "context": context, "completed": completed})
+    return todo_lists
+
 
 @router.get("/todo-lists", status_code=status.HTTP_200_OK)
-def get_all_todo_lists(db: sqlite3.Connection = Depends(get_db)):
+async def get_all_todo_lists(request: Request, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1), after: str = None,
+                             db: AsyncCursor = Depends(get_read_db)):
     try:
-        cursor = db.execute(
-            "SELECT todo_lists.id AS list_id, todo_lists.title AS list_title, users.id AS user_id, users.username "
-            "FROM todo_lists JOIN users ON todo_lists.user_id = users.id;")
-        todo_lists = cursor.fetchall()
-        structured_lists = [{"list_id": todo_list[0], "title": todo_list[1], "user_id": todo_list[2]}
-                            for todo_list in todo_lists]
+        limit = page_size(limit)
+        # The listing joins users, so it changes with either table
+        revisions, last_modified = await collection_version(db, "todo_lists", "users")
+        etag = make_etag("todo-lists", *revisions, query_fingerprint(request))
+        if is_not_modified(request, etag, last_modified):
+            return not_modified_response(etag, last_modified)
+
+        cursor = await db.execute(TODO_LISTS_PAGE_QUERY, (decode_page_token(after), limit + 1))
+        todo_lists, next_page = paginate(await cursor.fetchall_dicts(), limit, "list_id")
+
+        return JSONResponse(content={"todo_lists": todo_lists, "next_page": next_page},
+                            status_code=status.HTTP_200_OK, headers=validator_headers(etag, last_modified))
 
-        return JSONResponse(content={"todo_lists": structured_lists}, status_code=status.HTTP_200_OK)
+    except InvalidPageTokenError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        error_detail = {"error": "Internal Server Error", "details": str(e)}
+        return JSONResponse(content=error_detail, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+# Get every list of a user, with their tasks embedded when asked for with ?include=items
+@router.get("/users/{user_id}/todo-lists", status_code=status.HTTP_200_OK)
+async def get_user_todo_lists(user_id: int, request: Request, include: str = None,
+                              db: AsyncCursor = Depends(get_read_db)):
+    try:
+        includes = set(filter(None, (include or "").split(",")))
+        if not includes <= LIST_INCLUDES:
+            unsupported = ", ".join(sorted(includes - LIST_INCLUDES))
+            return JSONResponse(content={"error": f"Unsupported include: {unsupported}"},
+                                status_code=status.HTTP_400_BAD_REQUEST)
+        include_items = "items" in includes
+
+        tables = ("users", "todo_lists", "todo_items") if include_items else ("users", "todo_lists")
+        revisions, last_modified = await collection_version(db, *tables)
+        etag = make_etag("user-lists", user_id, *revisions, query_fingerprint(request))
+        if is_not_modified(request, etag, last_modified):
+            return not_modified_response(etag, last_modified)
+
+        todo_lists = await db.run(fetch_user_lists, user_id, include_items)
+        if todo_lists is None:
+            return JSONResponse(content={"error": "User not found"}, status_code=status.HTTP_404_NOT_FOUND)
+
+        return JSONResponse(content={"user_id": user_id, "todo_lists": todo_lists}, status_code=status.HTTP_200_OK,
+                            headers=validator_headers(etag, last_modified))
 
     except Exception as e:
         error_detail = {"error": "Internal Server Error", "details": str(e)}
@@ -26,33 +122,40 @@ def get_all_todo_lists(db: sqlite3.Connection = Depends(get_db)):
 
 # Get Specific List
 @router.get("/todo-lists/{list_id}", status_code=status.HTTP_200_OK)
-def get_a_specific_todo_list(list_id: int, db: sqlite3.Connection = Depends(get_db)):
+async def get_a_specific_todo_list(list_id: int, request: Request, db: AsyncCursor = Depends(get_read_db)):
     try:
-        cursor = db.execute(
-            "SELECT todo_lists.id AS list_id, todo_lists.title AS list_title, users.id AS user_id, users.username "
-            "FROM todo_lists JOIN users ON todo_lists.user_id = users.id WHERE todo_lists.id = ?", (list_id,))
-        todo_list = cursor.fetchone()
-
-        if todo_list is not None:
-            structured_list = {"list_id": todo_list[0], "title": todo_list[1], "user_id": todo_list[2],
-                               "username": todo_list[3]}
-            return JSONResponse(content={"todo_list": structured_list}, status_code=status.HTTP_200_OK)
-        else:
-            return JSONResponse(content={"error": "List not found"}, status_code=status.HTTP_404_NOT_FOUND)
+        cached = entity_cache.get("list", list_id)
+        if cached is None:
+            generation = entity_cache.generation
+            cached = await db.run(load_todo_list, list_id)
+            if cached is None:
+                return JSONResponse(content={"error": "List not found"}, status_code=status.HTTP_404_NOT_FOUND)
+            if not db.replica:
+                entity_cache.set("list", list_id, cached, generation)
+
+        todo_list, etag, last_modified = cached
+        if is_not_modified(request, etag, last_modified):
+            return not_modified_response(etag, last_modified)
+        return JSONResponse(content={"todo_list": todo_list}, status_code=status.HTTP_200_OK,
+                            headers=validator_headers(etag, last_modified))
 
     except Exception as e:
         error_detail = {"error": "Error encountered, check details", "details": str(e)}
         return JSONResponse(content=error_detail, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+def insert_todo_list(cursor, user_id: int, title: str) -> int:
+    cursor.execute("INSERT INTO todo_lists (user_id, title, updated_at) VALUES ( ?, ?, CURRENT_TIMESTAMP)",
+                   [user_id, title])
+    return cursor.lastrowid
+
+
 # Create a New List to a specific user
 @router.post("/todo-lists", status_code=status.HTTP_201_CREATED)
-def create_todo_list(todo_list: ToDoList, db: sqlite3.Connection = Depends(get_db)):
+async def create_todo_list(todo_list: ToDoList, transactions: TransactionManager = Depends(get_transactions)):
     try:
 
-        db.execute("INSERT INTO todo_lists (user_id, title) VALUES ( ?, ?)", [todo_list.user_id, todo_list.title])
-
-        list_id = db.lastrowid
+        list_id = await transactions.write(insert_todo_list, todo_list.user_id, todo_list.title)
 
         return JSONResponse(content={"list_id": f"{list_id}", "message": "List created successfully"},
                             status_code=status.HTTP_201_CREATED)
@@ -61,17 +164,21 @@ def create_todo_list(todo_list: ToDoList, db: sqlite3.Connection = Depends(get_d
         return JSONResponse(content=error_detail, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+# Returns the number of updated lists: 0 when the list does not exist
+def update_todo_list(cursor, list_id: int, title: str) -> int:
+    cursor.execute("UPDATE todo_lists SET title=?, revision = revision + 1, updated_at = CURRENT_TIMESTAMP "
+                   "WHERE id=?", (title, list_id))
+    return cursor.rowcount
+
+
 # Update Specific Lists
 @router.put("/todo-lists/{list_id}")
-def update_list(list_id: int, user: ToDoList, db: sqlite3.Connection = Depends(get_db)):
+async def update_list(list_id: int, user: ToDoList, transactions: TransactionManager = Depends(get_transactions)):
     try:
-        existing_list = db.execute("SELECT * FROM todo_lists WHERE id=?", (list_id,)).fetchone()
-
-        if existing_list is None:
+        if await transactions.write(update_todo_list, list_id, user.title) == 0:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="List not found")
 
-        db.execute("UPDATE todo_lists SET title=? WHERE id=?",
-                   (user.title, list_id))
+        entity_cache.invalidate("list", list_id)
 
         return JSONResponse(content={"message": "List updated successfully"}, status_code=status.HTTP_201_CREATED)
 
@@ -80,17 +187,27 @@ def update_list(list_id: int, user: ToDoList, db: sqlite3.Connection = Depends(g
         return JSONResponse(content=error_detail, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+# Deletes the list with its tasks; returns the deleted task ids and list count
+def delete_todo_list(cursor, list_id: int):
+    # Delete from todo_items
+    cursor.execute("DELETE FROM todo_items WHERE list_id = ? RETURNING id", [list_id])
+    task_ids = [row[0] for row in cursor.fetchall()]
+
+    # Delete from todo_lists
+    cursor.execute("DELETE FROM todo_lists WHERE id = ?", [list_id])
+    return task_ids, cursor.rowcount
+
+
 # Delete Specific List
 @router.delete("/todo-lists/{list_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_list_user(list_id: int, db: sqlite3.Connection = Depends(get_db)):
+async def delete_list_user(list_id: int, transactions: TransactionManager = Depends(get_transactions)):
     try:
-        # Delete from todo_items
-        result_todo_items = db.execute("DELETE FROM todo_items WHERE list_id = ?", [list_id])
+        task_ids, deleted_lists = await transactions.write(delete_todo_list, list_id)
 
-        # Delete from todo_lists
-        result_todo_lists = db.execute("DELETE FROM todo_lists WHERE id = ?", [list_id])
+        entity_cache.invalidate("task", *task_ids)
+        entity_cache.invalidate("list", list_id)
 
-        if result_todo_items.rowcount == 0 and result_todo_lists.rowcount == 0:
+        if not task_ids and deleted_lists == 0:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="To Do List not found")
 
         return JSONResponse(content={"message": "List and all related tasks deleted"}, status_code=status.HTTP_200_OK)
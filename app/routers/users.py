@@ -1,23 +1,55 @@
-from fastapi import HTTPException, status, Depends, APIRouter
-from app.models import User, DeleteUser
-from app.database_utils import get_db, hash_password
-from fastapi.responses import JSONResponse
+from fastapi import HTTPException, status, Depends, APIRouter, Query, Request
+from app.config import DEFAULT_PAGE_SIZE
+from app.conditional import (collection_version, is_not_modified, latest, make_etag, not_modified_response,
+                             query_fingerprint, validator_headers)
+from app.models import User, DeleteUser, Login
+from app.async_database import AsyncCursor, rows_as_dicts
+from app.cache import entity_cache
+from app.database_utils import get_primary_read_db, get_read_db, get_transactions
+from app.transactions import TransactionManager
+from app.passwords import hash_password, verify_password, verify_unknown_user
+from app.pagination import decode_page_token, page_size, paginate, InvalidPageTokenError
+from app.responses import JSONResponse
 import sqlite3
 
 router = APIRouter()
 
+USERS_PAGE_QUERY = "SELECT id AS user_id, username, email AS mail FROM users WHERE id > ? ORDER BY id LIMIT ?"
+
+USER_QUERY = "SELECT id AS user_id, username, email AS mail, revision, updated_at FROM users WHERE id = ?"
+
+
+# A user as the entity cache holds it: (payload, ETag, Last-Modified), or None when there is no such user
+def load_user(cursor, user_id: int):
+    cursor.execute(USER_QUERY, (user_id,))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    user = rows_as_dicts(cursor.description, [row])[0]
+    etag = make_etag("user", user_id, user.pop("revision"))
+    return user, etag, latest(user.pop("updated_at"))
+
 
 @router.get("/users", status_code=status.HTTP_200_OK)
-def get_users(db: sqlite3.Connection = Depends(get_db)):
+async def get_users(request: Request, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1), after: str = None,
+                    db: AsyncCursor = Depends(get_read_db)):
 
     try:
+        limit = page_size(limit)
+        (revision,), last_modified = await collection_version(db, "users")
+        etag = make_etag("users", revision, query_fingerprint(request))
+        if is_not_modified(request, etag, last_modified):
+            return not_modified_response(etag, last_modified)
+
         cursor = db
-        cursor.execute("SELECT id, username, email FROM users")
-        users = cursor.fetchall()
-        structured_users = [{"user_id": user[0], "username": user[1], "mail": user[2]} for user in users]
+        await cursor.execute(USERS_PAGE_QUERY, (decode_page_token(after), limit + 1))
+        users, next_page = paginate(await cursor.fetchall_dicts(), limit, "user_id")
 
-        return JSONResponse(content={"users": structured_users}, status_code=status.HTTP_200_OK)
+        return JSONResponse(content={"users": users, "next_page": next_page},
+                            status_code=status.HTTP_200_OK, headers=validator_headers(etag, last_modified))
 
+    except InvalidPageTokenError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         error_detail = {"error": "Internal Server Error", "details": str(e)}
         return JSONResponse(content=error_detail, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -25,34 +57,43 @@ def get_users(db: sqlite3.Connection = Depends(get_db)):
 
 # Get Specific User
 @router.get("/users/{user_id}", status_code=status.HTTP_200_OK)
-def get_specific_user(user_id: int, db: sqlite3.Connection = Depends(get_db)):
+async def get_specific_user(user_id: int, request: Request, db: AsyncCursor = Depends(get_read_db)):
     try:
-        cursor = db
-        cursor.execute("SELECT id, username, email FROM users WHERE id = ?", (user_id,))
-        user = cursor.fetchone()
-
-        if user:
-            structured_user = {"user_id": user[0], "username": user[1], "mail": user[2]}
-            return JSONResponse(content={"user": structured_user}, status_code=status.HTTP_200_OK)
-        else:
-            return JSONResponse(content={"error": "User not found"}, status_code=status.HTTP_404_NOT_FOUND)
+        cached = entity_cache.get("user", user_id)
+        if cached is None:
+            generation = entity_cache.generation
+            cached = await db.run(load_user, user_id)
+            if cached is None:
+                return JSONResponse(content={"error": "User not found"}, status_code=status.HTTP_404_NOT_FOUND)
+            # Rows from a replica can be older than the primary, so only the primary fills the cache
+            if not db.replica:
+                entity_cache.set("user", user_id, cached, generation)
+
+        user, etag, last_modified = cached
+        if is_not_modified(request, etag, last_modified):
+            return not_modified_response(etag, last_modified)
+        return JSONResponse(content={"user": user}, status_code=status.HTTP_200_OK,
+                            headers=validator_headers(etag, last_modified))
 
     except Exception as e:
         error_detail = {"error": "Internal Server Error", "details": str(e)}
         return JSONResponse(content=error_detail, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+def insert_user(cursor, username: str, email: str, password: str) -> int:
+    cursor.execute("INSERT INTO users (username, email, password, updated_at) VALUES (?, ?, ?, CURRENT_TIMESTAMP)",
+                   [username, email, password])
+    return cursor.lastrowid
+
+
 # Create New User
 @router.post("/users", status_code=status.HTTP_201_CREATED)
-def create_user(user: User, db: sqlite3.Connection = Depends(get_db)):
+async def create_user(user: User, transactions: TransactionManager = Depends(get_transactions)):
     try:
 
-        hashed_password = hash_password(user.password)
-
-        db.execute("INSERT INTO users (username, email, password) VALUES (?, ?, ?)",
-                   [user.username, user.email, hashed_password])
+        hashed_password = await hash_password(user.password)
 
-        user_id = db.lastrowid
+        user_id = await transactions.write(insert_user, user.username, user.email, hashed_password)
 
         return JSONResponse(content={"user_id": user_id, "message": "User created successfully"},
                             status_code=status.HTTP_201_CREATED)
@@ -62,18 +103,64 @@ def create_user(user: User, db: sqlite3.Connection = Depends(get_db)):
         return JSONResponse(content=error_detail, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+# Only replaces the hash that was verified, in case the password changed in the meantime
+def replace_password_hash(cursor, user_id: int, old_hash: str, new_hash: str):
+    cursor.execute("UPDATE users SET password = ? WHERE id = ? AND password = ?", (new_hash, user_id, old_hash))
+
+
+# Check a user's credentials, read from the primary since a replica may not have a new or changed password yet;
+# hashes in the legacy format or with outdated parameters are upgraded on success
+@router.post("/login", status_code=status.HTTP_200_OK)
+async def login(credentials: Login, db: AsyncCursor = Depends(get_primary_read_db),
+                transactions: TransactionManager = Depends(get_transactions)):
+    try:
+        await db.execute("SELECT id, password FROM users WHERE username = ?", (credentials.username,))
+        existing_user = await db.fetchone()
+        if existing_user is None:
+            valid, new_hash = await verify_unknown_user(credentials.password)
+        else:
+            valid, new_hash = await verify_password(credentials.password, existing_user[1])
+        if not valid:
+            return JSONResponse(content={"error": "Invalid username or password"},
+                                status_code=status.HTTP_401_UNAUTHORIZED)
+
+        user_id = existing_user[0]
+        if new_hash is not None:
+            await transactions.write(replace_password_hash, user_id, existing_user[1], new_hash)
+
+        return JSONResponse(content={"user_id": user_id, "message": "Login successful"},
+                            status_code=status.HTTP_200_OK)
+
+    except Exception as e:
+        error_detail = {"error": "Internal Server Error", "details": str(e)}
+        return JSONResponse(content=error_detail, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+# Returns the ids of the user's lists, or None when the user does not exist; a None password keeps the current one
+def update_user_row(cursor, user_id: int, username: str, email: str, password: str):
+    cursor.execute("UPDATE users SET username=?, email=?, password=COALESCE(?, password), revision = revision + 1, "
+                   "updated_at = CURRENT_TIMESTAMP WHERE id=?", (username, email, password, user_id))
+    if cursor.rowcount == 0:
+        return None
+
+    # Cached lists embed the username, so they go stale together with the user
+    cursor.execute("SELECT id FROM todo_lists WHERE user_id = ?", (user_id,))
+    return [row[0] for row in cursor.fetchall()]
+
+
 # Update Specific User
 @router.put("/users/{user_id}")
-def update_user(user_id: int, user: User, db: sqlite3.Connection = Depends(get_db)):
+async def update_user(user_id: int, user: User, transactions: TransactionManager = Depends(get_transactions)):
     try:
-        existing_user = db.execute("SELECT * FROM USERS WHERE id=?", (user_id,)).fetchone()
-        if existing_user is None:
+        hashed_password = await hash_password(user.password) if user.password else None
+
+        list_ids = await transactions.write(update_user_row, user_id, user.username, user.email, hashed_password)
+        if list_ids is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
 
-        hashed_password = hash_password(user.password) if user.password else existing_user[3]
+        entity_cache.invalidate("user", user_id)
+        entity_cache.invalidate("list", *list_ids)
 
-        db.execute("UPDATE users SET username=?, email=?, password=? WHERE id=?",
-                   (user.username, user.email, hashed_password, user_id))
         return JSONResponse(content={"message": "User updated successfully"}, status_code=status.HTTP_201_CREATED)
 
     except Exception as e:
@@ -81,20 +168,33 @@ def update_user(user_id: int, user: User, db: sqlite3.Connection = Depends(get_d
         return JSONResponse(content=error_detail, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+# Deletes the user with its lists and tasks; returns the deleted task ids, list ids and user count
+def delete_user_rows(cursor, user_id: int):
+    # Delete tasks associated with the user
+    cursor.execute("DELETE FROM todo_items WHERE list_id IN (SELECT id FROM todo_lists WHERE user_id = ?) "
+                   "RETURNING id", [user_id])
+    task_ids = [row[0] for row in cursor.fetchall()]
+
+    # Delete lists associated with the user
+    cursor.execute("DELETE FROM todo_lists WHERE user_id = ? RETURNING id", [user_id])
+    list_ids = [row[0] for row in cursor.fetchall()]
+
+    # Delete the user
+    cursor.execute("DELETE FROM users WHERE id = ?", [user_id])
+    return task_ids, list_ids, cursor.rowcount
+
+
 # Delete Specific User
 @router.delete("/users/{user_id}", status_code=status.HTTP_200_OK)
-def delete_user(user_id: int, db: sqlite3.Connection = Depends(get_db)):
+async def delete_user(user_id: int, transactions: TransactionManager = Depends(get_transactions)):
     try:
-        # Delete tasks associated with the user
-        db.execute("DELETE FROM todo_items WHERE list_id IN (SELECT id FROM todo_lists WHERE user_id = ?)", [user_id])
-
-        # Delete lists associated with the user
-        db.execute("DELETE FROM todo_lists WHERE user_id = ?", [user_id])
+        task_ids, list_ids, deleted_users = await transactions.write(delete_user_rows, user_id)
 
-        # Delete the user
-        result = db.execute("DELETE FROM users WHERE id = ?", [user_id])
+        entity_cache.invalidate("task", *task_ids)
+        entity_cache.invalidate("list", *list_ids)
+        entity_cache.invalidate("user", user_id)
 
-        if result.rowcount == 0:
+        if deleted_users == 0:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
 
         return JSONResponse(content={"message": "User deleted successfully"}, status_code=status.HTTP_200_OK)
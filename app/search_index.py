@@ -0,0 +1,66 @@
+# Rebuilds the full-text search indexes from the todo_items and todo_lists tables.
+# Migration 0005 indexes existing rows when it is applied; run this after bulk loads that bypassed the
+# triggers or to repair a database restored from an older backup.
+#
+#   python -m app.search_index [--database ./data/my_todo.db]
+import argparse
+import re
+import sqlite3
+from app.database_utils import connect, get_database_path, initialize_db
+from app.postgres import is_postgres_url
+
+SEARCH_INDEXES = ("todo_items_fts", "todo_lists_fts")
+
+_TERM_PATTERN = re.compile(r"\w+\*?")
+
+
+class InvalidSearchQueryError(ValueError):
+    pass
+
+
+# Turns free text into an FTS5 expression that matches every term. Each term is quoted, so FTS5 operators
+# and punctuation in user input cannot produce a syntax error; a trailing * keeps prefix matching.
+def build_match_expression(text: str) -> str:
+    terms = _TERM_PATTERN.findall(text or "")
+    if not terms:
+        raise InvalidSearchQueryError("Search query must contain at least one word")
+    return " ".join(f'"{term[:-1]}"*' if term.endswith("*") else f'"{term}"' for term in terms)
+
+
+# The same terms as a PostgreSQL tsquery: every term must match and a trailing * becomes a :* prefix match
+def build_tsquery(text: str) -> str:
+    terms = _TERM_PATTERN.findall(text or "")
+    if not terms:
+        raise InvalidSearchQueryError("Search query must contain at least one word")
+    return " & ".join(f"'{term[:-1]}':*" if term.endswith("*") else f"'{term}'" for term in terms)
+
+
+def rebuild_search_indexes(connection: sqlite3.Connection):
+    for index in SEARCH_INDEXES:
+        connection.execute(f"INSERT INTO {index} ({index}) VALUES ('rebuild')")
+    connection.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the full-text search indexes")
+    parser.add_argument("--database", default=None,
+                        help="SQLite database file (defaults to DATABASE_URL); PostgreSQL needs no rebuild")
+    args = parser.parse_args()
+
+    database = args.database or get_database_path()
+    if is_postgres_url(database):
+        # The GIN indexes of migration 0005 index expressions over the tables themselves, so nothing can go stale
+        print("Nothing to rebuild: on PostgreSQL the full-text indexes are maintained by the database")
+        return
+    initialize_db(database)
+    connection = connect(database)
+    try:
+        rebuild_search_indexes(connection)
+        counts = {index: connection.execute(f"SELECT COUNT(*) FROM {index}").fetchone()[0] for index in SEARCH_INDEXES}
+    finally:
+        connection.close()
+    print(", ".join(f"{index}: {count} rows" for index, count in counts.items()))
+
+
+if __name__ == "__main__":
+    main()
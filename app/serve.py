@@ -0,0 +1,96 @@
+# Production entry point: runs the API on several uvicorn worker processes instead of the single --reload dev server.
+# The schema is migrated once in the parent before the workers start. Each worker uses uvloop and httptools when
+# they are installed (uvicorn[standard]) and is replaced after SERVER_MAX_REQUESTS requests. On SIGTERM/SIGINT the
+# workers stop accepting connections and get SERVER_GRACEFUL_SHUTDOWN_TIMEOUT seconds to finish in-flight requests.
+# With more than one worker the entity cache is switched off (see worker_environment).
+#
+#   python -m app.serve [--host 0.0.0.0] [--port 8000] [--workers 4] [--max-requests 10000]
+import argparse
+import importlib.util
+import inspect
+import os
+import uvicorn
+from app.config import (ENTITY_CACHE_MAX_ENTRIES, SERVER_BACKLOG, SERVER_GRACEFUL_SHUTDOWN_TIMEOUT,
+                        SERVER_MAX_REQUESTS, SERVER_MAX_REQUESTS_JITTER, SERVER_WORKERS)
+from app.database_utils import get_database_path, initialize_db
+from app.postgres import is_postgres_url
+
+
+def default_workers() -> int:
+    if SERVER_WORKERS > 0:
+        return SERVER_WORKERS
+    # Only the cores this process may run on, which is what a container's CPU set limits
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def event_loop() -> str:
+    return "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+
+
+def http_protocol() -> str:
+    return "httptools" if importlib.util.find_spec("httptools") else "h11"
+
+
+# Environment overrides for the worker processes. The entity cache lives in each worker and a write invalidates only
+# the worker that served it, so with several workers another one could answer with a stale entity (or a 304 for
+# it) until ENTITY_CACHE_TTL runs out; it stays on for a single worker, where every write invalidates it.
+def worker_environment(workers: int) -> dict:
+    if workers > 1 and ENTITY_CACHE_MAX_ENTRIES > 0:
+        return {"ENTITY_CACHE_MAX_ENTRIES": "0"}
+    return {}
+
+
+def server_config(args) -> dict:
+    config = {
+        "host": args.host,
+        "port": args.port,
+        "workers": args.workers,
+        "loop": event_loop(),
+        "http": http_protocol(),
+        "backlog": args.backlog,
+        "limit_max_requests": args.max_requests or None,
+        "timeout_graceful_shutdown": args.graceful_shutdown_timeout,
+        "proxy_headers": True,
+        "access_log": args.access_log,
+        "log_level": args.log_level,
+    }
+    # Spreads the recycling of workers that started together; only recent uvicorn releases support it
+    if args.max_requests and "limit_max_requests_jitter" in inspect.signature(uvicorn.Config).parameters:
+        config["limit_max_requests_jitter"] = args.max_requests_jitter
+    return config
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the API with multiple worker processes")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=default_workers())
+    parser.add_argument("--max-requests", type=int, default=SERVER_MAX_REQUESTS,
+                        help="recycle a worker after this many requests (0 disables recycling)")
+    parser.add_argument("--max-requests-jitter", type=int, default=SERVER_MAX_REQUESTS_JITTER)
+    parser.add_argument("--graceful-shutdown-timeout", type=int, default=SERVER_GRACEFUL_SHUTDOWN_TIMEOUT)
+    parser.add_argument("--backlog", type=int, default=SERVER_BACKLOG)
+    parser.add_argument("--access-log", action="store_true", help="log every request (off: it costs throughput)")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    # Migrating before the workers start means they start on an up-to-date schema instead of queueing on the
+    # migration lock; their own startup check then finds nothing to do
+    database = get_database_path()
+    if not is_postgres_url(database):
+        os.makedirs(os.path.dirname(database) or ".", exist_ok=True)
+    version = initialize_db(database)
+    config = server_config(args)
+    # Set before uvicorn spawns the workers, which read their configuration when they import the app
+    environment = worker_environment(args.workers)
+    os.environ.update(environment)
+    print(f"Schema version {version} on {database}; starting {args.workers} workers "
+          f"({config['loop']}, {config['http']}{', entity cache off' if environment else ''})")
+    uvicorn.run("app.main:app", **config)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import contextvars
+import json
+import sqlite3
+import threading
+import time
+from app.config import SLOW_QUERY_LOG, SLOW_QUERY_THRESHOLD
+
+# The ASGI scope of the request being served. Set by RequestScopeMiddleware before routing; the router stores the
+# matched route in the same dict, so the route template is available by the time any SQL runs.
+current_scope = contextvars.ContextVar("current_scope", default=None)
+
+# Only statements the query planner can explain; BEGIN, COMMIT, PRAGMA and friends are logged without a plan
+EXPLAINABLE_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE", "REPLACE", "WITH"}
+
+
+def current_route() -> str:
+    scope = current_scope.get()
+    if scope is None:
+        return None
+    route = scope.get("route")
+    return getattr(route, "path", "unmatched")
+
+
+# Values are replaced by their type (and length for text and blobs), so the log shows the shape of the
+# parameters without leaking emails, password hashes or task contents; ids and flags are kept as they are
+def redact_value(value):
+    if value is None or isinstance(value, (bool, int)):
+        return value
+    if isinstance(value, (str, bytes)):
+        return f"<{type(value).__name__}:{len(value)}>"
+    return f"<{type(value).__name__}>"
+
+
+def redact_parameters(parameters):
+    if isinstance(parameters, dict):
+        return {name: redact_value(value) for name, value in parameters.items()}
+    return [redact_value(value) for value in parameters]
+
+
+def explain_query_plan(connection: sqlite3.Connection, sql: str, parameters) -> list:
+    # A plain cursor, so explaining is neither timed nor logged itself
+    cursor = sqlite3.Cursor(connection)
+    try:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", parameters)
+        return [{"id": row[0], "parent": row[1], "detail": row[3]} for row in cursor.fetchall()]
+    except sqlite3.Error as e:
+        return [{"error": str(e)}]
+    finally:
+        cursor.close()
+
+
+class SlowQueryLog:
+    # Appends one JSON object per statement slower than `threshold` seconds to `path`
+    def __init__(self, path: str, threshold: float):
+        self.path = path
+        self.threshold = threshold
+        self._lock = threading.Lock()
+
+    def record(self, connection: sqlite3.Connection, sql: str, parameters, operation: str, duration: float,
+               rows: int = None):
+        entry = {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "duration_ms": round(duration * 1000, 3),
+            "route": current_route(),
+            "operation": operation,
+            "sql": " ".join(sql.split()),
+            "parameters": redact_parameters(parameters),
+            "rows": rows,
+            "plan": explain_query_plan(connection, sql, parameters) if operation in EXPLAINABLE_OPERATIONS else None,
+        }
+        line = json.dumps(entry, default=str) + "\n"
+        with self._lock, open(self.path, "a") as log:
+            log.write(line)
+
+
+slow_query_log = SlowQueryLog(SLOW_QUERY_LOG, SLOW_QUERY_THRESHOLD) if SLOW_QUERY_LOG else None
@@ -0,0 +1,105 @@
+import os
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI
+from app.async_database import run_in_db_executor
+from app.cache import entity_cache
+from app.conditional import collection_version_query
+from app.config import ENTITY_CACHE_PRELOAD, WARMUP_CONNECTIONS
+from app.database_utils import (close_pools, close_transaction_managers, get_database_path, get_pool, get_read_pool,
+                                initialize_db)
+from app.postgres import is_postgres_url
+from app.routers.todo_items import TODO_TASK_QUERY, TODO_TASKS_QUERY, load_todo_task
+from app.routers.todo_lists import (TODO_LIST_QUERY, TODO_LISTS_PAGE_QUERY, USER_LIST_TASKS_QUERY, USER_LISTS_QUERY,
+                                    load_todo_list)
+from app.routers.users import USER_QUERY, USERS_PAGE_QUERY, load_user
+
+# The read statements behind the hot GET endpoints, with parameters that match no rows. sqlite3 keeps compiled
+# statements in a per-connection cache keyed by their text, so running them once on a new connection spares the
+# first requests the parsing and planning; on PostgreSQL it pulls the catalog and index pages into memory.
+WARMUP_STATEMENTS = [
+    (USERS_PAGE_QUERY, (0, 0)),
+    (USER_QUERY, (0,)),
+    (TODO_LISTS_PAGE_QUERY, (0, 0)),
+    (TODO_LIST_QUERY, (0,)),
+    (USER_LISTS_QUERY, (0,)),
+    (USER_LIST_TASKS_QUERY, (0,)),
+    # The unfiltered page of GET /todo-items, spelled the way the handler appends its limit
+    (TODO_TASKS_QUERY + " LIMIT ?;", (0, 0)),
+    (TODO_TASK_QUERY, (0,)),
+    (collection_version_query(1), ("",)),
+    (collection_version_query(2), ("", "")),
+]
+
+# Entity cache kind, the table its ids come from and the loader the GET handler fills the cache with
+PRELOADED_ENTITIES = [
+    ("user", "users", load_user),
+    ("list", "todo_lists", load_todo_list),
+    ("task", "todo_items", load_todo_task),
+]
+
+
+def prepare_statements(connection):
+    cursor = connection.cursor()
+    try:
+        for sql, parameters in WARMUP_STATEMENTS:
+            cursor.execute(sql, parameters).fetchall()
+    finally:
+        cursor.close()
+
+
+# Fills the entity cache with the newest `limit` entities of each kind, on the assumption that recent rows are the
+# ones clients ask for; the newest are set last so they are also the last to be evicted
+def preload_entity_cache(limit: int) -> int:
+    limit = min(limit, entity_cache.max_entries // len(PRELOADED_ENTITIES))
+    if not entity_cache.enabled or limit <= 0:
+        return 0
+
+    generation = entity_cache.generation
+    loaded = 0
+    with get_read_pool().connection() as connection:
+        cursor = connection.cursor()
+        for kind, table, load in PRELOADED_ENTITIES:
+            cursor.execute(f"SELECT id FROM {table} ORDER BY id DESC LIMIT ?", (limit,))
+            for (entity_id,) in reversed(cursor.fetchall()):
+                cached = load(cursor, entity_id)
+                if cached is not None:
+                    entity_cache.set(kind, entity_id, cached, generation)
+                    loaded += 1
+        cursor.close()
+    return loaded
+
+
+# Blocking; brings the schema up to date and warms the pools and the entity cache
+def warm_up() -> dict:
+    started = time.perf_counter()
+    database = get_database_path()
+    if not is_postgres_url(database):
+        os.makedirs(os.path.dirname(database) or ".", exist_ok=True)
+    version = initialize_db(database)
+
+    connections = get_pool(database).warm(WARMUP_CONNECTIONS)
+    connections += get_read_pool(database).warm(WARMUP_CONNECTIONS, prepare_statements)
+    cached = preload_entity_cache(ENTITY_CACHE_PRELOAD)
+    return {
+        "schema_version": version,
+        "connections": connections,
+        "prepared_statements": len(WARMUP_STATEMENTS),
+        "cached_entities": cached,
+        "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+# Runs once per worker process. The server accepts no requests until the warm-up has finished, and GET /readyz
+# reports the worker ready from then until shutdown begins.
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.warmup = await run_in_db_executor(warm_up)
+    app.state.ready = True
+    try:
+        yield
+    finally:
+        app.state.ready = False
+        # Lets the write pipelines commit what is still queued before the pools close
+        await close_transaction_managers()
+        close_pools()
@@ -0,0 +1,194 @@
+import asyncio
+import contextvars
+import functools
+import random
+import sqlite3
+from app.async_database import acquire_connection, release_connection, run_in_db_executor
+from app.connection_pool import ConnectionPool
+
+BUSY_ERROR_CODES = {sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED}
+
+
+def is_busy_error(error: Exception) -> bool:
+    if not isinstance(error, sqlite3.OperationalError):
+        return False
+    code = getattr(error, "sqlite_errorcode", None)
+    if code is not None:
+        # Extended codes such as SQLITE_BUSY_SNAPSHOT keep the primary code in the low byte
+        return code & 0xFF in BUSY_ERROR_CODES
+    return "locked" in str(error) or "busy" in str(error)
+
+
+# Runs `function(cursor, *args)` inside one write transaction. BEGIN IMMEDIATE takes the write lock before the
+# first statement, so a transaction either waits for it up front or fails before doing any work; it can never
+# fail half-way through on a read-to-write lock upgrade.
+def run_write_transaction(connection: sqlite3.Connection, function, args):
+    cursor = connection.cursor()
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        result = function(cursor, *args)
+        connection.commit()
+        return result
+    except BaseException:
+        if connection.in_transaction:
+            connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+class TransactionManager:
+    # Write transactions are passed in as callables rather than run statement by statement from the handler,
+    # so a transaction that failed with SQLITE_BUSY can be rolled back and replayed from the start. The
+    # callables must only touch the database: they may run more than once.
+    def __init__(self, pool: ConnectionPool, retries: int, backoff: float, max_backoff: float):
+        self.pool = pool
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._counters = {"commits": 0, "rollbacks": 0, "busy_retries": 0}
+
+    async def write(self, function, *args):
+        return await self._run_with_retry(run_write_transaction, function, args)
+
+    # Runs `transaction(connection, *args)` on a pooled connection, replaying it while SQLite reports busy
+    async def _run_with_retry(self, transaction, *args):
+        delay = self.backoff
+        for attempt in range(self.retries + 1):
+            connection = await acquire_connection(self.pool)
+            try:
+                result = await run_in_db_executor(transaction, connection, *args)
+                self._counters["commits"] += 1
+                return result
+            except Exception as e:
+                self._counters["rollbacks"] += 1
+                if not is_busy_error(e) or attempt == self.retries:
+                    raise
+                self._counters["busy_retries"] += 1
+            finally:
+                await release_connection(self.pool, connection, commit=False)
+
+            # Full jitter keeps writers that collided from retrying in lockstep
+            await asyncio.sleep(random.uniform(0, delay))
+            delay = min(delay * 2, self.max_backoff)
+
+    async def close(self):
+        pass
+
+    def stats(self) -> dict:
+        return dict(self._counters)
+
+
+# Runs a batch of write functions in one transaction. Each function gets its own savepoint, so one that fails
+# is undone and reported on its own without aborting the others; returns (succeeded, result or error) pairs.
+def run_write_batch(connection: sqlite3.Connection, batch: list):
+    cursor = connection.cursor()
+    outcomes = []
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        for function, args in batch:
+            cursor.execute("SAVEPOINT batched_write")
+            try:
+                outcomes.append((True, function(cursor, *args)))
+            except Exception as e:
+                cursor.execute("ROLLBACK TO batched_write")
+                outcomes.append((False, e))
+            cursor.execute("RELEASE batched_write")
+        connection.commit()
+        return outcomes
+    except BaseException:
+        if connection.in_transaction:
+            connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+class WritePipeline(TransactionManager):
+    # Single writer with group commit: write() queues the function and waits, while one writer task drains the
+    # queue into batches of up to max_batch_size writes (waiting at most max_latency seconds for a batch to
+    # fill) and commits each batch as one transaction. Callers get their own result once the batch committed,
+    # so N concurrent writes cost one commit (and one fsync) instead of N.
+    def __init__(self, pool: ConnectionPool, retries: int, backoff: float, max_backoff: float,
+                 max_batch_size: int, max_latency: float):
+        super().__init__(pool, retries, backoff, max_backoff)
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        self._queue = None
+        self._writer = None
+        self._loop = None
+        self._counters.update({"batches": 0, "batched_writes": 0, "largest_batch": 0})
+
+    def _ensure_writer(self):
+        loop = asyncio.get_running_loop()
+        # The writer belongs to one event loop; start a new one if that loop has gone away
+        if self._writer is None or self._writer.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._writer = loop.create_task(self._run())
+
+    async def write(self, function, *args):
+        self._ensure_writer()
+        future = self._loop.create_future()
+        # The write runs in the writer task, so it takes the caller's context along (e.g. for the slow-query log)
+        function = functools.partial(contextvars.copy_context().run, function)
+        await self._queue.put((function, args, future))
+        return await future
+
+    # Returns the next batch, ending early at the None that close() queues
+    async def _collect_batch(self) -> list:
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_latency
+        while batch[-1] is not None and len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - self._loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect_batch()
+            closing = batch[-1] is None
+            if closing:
+                batch.pop()
+            if batch:
+                await self._commit_batch(batch)
+            if closing:
+                return
+
+    async def _commit_batch(self, batch: list):
+        # Callers that gave up (e.g. a cancelled request) are dropped before their write runs
+        batch = [entry for entry in batch if not entry[2].done()]
+        if not batch:
+            return
+        try:
+            outcomes = await self._run_with_retry(run_write_batch, [(function, args) for function, args, _ in batch])
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self._counters["batches"] += 1
+        self._counters["batched_writes"] += len(batch)
+        self._counters["largest_batch"] = max(self._counters["largest_batch"], len(batch))
+        for (_, _, future), (succeeded, outcome) in zip(batch, outcomes):
+            if future.done():
+                continue
+            if succeeded:
+                future.set_result(outcome)
+            else:
+                future.set_exception(outcome)
+
+    async def close(self):
+        if self._writer is not None and not self._writer.done() and self._loop is asyncio.get_running_loop():
+            await self._queue.put(None)
+            await self._writer
+        self._writer = None
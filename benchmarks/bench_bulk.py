@@ -0,0 +1,55 @@
+# Task creation throughput: one POST /todo-items/{list_id}/{user_id} per task against
+# POST /todo-items/{list_id}/bulk with batches of tasks, driven in-process over the ASGI transport.
+#
+#   python -m benchmarks.bench_bulk [--tasks 5000] [--batch-size 1000]
+import argparse
+import asyncio
+import os
+import time
+import httpx
+from benchmarks.common import temporary_database, seed_database, print_table
+
+
+async def per_item(client, tasks: list) -> None:
+    for task in tasks:
+        response = await client.post("/todo-items/1/1", json=task)
+        assert response.status_code == 201, response.text
+
+
+async def bulk(client, tasks: list, batch_size: int) -> None:
+    for start in range(0, len(tasks), batch_size):
+        response = await client.post("/todo-items/1/bulk", json=tasks[start:start + batch_size])
+        assert response.status_code == 201, response.text
+
+
+async def run(app, task_count: int, batch_size: int) -> list:
+    tasks = [{"context": f"Imported task {i}", "completed": 0} for i in range(task_count)]
+    rows = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for label, scenario in (("per-item POST", per_item(client, tasks)),
+                                (f"bulk POST x{batch_size}", bulk(client, tasks, batch_size))):
+            started = time.perf_counter()
+            await scenario
+            elapsed = time.perf_counter() - started
+            rows.append([label, f"{elapsed:.2f}", f"{task_count / elapsed:.0f}"])
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tasks", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    with temporary_database() as database:
+        seed_database(database, users=1, lists_per_user=1, items_per_list=0)
+        os.environ["DATABASE_URL"] = f"sqlite:///{database}"
+        from app.main import app
+
+        rows = asyncio.run(run(app, args.tasks, args.batch_size))
+    print_table(["endpoint", "seconds", "tasks/s"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+# Requests per second and tail latency of the API at increasing client concurrency, driven in-process
+# through httpx's ASGI transport so only the application (handlers, DB executor, pool) is measured.
+#
+#   python -m benchmarks.bench_concurrency [--requests 2000] [--concurrency 1 50 500]
+import argparse
+import asyncio
+import os
+import random
+import time
+import httpx
+from benchmarks.common import temporary_database, seed_database, percentile, print_table
+
+
+async def run_level(app, concurrency: int, total_requests: int, users: int) -> list:
+    latencies = []
+    remaining = iter(range(total_requests))
+
+    async def client_loop(client):
+        for _ in remaining:
+            if random.random() < 0.5:
+                path = "/todo-items?limit=20"
+            else:
+                path = f"/users/{random.randint(1, users)}"
+            started = time.perf_counter()
+            response = await client.get(path)
+            latencies.append(time.perf_counter() - started)
+            assert response.status_code == 200, response.text
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return [concurrency, f"{total_requests / elapsed:.0f}", f"{percentile(latencies, 50) * 1000:.1f}",
+            f"{percentile(latencies, 99) * 1000:.1f}"]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 50, 500])
+    args = parser.parse_args()
+
+    with temporary_database() as database:
+        seed_database(database, users=100, lists_per_user=10, items_per_list=10)
+        os.environ["DATABASE_URL"] = f"sqlite:///{database}"
+        from app.main import app
+
+        rows = [asyncio.run(run_level(app, concurrency, args.requests, 100)) for concurrency in args.concurrency]
+    print_table(["clients", "req/s", "p50 ms", "p99 ms"], rows)
+
+
+if __name__ == "__main__":
+    main()
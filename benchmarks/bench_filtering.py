@@ -0,0 +1,76 @@
+# Latency of filtered GET /todo-items queries against a seeded table of 1M tasks, next to what a client paid
+# before filtering existed: downloading every task as NDJSON and filtering it locally.
+#
+#   python -m benchmarks.bench_filtering [--tasks 1000000] [--requests 200] [--skip-full-download]
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+import httpx
+from benchmarks.common import temporary_database, seed_database, percentile, print_table
+
+LISTS_PER_USER = 10
+ITEMS_PER_LIST = 100
+
+
+def scenarios(users: int, total_tasks: int) -> dict:
+    lists = users * LISTS_PER_USER
+    return {
+        "list_id": lambda: f"list_id={random.randint(1, lists)}",
+        "user_id": lambda: f"user_id={random.randint(1, users)}",
+        "user_id + completed": lambda: f"user_id={random.randint(1, users)}&completed=false",
+        "list_id + completed": lambda: f"list_id={random.randint(1, lists)}&completed=false",
+        "completed": lambda: "completed=false",
+        "id range": lambda: (lambda start: f"min_id={start}&max_id={start + 99}")(random.randint(1, total_tasks)),
+    }
+
+
+async def run(app, users: int, total_tasks: int, requests: int, full_download: bool) -> list:
+    rows = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for label, query in scenarios(users, total_tasks).items():
+            latencies = []
+            for _ in range(requests):
+                started = time.perf_counter()
+                response = await client.get(f"/todo-items?limit=100&{query()}")
+                latencies.append(time.perf_counter() - started)
+                assert response.status_code == 200, response.text
+            rows.append([label, f"{percentile(latencies, 50) * 1000:.2f}", f"{percentile(latencies, 95) * 1000:.2f}",
+                         f"{percentile(latencies, 99) * 1000:.2f}"])
+
+        if full_download:
+            # One user's pending tasks, found the way clients had to before the filters existed
+            user_lists = range(1, LISTS_PER_USER + 1)
+            started = time.perf_counter()
+            async with client.stream("GET", "/todo-items?stream=1") as response:
+                pending = [task for task in map(json.loads, [line async for line in response.aiter_lines() if line])
+                           if task["list_id"] in user_lists and not task["completed"]]
+            elapsed = (time.perf_counter() - started) * 1000
+            assert pending
+            rows.append(["full download + client filter", f"{elapsed:.2f}", "-", "-"])
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tasks", type=int, default=1_000_000)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--skip-full-download", action="store_true")
+    args = parser.parse_args()
+
+    users = max(1, args.tasks // (LISTS_PER_USER * ITEMS_PER_LIST))
+    with temporary_database() as database:
+        total_tasks = seed_database(database, users=users, lists_per_user=LISTS_PER_USER, items_per_list=ITEMS_PER_LIST)
+        os.environ["DATABASE_URL"] = f"sqlite:///{database}"
+        from app.main import app
+
+        rows = asyncio.run(run(app, users, total_tasks, args.requests, not args.skip_full_download))
+    print(f"{total_tasks} tasks, {args.requests} requests per filter, pages of 100")
+    print_table(["filter", "p50 ms", "p95 ms", "p99 ms"], rows)
+
+
+if __name__ == "__main__":
+    main()
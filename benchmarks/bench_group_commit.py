@@ -0,0 +1,63 @@
+# Write throughput of one transaction per write (TransactionManager) against group commit (WritePipeline),
+# driven with concurrent writers directly against the transaction layer so commit cost dominates.
+#
+#   python -m benchmarks.bench_group_commit [--writes 5000] [--concurrency 64] [--synchronous FULL]
+import argparse
+import asyncio
+import time
+from app.config import DB_WRITE_RETRIES, DB_WRITE_RETRY_BACKOFF, DB_WRITE_RETRY_MAX_BACKOFF, SQLITE_PRAGMAS
+from app.connection_pool import ConnectionPool
+from app.database_utils import connect
+from app.routers.todo_items import insert_task
+from app.transactions import TransactionManager, WritePipeline
+from benchmarks.common import temporary_database, seed_database, percentile, print_table
+
+
+async def run(manager, writes: int, concurrency: int) -> tuple:
+    latencies = []
+    remaining = iter(range(writes))
+
+    async def writer():
+        for i in remaining:
+            started = time.perf_counter()
+            await manager.write(insert_task, 1, f"Task {i}", 0)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(writer() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    await manager.close()
+    return elapsed, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--writes", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--synchronous", default="FULL", choices=["OFF", "NORMAL", "FULL"])
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--latency", type=float, default=0.002)
+    args = parser.parse_args()
+
+    pragmas = dict(SQLITE_PRAGMAS, synchronous=args.synchronous)
+    retry = (DB_WRITE_RETRIES, DB_WRITE_RETRY_BACKOFF, DB_WRITE_RETRY_MAX_BACKOFF)
+    rows = []
+    for label in ("transaction per write", f"group commit x{args.batch_size}"):
+        with temporary_database() as database:
+            seed_database(database, users=1, lists_per_user=1, items_per_list=0)
+            pool = ConnectionPool(lambda: connect(database, pragmas=pragmas), size=args.concurrency)
+            if label.startswith("group"):
+                manager = WritePipeline(pool, *retry, max_batch_size=args.batch_size, max_latency=args.latency)
+            else:
+                manager = TransactionManager(pool, *retry)
+            elapsed, latencies = asyncio.run(run(manager, args.writes, args.concurrency))
+            pool.close()
+        rows.append([label, f"{args.writes / elapsed:.0f}", f"{manager.stats()['commits']}",
+                     f"{percentile(latencies, 50) * 1000:.2f}", f"{percentile(latencies, 99) * 1000:.2f}"])
+
+    print(f"{args.writes} writes, {args.concurrency} concurrent writers, synchronous={args.synchronous}")
+    print_table(["strategy", "writes/s", "commits", "p50 ms", "p99 ms"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# Per-request overhead of the trailing-slash redirect hook: the former @app.middleware("http") function
+# (BaseHTTPMiddleware) against the pure ASGI TrailingSlashMiddleware, calling the ASGI apps directly.
+#
+#   python -m benchmarks.bench_middleware [--requests 20000]
+import argparse
+import asyncio
+import time
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+from app.middleware import TrailingSlashMiddleware
+from benchmarks.common import print_table
+
+
+def build_app(middleware: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/users")
+    async def users():
+        return PlainTextResponse("ok")
+
+    if middleware == "base_http":
+        @app.middleware("http")
+        async def remove_trailing_slash(request: Request, call_next):
+            if request.url.path == "/users/":
+                return JSONResponse(status_code=301, content={"message": "Moved Permanently", "location": "/users"})
+            return await call_next(request)
+    elif middleware == "asgi":
+        app.add_middleware(TrailingSlashMiddleware)
+    return app
+
+
+async def measure(app, requests: int) -> float:
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+             "path": "/users", "raw_path": b"/users", "query_string": b"", "root_path": "",
+             "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 1), "server": ("bench", 80)}
+
+    async def call():
+        messages = [{"type": "http.request", "body": b"", "more_body": False}]
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            # Like a real server, block until the client disconnects
+            await asyncio.Event().wait()
+
+        async def send(message):
+            pass
+
+        await app(dict(scope), receive, send)
+
+    for _ in range(200):
+        await call()
+    started = time.perf_counter()
+    for _ in range(requests):
+        await call()
+    return (time.perf_counter() - started) / requests * 1_000_000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    results = {name: asyncio.run(measure(build_app(name), args.requests)) for name in ("none", "base_http", "asgi")}
+    rows = [[name, f"{micros:.1f}", f"{micros - results['none']:.1f}"] for name, micros in results.items()]
+    print_table(["middleware", "us/request", "overhead us"], rows)
+
+
+if __name__ == "__main__":
+    main()
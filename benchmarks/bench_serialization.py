@@ -0,0 +1,58 @@
+# Cost of turning a 10k-row /todo-items listing into a response body: the previous path (positional
+# tuples rebuilt into dicts, stdlib json) against rows zipped into dicts and encoded with app.responses.
+#
+#   python -m benchmarks.bench_serialization [--rows 10000] [--rounds 20]
+import argparse
+import json
+import time
+from app.async_database import rows_as_dicts
+from app.database_utils import connect
+from app.responses import select_serializer, orjson
+from app.routers.todo_items import TODO_TASKS_QUERY
+from benchmarks.common import temporary_database, seed_database, print_table
+
+
+def previous_path(cursor) -> bytes:
+    structured_tasks = [{"task_id": task[0], "list_id": task[1], "list_title": task[2], "context": task[3],
+                         "completed": task[4]} for task in cursor.fetchall()]
+    return json.dumps({"todo_tasks": structured_tasks}, ensure_ascii=False, allow_nan=False, indent=None,
+                      separators=(",", ":")).encode("utf-8")
+
+
+def direct_path(serializer):
+    def serialize(cursor) -> bytes:
+        return serializer({"todo_tasks": rows_as_dicts(cursor.description, cursor.fetchall())})
+    return serialize
+
+
+def time_path(connection, rows: int, rounds: int, serialize) -> float:
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        serialize(connection.execute(TODO_TASKS_QUERY + " LIMIT ?", (0, rows)))
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    paths = [("query + fetchall only", lambda cursor: cursor.fetchall()),
+             ("tuples + dicts + stdlib json", previous_path),
+             ("zipped dicts + stdlib json", direct_path(select_serializer("stdlib")))]
+    if orjson is not None:
+        paths.append(("zipped dicts + orjson", direct_path(select_serializer("orjson"))))
+
+    with temporary_database() as database:
+        seed_database(database, users=10, lists_per_user=10, items_per_list=args.rows // 100 + 1)
+        connection = connect(database)
+        rows = [[label, f"{time_path(connection, args.rows, args.rounds, serialize):.2f}"] for label, serialize in paths]
+        connection.close()
+    print_table(["path", f"ms per {args.rows} rows"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# Throughput, tail latency and idle CPU of the production server (python -m app.serve) next to the Dockerfile's
+# previous CMD (uvicorn --reload, one process). Each profile runs as a real server process on a fresh copy of the
+# same seeded database and is driven over HTTP with the replay workload. Idle CPU is the CPU time the server's
+# process tree burns while no requests arrive (Linux only, read from /proc).
+#
+#   python -m benchmarks.bench_server [--workers 4] [--tasks 10000] [--requests 5000] [--concurrency 64]
+import argparse
+import asyncio
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import time
+import httpx
+from benchmarks.common import temporary_database, print_table
+from benchmarks.replay import DEFAULT_WORKLOAD, load_workload, prepare_database, replay, summarize
+
+
+def profiles(workers: int, port: int) -> dict:
+    return {
+        "uvicorn --reload": [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+                             "--port", str(port), "--reload"],
+        f"app.serve --workers {workers}": [sys.executable, "-m", "app.serve", "--host", "127.0.0.1",
+                                           "--port", str(port), "--workers", str(workers)],
+    }
+
+
+def process_tree_cpu_seconds(pid: int) -> float:
+    children = {}
+    cpu_ticks = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as stat:
+                # Fields after the parenthesised command name: state, ppid, ..., utime (12th), stime (13th)
+                fields = stat.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        children.setdefault(int(fields[1]), []).append(int(entry))
+        cpu_ticks[int(entry)] = int(fields[11]) + int(fields[12])
+
+    total = 0
+    pending = [pid]
+    while pending:
+        process = pending.pop()
+        total += cpu_ticks.get(process, 0)
+        pending.extend(children.get(process, []))
+    return total / os.sysconf("SC_CLK_TCK")
+
+
+def wait_until_ready(base_url: str, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{base_url}/users?limit=1").status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} did not start within {timeout} seconds")
+
+
+async def drive(base_url: str, workload: list, sizes: dict, args) -> tuple:
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=None, limits=limits) as client:
+        if args.warmup:
+            await replay(client, workload, sizes, args.warmup, args.concurrency, args.seed + 1)
+        return await replay(client, workload, sizes, args.requests, args.concurrency, args.seed)
+
+
+def run_profile(command: list, database: str, workload: list, sizes: dict, args) -> list:
+    base_url = f"http://127.0.0.1:{args.port}"
+    server = subprocess.Popen(command, env={**os.environ, "DATABASE_URL": f"sqlite:///{database}"},
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_ready(base_url)
+        idle_started = process_tree_cpu_seconds(server.pid)
+        time.sleep(args.idle)
+        idle_cpu = (process_tree_cpu_seconds(server.pid) - idle_started) / args.idle * 100
+
+        total = summarize(*asyncio.run(drive(base_url, workload, sizes, args)))["total"]
+    finally:
+        server.send_signal(signal.SIGINT)
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+    return [total["rps"], total["p50_ms"], total["p95_ms"], total["p99_ms"], total["errors"], f"{idle_cpu:.1f}"]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--workload", default=DEFAULT_WORKLOAD)
+    parser.add_argument("--tasks", type=int, default=10_000)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--idle", type=float, default=5, help="seconds of idle CPU sampling per profile")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    workload = load_workload(args.workload)
+    rows = []
+    with temporary_database() as seeded:
+        sizes = prepare_database(seeded, args.tasks)
+        for label, command in profiles(args.workers, args.port).items():
+            # Every profile starts from the same data, since the workload writes
+            database = os.path.join(os.path.dirname(seeded), "server.db")
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(database + suffix):
+                    os.remove(database + suffix)
+            shutil.copyfile(seeded, database)
+            rows.append([label, *run_profile(command, database, workload, sizes, args)])
+
+    print(f"{args.requests} requests, {args.concurrency} clients, {sizes['tasks']} seeded tasks, "
+          f"{os.cpu_count()} cores")
+    print_table(["server", "req/s", "p50 ms", "p95 ms", "p99 ms", "errors", "idle CPU %"], rows)
+
+
+if __name__ == "__main__":
+    main()
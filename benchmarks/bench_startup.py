@@ -0,0 +1,87 @@
+# Latency of the first requests a fresh worker serves, with the startup warm-up switched off (WARMUP_CONNECTIONS=0,
+# ENTITY_CACHE_PRELOAD=0) and on (the defaults). Each profile runs in its own interpreter so nothing is warm from the
+# previous one; the requests hit recently created users, lists and tasks, which is what the preload targets.
+#
+#   python -m benchmarks.bench_startup [--tasks 100000] [--requests 200]
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from benchmarks.common import temporary_database, seed_database, percentile, print_table
+
+PROFILES = {
+    "cold": {"WARMUP_CONNECTIONS": "0", "ENTITY_CACHE_PRELOAD": "0"},
+    "warmed": {},
+}
+
+
+def request_paths(tasks: int, count: int, seed: int) -> list:
+    rng = random.Random(seed)
+    users, lists = tasks // 100, tasks // 10
+    # The newest few hundred of each entity, plus the listings
+    choices = [
+        lambda: f"/users/{rng.randint(max(1, users - 300), users)}",
+        lambda: f"/todo-lists/{rng.randint(lists - 300, lists)}",
+        lambda: f"/todo-items/{rng.randint(tasks - 300, tasks)}",
+        lambda: "/todo-items?limit=100",
+        lambda: "/users?limit=100",
+    ]
+    return [rng.choice(choices)() for _ in range(count)]
+
+
+# Runs in the child interpreter: starts the app (lifespan included) and times each request in order
+def measure(paths: list) -> dict:
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    started = time.perf_counter()
+    with TestClient(app) as client:
+        startup_ms = (time.perf_counter() - started) * 1000
+        timings = []
+        for path in paths:
+            request_started = time.perf_counter()
+            response = client.get(path)
+            timings.append((time.perf_counter() - request_started) * 1000)
+            if response.status_code != 200:
+                raise RuntimeError(f"GET {path} returned {response.status_code}")
+    return {"startup_ms": startup_ms, "timings": timings}
+
+
+def run_profile(database: str, overrides: dict, paths: list) -> dict:
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{database}", "METRICS_ENABLED": "false", **overrides}
+    result = subprocess.run([sys.executable, "-m", "benchmarks.bench_startup", "--child"], env=env,
+                            input=json.dumps(paths), capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tasks", type=int, default=100_000)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(json.loads(sys.stdin.read()))))
+        return
+
+    paths = request_paths(args.tasks, args.requests, args.seed)
+    rows = []
+    with temporary_database() as database:
+        seed_database(database, users=args.tasks // 100)
+        for label, overrides in PROFILES.items():
+            result = run_profile(database, overrides, paths)
+            timings = result["timings"]
+            rows.append([label, f"{result['startup_ms']:.1f}", f"{timings[0]:.2f}", f"{sum(timings[:20]):.2f}",
+                         f"{percentile(timings, 50):.3f}", f"{percentile(timings, 99):.3f}"])
+
+    print(f"First {args.requests} requests of a new worker, {args.tasks} seeded tasks")
+    print_table(["profile", "startup ms", "first ms", "first 20 ms", "p50 ms", "p99 ms"], rows)
+
+
+if __name__ == "__main__":
+    main()
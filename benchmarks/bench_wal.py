@@ -0,0 +1,81 @@
+# Read throughput of the /todo-items query while a writer keeps inserting tasks, comparing the
+# default rollback-journal connection profile with the tuned WAL profile from app.config.
+#
+#   python -m benchmarks.bench_wal [--seconds 5] [--readers 4]
+import argparse
+import sqlite3
+import threading
+import time
+from app.config import SQLITE_PRAGMAS
+from app.database_utils import connect
+from benchmarks.common import temporary_database, seed_database, print_table
+
+ROLLBACK_JOURNAL_PRAGMAS = {"journal_mode": "DELETE", "synchronous": "FULL", "busy_timeout": 5000}
+
+READ_QUERY = ("SELECT todo_items.id, todo_items.list_id, todo_items.context, todo_items.completed, todo_lists.title "
+              "FROM todo_items LEFT JOIN todo_lists ON todo_items.list_id = todo_lists.id WHERE todo_items.id > ? "
+              "ORDER BY todo_items.id LIMIT 100")
+
+
+def run_profile(pragmas: dict, seconds: float, readers: int) -> dict:
+    with temporary_database() as database:
+        total_items = seed_database(database, users=20, lists_per_user=10, items_per_list=50)
+        connect(database, pragmas).close()
+
+        stop = threading.Event()
+        counts = {"reads": 0, "read_errors": 0, "writes": 0}
+        lock = threading.Lock()
+
+        def writer():
+            connection = connect(database, pragmas)
+            while not stop.is_set():
+                try:
+                    connection.execute("INSERT INTO todo_items (list_id, context, completed) VALUES (1, 'load', 0)")
+                    connection.commit()
+                    with lock:
+                        counts["writes"] += 1
+                except sqlite3.OperationalError:
+                    connection.rollback()
+            connection.close()
+
+        def reader(offset: int):
+            connection = connect(database, pragmas)
+            after = offset
+            while not stop.is_set():
+                try:
+                    connection.execute(READ_QUERY, (after,)).fetchall()
+                    with lock:
+                        counts["reads"] += 1
+                except sqlite3.OperationalError:
+                    with lock:
+                        counts["read_errors"] += 1
+                after = (after + 100) % total_items
+            connection.close()
+
+        threads = [threading.Thread(target=writer)]
+        threads += [threading.Thread(target=reader, args=(i * 1000,)) for i in range(readers)]
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    return {name: value / seconds for name, value in counts.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--readers", type=int, default=4)
+    args = parser.parse_args()
+
+    rows = []
+    for label, pragmas in (("rollback journal", ROLLBACK_JOURNAL_PRAGMAS), ("tuned WAL", SQLITE_PRAGMAS)):
+        result = run_profile(pragmas, args.seconds, args.readers)
+        rows.append([label, f"{result['reads']:.0f}", f"{result['read_errors']:.1f}", f"{result['writes']:.0f}"])
+    print_table(["profile", "reads/s", "read errors/s", "writes/s"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import os
+import random
+import shutil
+import tempfile
+from contextlib import contextmanager
+from app.database_utils import connect, initialize_db
+
+
+@contextmanager
+def temporary_database(name: str = "bench_todo.db"):
+    directory = tempfile.mkdtemp(prefix="mytodoapi-bench-")
+    try:
+        yield os.path.join(directory, name)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def seed_database(database: str, users: int = 100, lists_per_user: int = 10, items_per_list: int = 10,
+                  batch_size: int = 50000):
+    initialize_db(database)
+    connection = connect(database, pragmas={"journal_mode": "WAL", "synchronous": "OFF"})
+    try:
+        connection.executemany("INSERT INTO users (id, username, email, password) VALUES (?, ?, ?, ?)",
+                               ((user_id, f"user_{user_id}", f"user_{user_id}@example.com", "x" * 64)
+                                for user_id in range(1, users + 1)))
+        total_lists = users * lists_per_user
+        connection.executemany("INSERT INTO todo_lists (id, user_id, title) VALUES (?, ?, ?)",
+                               ((list_id, (list_id - 1) // lists_per_user + 1, f"List {list_id}")
+                                for list_id in range(1, total_lists + 1)))
+
+        total_items = total_lists * items_per_list
+        for start in range(1, total_items + 1, batch_size):
+            stop = min(start + batch_size, total_items + 1)
+            connection.executemany(
+                "INSERT INTO todo_items (id, list_id, context, completed) VALUES (?, ?, ?, ?)",
+                ((item_id, (item_id - 1) // items_per_list + 1, f"Task {item_id}", random.randint(0, 1))
+                 for item_id in range(start, stop)))
+        connection.commit()
+    finally:
+        connection.close()
+    return total_items
+
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def print_table(headers: list, rows: list):
+    widths = [max(len(str(value)) for value in column) for column in zip(headers, *rows)]
+    for row in [headers, *rows]:
+        print("  ".join(str(value).rjust(width) for value, width in zip(row, widths)))
@@ -0,0 +1,37 @@
+# Compares two JSON results written by benchmarks.replay --output, endpoint by endpoint.
+#
+#   python -m benchmarks.compare baseline.json candidate.json [--metric p95_ms]
+import argparse
+import json
+from benchmarks.common import print_table
+
+
+def change(before: float, after: float) -> str:
+    if not before:
+        return "-"
+    return f"{(after - before) / before * 100:+.1f}%"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--metric", default="p95_ms", choices=["mean_ms", "p50_ms", "p95_ms", "p99_ms", "rps"])
+    args = parser.parse_args()
+
+    with open(args.baseline) as baseline_file, open(args.candidate) as candidate_file:
+        baseline, candidate = json.load(baseline_file), json.load(candidate_file)
+
+    print(f"{args.metric}: {baseline['meta']['revision']} -> {candidate['meta']['revision']}")
+    rows = [["(all)", baseline["total"]["rps"], candidate["total"]["rps"],
+             change(baseline["total"]["rps"], candidate["total"]["rps"])]] if args.metric == "rps" else []
+    for name in sorted(set(baseline["endpoints"]) | set(candidate["endpoints"])):
+        before = baseline["endpoints"].get(name, {}).get(args.metric)
+        after = candidate["endpoints"].get(name, {}).get(args.metric)
+        rows.append([name, before if before is not None else "-", after if after is not None else "-",
+                     change(before, after) if before is not None and after is not None else "-"])
+    print_table(["endpoint", "baseline", "candidate", "change"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+# Load test that replays a weighted request mix from a JSONL workload against the app and reports req/s and
+# p50/p95/p99 latency per endpoint, optionally as JSON for comparing runs across commits (benchmarks.compare).
+#
+# Each workload line is {"name", "method", "path", "body"?, "weight"?}. Placeholders in the path and in body
+# strings are filled per request: {user_id}, {list_id} and {task_id} pick a random seeded row, {n} a random
+# number and {uuid} a unique hex string.
+#
+#   python -m benchmarks.replay [--workload benchmarks/workloads/mixed.jsonl] [--tasks 10000]
+#                               [--requests 5000] [--concurrency 32] [--database seeded.db] [--output run.json]
+#   python -m benchmarks.replay --base-url http://127.0.0.1:8000 ...   (against a running server)
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import time
+import uuid
+from datetime import datetime, timezone
+import httpx
+from benchmarks.common import temporary_database, seed_database, percentile, print_table
+
+DEFAULT_WORKLOAD = os.path.join(os.path.dirname(__file__), "workloads", "mixed.jsonl")
+LISTS_PER_USER = 10
+ITEMS_PER_LIST = 100
+
+
+def load_workload(path: str) -> list:
+    with open(path) as workload:
+        entries = [json.loads(line) for line in workload if line.strip()]
+    for entry in entries:
+        entry.setdefault("name", f"{entry['method']} {entry['path']}")
+        entry.setdefault("weight", 1)
+    return entries
+
+
+def seed_sizes(tasks: int) -> dict:
+    users = max(1, tasks // (LISTS_PER_USER * ITEMS_PER_LIST))
+    return {"users": users, "lists": users * LISTS_PER_USER, "tasks": users * LISTS_PER_USER * ITEMS_PER_LIST}
+
+
+def prepare_database(database: str, tasks: int) -> dict:
+    sizes = seed_sizes(tasks)
+    marker = f"{database}.seeded.json"
+    # Large seeds are slow to build, so a database passed with --database is reused when its size matches
+    if os.path.exists(database) and os.path.exists(marker):
+        with open(marker) as seeded:
+            if json.load(seeded) == sizes:
+                return sizes
+    # A leftover WAL would be replayed into the new file, so the database goes with its -wal and -shm files
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(database + suffix):
+            os.remove(database + suffix)
+    seed_database(database, users=sizes["users"], lists_per_user=LISTS_PER_USER, items_per_list=ITEMS_PER_LIST)
+    with open(marker, "w") as seeded:
+        json.dump(sizes, seeded)
+    return sizes
+
+
+def fill(value, sizes: dict, rng: random.Random):
+    if isinstance(value, dict):
+        return {key: fill(item, sizes, rng) for key, item in value.items()}
+    if isinstance(value, list):
+        return [fill(item, sizes, rng) for item in value]
+    if not isinstance(value, str) or "{" not in value:
+        return value
+    return value.format(user_id=rng.randint(1, sizes["users"]), list_id=rng.randint(1, sizes["lists"]),
+                        task_id=rng.randint(1, sizes["tasks"]), n=rng.randint(1, sizes["tasks"]),
+                        uuid=uuid.uuid4().hex)
+
+
+async def replay(client: httpx.AsyncClient, workload: list, sizes: dict, requests: int, concurrency: int,
+                 seed: int) -> tuple:
+    rng = random.Random(seed)
+    plan = rng.choices(workload, weights=[entry["weight"] for entry in workload], k=requests)
+    samples = {entry["name"]: {"latencies": [], "errors": 0} for entry in workload}
+    remaining = iter(plan)
+
+    async def worker():
+        for entry in remaining:
+            body = fill(entry.get("body"), sizes, rng)
+            path = fill(entry["path"], sizes, rng)
+            started = time.perf_counter()
+            response = await client.request(entry["method"], path, json=body)
+            elapsed = time.perf_counter() - started
+            sample = samples[entry["name"]]
+            sample["latencies"].append(elapsed)
+            # 404s are expected for rows deleted or never seeded; anything else failing counts as an error
+            if response.status_code >= 500 or response.status_code in (400, 422):
+                sample["errors"] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - started, samples
+
+
+def summarize(elapsed: float, samples: dict) -> dict:
+    endpoints = {}
+    for name, sample in samples.items():
+        latencies = sample["latencies"]
+        if not latencies:
+            continue
+        endpoints[name] = {
+            "requests": len(latencies),
+            "errors": sample["errors"],
+            "rps": round(len(latencies) / elapsed, 1),
+            "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        }
+    all_latencies = [latency for sample in samples.values() for latency in sample["latencies"]]
+    total = {
+        "requests": len(all_latencies),
+        "errors": sum(sample["errors"] for sample in samples.values()),
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(len(all_latencies) / elapsed, 1),
+        "p50_ms": round(percentile(all_latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(all_latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(all_latencies, 99) * 1000, 3),
+    }
+    return {"total": total, "endpoints": endpoints}
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def run(args, sizes: dict, workload: list) -> tuple:
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=None,
+                                   limits=httpx.Limits(max_connections=args.concurrency))
+    else:
+        from app.main import app
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None)
+    async with client:
+        if args.warmup:
+            await replay(client, workload, sizes, args.warmup, args.concurrency, args.seed + 1)
+        return await replay(client, workload, sizes, args.requests, args.concurrency, args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a JSONL request mix and report latency per endpoint")
+    parser.add_argument("--workload", default=DEFAULT_WORKLOAD)
+    parser.add_argument("--tasks", type=int, default=10_000, help="seeded size, e.g. 10000, 1000000, 10000000")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--database", help="seeded database file to create or reuse (default: temporary)")
+    parser.add_argument("--base-url", help="replay against a running server seeded with the same --tasks")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    workload = load_workload(args.workload)
+    if args.base_url:
+        sizes = seed_sizes(args.tasks)
+        elapsed, samples = asyncio.run(run(args, sizes, workload))
+    else:
+        with temporary_database() as temporary:
+            database = args.database or temporary
+            sizes = prepare_database(database, args.tasks)
+            os.environ["DATABASE_URL"] = f"sqlite:///{database}"
+            elapsed, samples = asyncio.run(run(args, sizes, workload))
+
+    results = {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "workload": os.path.basename(args.workload),
+            "target": args.base_url or "in-process",
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+            **{f"seeded_{name}": count for name, count in sizes.items()},
+        },
+        **summarize(elapsed, samples),
+    }
+
+    total = results["total"]
+    print(f"{total['requests']} requests in {total['elapsed_s']}s ({total['rps']} req/s), {total['errors']} errors, "
+          f"{sizes['tasks']} seeded tasks, {args.concurrency} clients")
+    print_table(["endpoint", "requests", "errors", "req/s", "p50 ms", "p95 ms", "p99 ms"],
+                [[name, e["requests"], e["errors"], e["rps"], e["p50_ms"], e["p95_ms"], e["p99_ms"]]
+                 for name, e in results["endpoints"].items()])
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+import time
+from app.cache import EntityCache
+
+
+def test_hit_and_miss_counters():
+    cache = EntityCache(max_entries=10, ttl=60)
+    assert cache.get("user", 1) is None
+    cache.set("user", 1, {"user_id": 1}, cache.generation)
+
+    assert cache.get("user", 1) == {"user_id": 1}
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = EntityCache(max_entries=2, ttl=60)
+    cache.set("user", 1, "first", cache.generation)
+    cache.set("user", 2, "second", cache.generation)
+    cache.get("user", 1)
+    cache.set("user", 3, "third", cache.generation)
+
+    assert cache.get("user", 2) is None
+    assert cache.get("user", 1) == "first"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_expire_after_ttl():
+    cache = EntityCache(max_entries=10, ttl=0.01)
+    cache.set("task", 1, "task", cache.generation)
+    time.sleep(0.02)
+
+    assert cache.get("task", 1) is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_read_started_before_invalidation_is_not_cached():
+    cache = EntityCache(max_entries=10, ttl=60)
+    generation = cache.generation
+    cache.invalidate("list", 7)
+    cache.set("list", 7, "stale", generation)
+
+    assert cache.get("list", 7) is None
+
+
+def test_disabled_cache_stores_nothing():
+    cache = EntityCache(max_entries=0, ttl=60)
+    cache.set("user", 1, "value", cache.generation)
+    assert cache.get("user", 1) is None
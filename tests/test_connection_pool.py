@@ -0,0 +1,142 @@
+import asyncio
+import sqlite3
+import threading
+import pytest
+from app.async_database import acquire_connection, release_connection
+from app.connection_pool import ConnectionPool, PoolTimeoutError
+
+
+@pytest.fixture
+def pool(tmp_path):
+    database = str(tmp_path / "pool_test.db")
+    pool = ConnectionPool(lambda: sqlite3.connect(database, check_same_thread=False), size=2, timeout=0.1)
+    yield pool
+    pool.close()
+
+
+def test_connection_is_reused(pool):
+    first = pool.acquire()
+    pool.release(first)
+    second = pool.acquire()
+    pool.release(second)
+
+    assert first is second
+    stats = pool.stats()
+    assert stats["created"] == 1
+    assert stats["acquired"] == 2
+    assert stats["in_use"] == 0
+
+
+def test_pool_times_out_when_exhausted(pool):
+    connections = [pool.acquire(), pool.acquire()]
+
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire()
+
+    assert pool.stats()["timeouts"] == 1
+    for connection in connections:
+        pool.release(connection)
+
+
+def test_waiting_borrower_gets_released_connection(pool):
+    pool.timeout = 5
+    connections = [pool.acquire(), pool.acquire()]
+    borrowed = []
+
+    waiter = threading.Thread(target=lambda: borrowed.append(pool.acquire()))
+    waiter.start()
+    pool.release(connections[0])
+    waiter.join()
+
+    assert borrowed == [connections[0]]
+    assert pool.stats()["waits"] == 1
+
+
+def test_acquire_timeout_overrides_pool_timeout(pool):
+    pool.timeout = 30
+    connections = [pool.acquire(), pool.acquire()]
+
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire(timeout=0.01)
+
+    for connection in connections:
+        pool.release(connection)
+
+
+def test_connection_recycled_after_max_lifetime(pool):
+    pool.max_lifetime = 0
+    first = pool.acquire()
+    pool.release(first)
+    second = pool.acquire()
+    pool.release(second)
+
+    assert first is not second
+    assert pool.stats()["recycled"] == 2
+
+
+def test_broken_connection_replaced_by_health_check(pool):
+    pool.health_check_interval = 0
+    first = pool.acquire()
+    pool.release(first)
+    first.close()
+
+    second = pool.acquire()
+    pool.release(second)
+
+    assert second is not first
+    assert pool.stats()["health_check_failures"] == 1
+
+
+def test_open_transaction_rolled_back_on_release(pool):
+    connection = pool.acquire()
+    connection.execute("CREATE TABLE IF NOT EXISTS items (id INTEGER PRIMARY KEY)")
+    connection.commit()
+    connection.execute("INSERT INTO items DEFAULT VALUES")
+    pool.release(connection)
+
+    connection = pool.acquire()
+    assert connection.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 0
+    pool.release(connection)
+
+
+def test_async_borrower_waits_for_released_connection(pool):
+    async def scenario():
+        held = [await acquire_connection(pool), await acquire_connection(pool)]
+        waiter = asyncio.ensure_future(acquire_connection(pool))
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+
+        await release_connection(pool, held[0])
+        assert await waiter is held[0]
+        await release_connection(pool, held[0])
+        await release_connection(pool, held[1])
+
+    asyncio.run(scenario())
+    assert pool.stats()["in_use"] == 0
+
+
+def test_async_borrower_times_out(pool):
+    async def scenario():
+        held = [await acquire_connection(pool), await acquire_connection(pool)]
+        with pytest.raises(PoolTimeoutError):
+            await acquire_connection(pool)
+        for connection in held:
+            await release_connection(pool, connection)
+
+    asyncio.run(scenario())
+    stats = pool.stats()
+    assert stats["timeouts"] == 1
+    assert stats["in_use"] == 0
+
+
+def test_warm_opens_connections_up_to_pool_size(pool):
+    prepared = []
+
+    assert pool.warm(5, prepare=prepared.append) == 2
+    assert len(set(map(id, prepared))) == 2
+    stats = pool.stats()
+    assert stats["open"] == 2
+    assert stats["in_use"] == 0
+    # Borrowers get the warmed connections instead of opening new ones
+    pool.release(pool.acquire())
+    assert pool.stats()["created"] == 2
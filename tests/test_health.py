@@ -0,0 +1,98 @@
+import threading
+import time
+import pytest
+from app.health import HealthCheck, probe_database, EXPECTED_SCHEMA_VERSION
+from app.database_utils import close_pools, get_read_pool, initialize_db
+
+
+@pytest.fixture
+def database(tmp_path):
+    database = str(tmp_path / "health_test.db")
+    initialize_db(database)
+    yield database
+    close_pools()
+
+
+def test_result_cached_until_ttl_expires():
+    calls = []
+    check = HealthCheck(lambda: calls.append(1) or {"status": "ok", "probe": len(calls)}, ttl=60)
+
+    assert check.check() == {"status": "ok", "probe": 1}
+    assert check.check() == {"status": "ok", "probe": 1}
+    check.ttl = 0
+    check.reset()
+    assert check.check()["probe"] == 2
+    assert check.check()["probe"] == 3
+
+
+def test_concurrent_checks_share_one_probe():
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow_probe():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return {"status": "ok"}
+
+    check = HealthCheck(slow_probe, ttl=60)
+    threads = [threading.Thread(target=check.check) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    started.wait(5)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+
+
+def test_stale_result_returned_while_probe_in_flight():
+    release = threading.Event()
+    results = iter([{"status": "ok", "probe": 1}, {"status": "ok", "probe": 2}])
+
+    def probe():
+        result = next(results)
+        if result["probe"] == 2:
+            release.wait(5)
+        return result
+
+    check = HealthCheck(probe, ttl=0)
+    assert check.check()["probe"] == 1
+    refreshing = threading.Thread(target=check.check)
+    refreshing.start()
+    try:
+        while not check._lock.locked():
+            time.sleep(0.001)
+        assert check.check()["probe"] == 1
+    finally:
+        release.set()
+        refreshing.join()
+    assert check._result["probe"] == 2
+
+
+def test_probe_reports_schema_version_and_latency(database):
+    result = probe_database(database)
+
+    assert result["status"] == "ok"
+    assert result["schema_version"] == EXPECTED_SCHEMA_VERSION
+    assert result["probe_ms"] >= 0
+    assert not result["pool_saturated"]
+    assert set(result["pools"]) == {"read", "write"}
+
+
+def test_probe_reports_saturation_quickly_when_pool_exhausted(database):
+    pool = get_read_pool(database)
+    held = [pool.acquire() for _ in range(pool.size)]
+    try:
+        result = probe_database(database)
+    finally:
+        for connection in held:
+            pool.release(connection)
+
+    # Saturation is a detail, not a failure: the connections are busy serving requests
+    assert result["status"] == "ok"
+    assert result["pool_saturated"]
+    assert "schema_version" not in result
+    assert result["probe_ms"] < pool.timeout * 1000
+    assert result["pools"]["read"]["in_use"] == pool.size
@@ -1,4 +1,8 @@
 import os
+import asyncio
+import json
+import hashlib
+import time
 import uuid
 import pytest
 import sqlite3
@@ -6,6 +10,18 @@ from app.main import app
 from fastapi import HTTPException
 from fastapi.testclient import TestClient
 from tests.test_config import get_test_db
+from app.cache import entity_cache
+from app.health import database_health
+from app.middleware import TrailingSlashMiddleware
+from app.config import SQLITE_PRAGMAS
+from app.database_utils import (READ_YOUR_WRITES_COOKIE, get_database_path, get_pool, get_read_pool,
+                                get_transaction_manager, get_transactions, initialize_db)
+from app.migrations import load_migrations, migrate, current_version
+from app.pagination import encode_page_token
+from app.responses import select_serializer
+from app.search_index import build_match_expression, rebuild_search_indexes
+from app.routers.todo_items import TODO_TASKS_QUERY, build_tasks_query
+from app.routers.todo_lists import USER_LISTS_QUERY, USER_LIST_TASKS_QUERY, fetch_user_lists
 
 # Ensure the test database URL is set
 os.environ["DATABASE_URL"] = "sqlite:///./data/my_test_todo.db"
@@ -52,6 +68,7 @@ def test_initialize_test_db():
 @pytest.fixture(scope="session", autouse=True)
 def setup_test_db():
     test_initialize_test_db()
+    initialize_db()
 
 
 @pytest.fixture
@@ -127,6 +144,27 @@ def test_get_users(get_sample_user):
     assert "users" in get_response.json()
 
 
+def test_get_users_keyset_pagination():
+    user_ids = []
+    for _ in range(3):
+        unique_id = str(uuid.uuid4())[:8]
+        response = client.post("/users", json={"username": f"page_user_{unique_id}", "email": f"page@{unique_id}.com",
+                                               "password": unique_id})
+        user_ids.append(response.json()["user_id"])
+
+    first_page = client.get("/users", params={"limit": 2, "after": encode_page_token(user_ids[0] - 1)}).json()
+    assert [user["user_id"] for user in first_page["users"]] == user_ids[:2]
+    assert first_page["next_page"] is not None
+
+    second_page = client.get("/users", params={"limit": 2, "after": first_page["next_page"]}).json()
+    assert second_page["users"][0]["user_id"] == user_ids[2]
+
+
+def test_get_users_rejects_invalid_page_token():
+    response = client.get("/users", params={"after": "not-a-token"})
+    assert response.status_code == 400
+
+
 def test_update_user(get_sample_user):
     # Create a user first
     response_create = client.post("/users", json=get_sample_user)
@@ -254,6 +292,28 @@ def test_create_task(get_sample_user, get_sample_list, get_sample_task):
     assert task_response.status_code == 201
 
 
+def test_create_tasks_bulk(get_sample_user, get_sample_list):
+    user_id = client.post("/users", json=get_sample_user).json()["user_id"]
+    get_sample_list["user_id"] = user_id
+    list_id = client.post("/todo-lists", json=get_sample_list).json()["list_id"]
+
+    tasks = [{"context": f"Bulk task {i}", "completed": i % 2} for i in range(5)]
+    response = client.post(f"/todo-items/{list_id}/bulk", json=tasks)
+    assert response.status_code == 201
+
+    task_ids = response.json()["task_ids"]
+    assert len(task_ids) == 5
+    for task_id, task in zip(task_ids, tasks):
+        specific_task = client.get(f"/todo-items/{task_id}").json()["specific_task"]
+        assert specific_task["task"] == task["context"]
+        assert specific_task["completed"] == task["completed"]
+
+
+def test_create_tasks_bulk_unknown_list():
+    response = client.post("/todo-items/999999999/bulk", json=[{"context": "Orphan", "completed": 0}])
+    assert response.status_code == 404
+
+
 def test_delete_task(get_sample_user):
     # Create a task first
     create_response = client.post("/users", json=get_sample_user)
@@ -279,6 +339,22 @@ def test_get_tasks():
                                          f". Response content: {response.content}")
 
 
+def test_stream_tasks_as_ndjson(get_sample_user, get_sample_list, get_sample_task):
+    user_id = client.post("/users", json=get_sample_user).json()["user_id"]
+    get_sample_list["user_id"] = user_id
+    list_id = client.post("/todo-lists", json=get_sample_list).json()["list_id"]
+    client.post(f"/todo-items/{list_id}/{user_id}", json=get_sample_task)
+
+    for request_options in ({"params": {"stream": 1}}, {"headers": {"Accept": "application/x-ndjson"}}):
+        response = client.get("/todo-items", **request_options)
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+
+        tasks = [json.loads(line) for line in response.text.splitlines()]
+        assert [task["task_id"] for task in tasks] == sorted(task["task_id"] for task in tasks)
+        assert get_sample_task["context"] in [task["context"] for task in tasks]
+
+
 def test_update_task(get_sample_user, get_sample_list, get_sample_task):
     # Create user
     user_response = client.post("/users", json=get_sample_user)
@@ -311,3 +387,570 @@ def test_update_task(get_sample_user, get_sample_list, get_sample_task):
     updated_task = update_response.json()
     assert updated_task["message"] == "Task updated successfully"
 
+
+# Login Tests ---------------------------------
+
+def test_login(get_sample_user):
+    client.post("/users", json=get_sample_user)
+
+    response = client.post("/login", json={"username": get_sample_user["username"],
+                                           "password": get_sample_user["password"]})
+    assert response.status_code == 200
+    assert client.post("/login", json={"username": get_sample_user["username"],
+                                       "password": "wrong"}).status_code == 401
+    assert client.post("/login", json={"username": "nobody", "password": "wrong"}).status_code == 401
+
+
+def test_login_upgrades_legacy_hash(get_sample_user):
+    user_id = client.post("/users", json=get_sample_user).json()["user_id"]
+    legacy_hash = hashlib.sha256(get_sample_user["password"].encode()).hexdigest()
+    with get_pool().connection() as connection:
+        connection.execute("UPDATE users SET password = ? WHERE id = ?", (legacy_hash, user_id))
+        connection.commit()
+
+    response = client.post("/login", json={"username": get_sample_user["username"],
+                                           "password": get_sample_user["password"]})
+    assert response.status_code == 200
+
+    with get_pool().connection() as connection:
+        stored = connection.execute("SELECT password FROM users WHERE id = ?", (user_id,)).fetchone()[0]
+    assert stored.startswith("scrypt$")
+    assert client.post("/login", json={"username": get_sample_user["username"],
+                                       "password": get_sample_user["password"]}).status_code == 200
+
+
+# Connection Pool Tests ---------------------------------
+
+def test_requests_reuse_pooled_connections():
+    client.get("/users")
+    stats_before = get_read_pool().stats()
+
+    for _ in range(5):
+        assert client.get("/users").status_code == 200
+
+    stats_after = get_read_pool().stats()
+    assert stats_after["created"] == stats_before["created"]
+    assert stats_after["acquired"] == stats_before["acquired"] + 5
+    assert stats_after["in_use"] == 0
+
+
+def test_pooled_connections_use_pragma_profile():
+    with get_pool().connection() as connection:
+        assert connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert connection.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+        assert connection.execute("PRAGMA temp_store").fetchone()[0] == 2  # MEMORY
+        assert connection.execute("PRAGMA busy_timeout").fetchone()[0] == SQLITE_PRAGMAS["busy_timeout"]
+
+
+# Write Pipeline Tests ---------------------------------
+
+def test_handlers_write_through_pipeline(get_sample_user, get_sample_list):
+    pipeline = get_transaction_manager(pipeline=True)
+    app.dependency_overrides[get_transactions] = lambda: pipeline
+    try:
+        user_id = client.post("/users", json=get_sample_user).json()["user_id"]
+        get_sample_list["user_id"] = user_id
+        list_id = client.post("/todo-lists", json=get_sample_list).json()["list_id"]
+        assert client.put(f"/todo-lists/{list_id}", json={"user_id": user_id, "title": "Piped"}).status_code == 201
+    finally:
+        app.dependency_overrides.pop(get_transactions)
+
+    assert client.get(f"/todo-lists/{list_id}").json()["todo_list"]["title"] == "Piped"
+    assert pipeline.stats()["batched_writes"] >= 3
+
+
+# Schema Migration Tests ---------------------------------
+
+def assert_no_table_scan(connection, query, parameters=()):
+    plan = [row[3] for row in connection.execute(f"EXPLAIN QUERY PLAN {query}", parameters).fetchall()]
+    scans = [step for step in plan if step.startswith("SCAN")]
+    assert not scans, f"Full table scan in query plan for {query!r}: {plan}"
+
+
+def test_migrations_are_idempotent():
+    latest_version = load_migrations()[-1][0]
+
+    with get_pool().connection() as connection:
+        assert migrate(connection) == latest_version
+        assert migrate(connection) == latest_version
+        assert current_version(connection) == latest_version
+        applied = connection.execute("SELECT COUNT(*) FROM schema_version").fetchone()[0]
+        assert applied == len(load_migrations())
+
+
+@pytest.mark.parametrize("query", [
+    "DELETE FROM todo_items WHERE list_id IN (SELECT id FROM todo_lists WHERE user_id = ?)",
+    "DELETE FROM todo_lists WHERE user_id = ?",
+    "DELETE FROM todo_items WHERE list_id = ?",
+    "SELECT * FROM todo_items WHERE list_id = ?",
+    "UPDATE todo_items SET context = 'x', completed = 0 WHERE list_id = ?",
+    USER_LISTS_QUERY,
+    USER_LIST_TASKS_QUERY,
+])
+def test_foreign_key_queries_use_indexes(query):
+    with get_pool().connection() as connection:
+        assert_no_table_scan(connection, query, (1,))
+
+
+def test_get_tasks_query_uses_indexes():
+    with get_pool().connection() as connection:
+        assert_no_table_scan(connection, TODO_TASKS_QUERY + " LIMIT ?", (0, 10))
+
+
+@pytest.mark.parametrize("filters", [
+    {"list_id": 1},
+    {"user_id": 1},
+    {"completed": 0},
+    {"min_id": 10, "max_id": 20},
+    {"user_id": 1, "completed": 0},
+    {"list_id": 1, "completed": 1, "min_id": 10},
+])
+def test_filtered_tasks_query_uses_indexes(filters):
+    query, parameters = build_tasks_query(0, **filters)
+    with get_pool().connection() as connection:
+        assert_no_table_scan(connection, query + " LIMIT ?", (*parameters, 10))
+
+
+# Filtering Tests ---------------------------------
+
+def test_filter_tasks(get_sample_user):
+    user_id = client.post("/users", json=get_sample_user).json()["user_id"]
+    list_ids = [int(client.post("/todo-lists", json={"user_id": user_id, "title": title}).json()["list_id"])
+                for title in ("Groceries", "Chores")]
+    tasks = [{"context": f"Task {i}", "completed": i % 2} for i in range(4)]
+    first_ids = client.post(f"/todo-items/{list_ids[0]}/bulk", json=tasks).json()["task_ids"]
+    second_ids = client.post(f"/todo-items/{list_ids[1]}/bulk", json=tasks).json()["task_ids"]
+
+    def task_ids(query):
+        response = client.get(f"/todo-items?{query}")
+        assert response.status_code == 200
+        return [task["task_id"] for task in response.json()["todo_tasks"]]
+
+    assert task_ids(f"list_id={list_ids[0]}") == first_ids
+    assert task_ids(f"user_id={user_id}") == first_ids + second_ids
+    assert task_ids(f"user_id={user_id}&completed=false") == [first_ids[0], first_ids[2], second_ids[0], second_ids[2]]
+    assert task_ids(f"list_id={list_ids[1]}&completed=true") == [second_ids[1], second_ids[3]]
+    assert task_ids(f"user_id={user_id}&min_id={first_ids[2]}&max_id={second_ids[1]}") == \
+        [first_ids[2], first_ids[3], second_ids[0], second_ids[1]]
+
+
+def test_filter_tasks_paginates_and_streams(get_sample_user):
+    user_id = client.post("/users", json=get_sample_user).json()["user_id"]
+    list_id = client.post("/todo-lists", json={"user_id": user_id, "title": "Groceries"}).json()["list_id"]
+    task_ids = client.post(f"/todo-items/{list_id}/bulk",
+                           json=[{"context": f"Task {i}", "completed": 0} for i in range(5)]).json()["task_ids"]
+
+    first_page = client.get(f"/todo-items?list_id={list_id}&limit=3").json()
+    second_page = client.get(f"/todo-items?list_id={list_id}&limit=3&after={first_page['next_page']}").json()
+    assert [task["task_id"] for task in first_page["todo_tasks"] + second_page["todo_tasks"]] == task_ids
+    assert second_page["next_page"] is None
+
+    streamed = client.get(f"/todo-items?list_id={list_id}&stream=1&min_id={task_ids[1]}")
+    assert [json.loads(line)["task_id"] for line in streamed.text.splitlines()] == task_ids[1:]
+
+
+# Nested Resource Tests ---------------------------------
+
+def test_user_lists_include_items(get_sample_user, get_sample_task):
+    user_id = client.post("/users", json=get_sample_user).json()["user_id"]
+    list_ids = [int(client.post("/todo-lists", json={"user_id": user_id, "title": title}).json()["list_id"])
+                for title in ("Groceries", "Chores", "Empty")]
+    first_ids = client.post(f"/todo-items/{list_ids[0]}/bulk", json=[get_sample_task] * 2).json()["task_ids"]
+    second_ids = client.post(f"/todo-items/{list_ids[1]}/bulk", json=[get_sample_task]).json()["task_ids"]
+
+    response = client.get(f"/users/{user_id}/todo-lists?include=items")
+    assert response.status_code == 200
+    todo_lists = response.json()["todo_lists"]
+    assert [todo_list["list_id"] for todo_list in todo_lists] == list_ids
+    assert [[task["task_id"] for task in todo_list["tasks"]] for todo_list in todo_lists] == \
+        [first_ids, second_ids, []]
+    assert todo_lists[0]["tasks"][0] == {"task_id": first_ids[0], "context": get_sample_task["context"],
+                                         "completed": int(get_sample_task["completed"])}
+
+
+def test_user_lists_without_include(get_sample_user):
+    user_id = client.post("/users", json=get_sample_user).json()["user_id"]
+    list_id = int(client.post("/todo-lists", json={"user_id": user_id, "title": "Groceries"}).json()["list_id"])
+
+    response = client.get(f"/users/{user_id}/todo-lists")
+    assert response.json() == {"user_id": user_id, "todo_lists": [{"list_id": list_id, "title": "Groceries"}]}
+
+
+def test_user_lists_read_from_one_snapshot(get_sample_user):
+    user_id = client.post("/users", json=get_sample_user).json()["user_id"]
+    client.post("/todo-lists", json={"user_id": user_id, "title": "Groceries"})
+
+    # Another client adds a list with a task between the lists query and the tasks query
+    def insert_list(statement):
+        if statement.startswith("SELECT todo_items.list_id"):
+            with sqlite3.connect(get_database_path()) as writer:
+                list_id = writer.execute("INSERT INTO todo_lists (user_id, title) VALUES (?, 'Late')",
+                                         (user_id,)).lastrowid
+                writer.execute("INSERT INTO todo_items (list_id, context, completed) VALUES (?, 'Late task', 0)",
+                               (list_id,))
+
+    connection = sqlite3.connect(get_database_path())
+    connection.set_trace_callback(insert_list)
+    try:
+        todo_lists = fetch_user_lists(connection.cursor(), user_id, include_items=True)
+    finally:
+        connection.close()
+    assert [(todo_list["title"], todo_list["tasks"]) for todo_list in todo_lists] == [("Groceries", [])]
+
+
+@pytest.mark.parametrize("path, status_code", [
+    ("/users/999999/todo-lists?include=items", 404),
+    ("/users/1/todo-lists?include=owners", 400),
+])
+def test_user_lists_errors(path, status_code):
+    assert client.get(path).status_code == status_code
+
+
+# Search Tests ---------------------------------
+
+def test_search_tasks_and_lists(get_sample_user):
+    word = f"zq{uuid.uuid4().hex[:8]}"
+    user_id = client.post("/users", json=get_sample_user).json()["user_id"]
+    list_id = int(client.post("/todo-lists", json={"user_id": user_id, "title": f"Trip {word}"}).json()["list_id"])
+    task_ids = client.post(f"/todo-items/{list_id}/bulk", json=[
+        {"context": f"Pack the {word} and the {word} charger", "completed": 0},
+        {"context": f"Book a {word} for the weekend", "completed": 0},
+        {"context": "Unrelated task", "completed": 0},
+    ]).json()["task_ids"]
+
+    response = client.get(f"/search?q={word}")
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert {(result["kind"], result["id"]) for result in results} == \
+        {("task", task_ids[0]), ("task", task_ids[1]), ("list", list_id)}
+    assert results == sorted(results, key=lambda result: result["rank"])
+    assert all(result["list_id"] == list_id for result in results)
+    assert f"<mark>{word}</mark>" in results[0]["snippet"]
+
+
+def test_search_paginates_and_follows_writes(get_sample_user):
+    word = f"zq{uuid.uuid4().hex[:8]}"
+    user_id = client.post("/users", json=get_sample_user).json()["user_id"]
+    list_id = client.post("/todo-lists", json={"user_id": user_id, "title": "Errands"}).json()["list_id"]
+    tasks = [{"context": f"{word} number {i}", "completed": 0} for i in range(3)]
+    task_ids = client.post(f"/todo-items/{list_id}/bulk", json=tasks).json()["task_ids"]
+
+    first_page = client.get(f"/search?q={word[:6]}*&limit=2").json()
+    second_page = client.get(f"/search?q={word[:6]}*&limit=2&after={first_page['next_page']}").json()
+    assert sorted(result["id"] for result in first_page["results"] + second_page["results"]) == task_ids
+    assert second_page["next_page"] is None
+
+    client.put(f"/todo-items/{list_id}", json={"context": "Renamed", "completed": 1})
+    assert client.get(f"/search?q={word}").json()["results"] == []
+    assert len(client.get("/search?q=Renamed").json()["results"]) >= 3
+
+    client.delete(f"/todo-lists/{list_id}")
+    assert {result["id"] for result in client.get("/search?q=Renamed").json()["results"]}.isdisjoint(task_ids)
+
+
+@pytest.mark.parametrize("text, expression", [
+    ("milk", '"milk"'),
+    ('buy "oat" milk -now', '"buy" "oat" "milk" "now"'),
+    ("mil*", '"mil"*'),
+])
+def test_build_match_expression(text, expression):
+    assert build_match_expression(text) == expression
+
+
+@pytest.mark.parametrize("query", ["q=", "q=%22%2A%28", "q=milk&after=bogus"])
+def test_search_rejects_bad_input(query):
+    assert client.get(f"/search?{query}").status_code == 400
+
+
+def test_search_indexes_match_content():
+    with get_pool().connection() as connection:
+        # integrity-check with rank 1 compares the index against the content table and raises on any drift
+        for index in ("todo_items_fts", "todo_lists_fts"):
+            connection.execute(f"INSERT INTO {index} ({index}, rank) VALUES ('integrity-check', 1)")
+        rebuild_search_indexes(connection)
+        for index in ("todo_items_fts", "todo_lists_fts"):
+            connection.execute(f"INSERT INTO {index} ({index}, rank) VALUES ('integrity-check', 1)")
+
+
+# Routing Tests ---------------------------------
+
+@pytest.mark.parametrize("path, location", [
+    ("/users/", "/users"),
+    ("/todo-lists/", "/todo-lists"),
+    ("/todo-items/", "/todo-items"),
+    ("/todo-lists/5/", "/todo-lists/5"),
+    ("/todo-items/?limit=2", "/todo-items?limit=2"),
+])
+def test_trailing_slash_redirects(path, location):
+    response = client.get(path, follow_redirects=False)
+    assert response.status_code == 301
+    assert response.headers["location"] == location
+    assert response.json() == {"message": "Moved Permanently", "location": location}
+
+
+@pytest.mark.parametrize("path, location", [
+    ("//evil.example/", "/evil.example"),
+    ("///evil.example//", "/evil.example"),
+    ("/\\evil.example/", "/evil.example"),
+    ("//", "/"),
+])
+def test_trailing_slash_redirect_stays_on_host(path, location):
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": path, "query_string": b"", "headers": []}
+    asyncio.run(TrailingSlashMiddleware(app)(scope, receive, send))
+    assert messages[0]["status"] == 301
+    assert (b"location", location.encode()) in messages[0]["headers"]
+
+
+# Serialization Tests ---------------------------------
+
+def test_serializers_produce_identical_json():
+    content = {"todo_tasks": [{"task_id": 1, "list_title": "Café ✓", "context": None, "completed": 0}],
+               "next_page": None}
+    stdlib_body = select_serializer("stdlib")(content)
+
+    assert json.loads(stdlib_body) == content
+    assert select_serializer("auto")(content) == stdlib_body
+
+
+def test_rows_serialized_with_response_keys(get_sample_user):
+    user_id = client.post("/users", json=get_sample_user).json()["user_id"]
+
+    response = client.get(f"/users/{user_id}")
+    assert response.json() == {"user": {"user_id": user_id, "username": get_sample_user["username"],
+                                        "mail": get_sample_user["email"]}}
+
+
+# Entity Cache Tests ---------------------------------
+
+def test_cache_hits_do_not_borrow_a_connection(get_sample_user):
+    user_id = client.post("/users", json=get_sample_user).json()["user_id"]
+    etag = client.get(f"/users/{user_id}").headers["etag"]
+    acquired = get_read_pool().stats()["acquired"]
+
+    assert client.get(f"/users/{user_id}").status_code == 200
+    assert client.get(f"/users/{user_id}", headers={"If-None-Match": etag}).status_code == 304
+    assert get_read_pool().stats()["acquired"] == acquired
+
+
+def test_user_cache_invalidated_by_update(get_sample_user):
+    user_id = client.post("/users", json=get_sample_user).json()["user_id"]
+    client.get(f"/users/{user_id}")
+    hits_before = client.get("/cache/stats").json()["entity_cache"]["hits"]
+
+    assert client.get(f"/users/{user_id}").json()["user"]["username"] == get_sample_user["username"]
+    assert client.get("/cache/stats").json()["entity_cache"]["hits"] == hits_before + 1
+
+    updated_user = dict(get_sample_user, username=f"renamed_{get_sample_user['username']}")
+    client.put(f"/users/{user_id}", json=updated_user)
+    assert client.get(f"/users/{user_id}").json()["user"]["username"] == updated_user["username"]
+
+
+def test_cache_invalidated_by_user_delete_cascade(get_sample_user, get_sample_list, get_sample_task):
+    user_id = client.post("/users", json=get_sample_user).json()["user_id"]
+    get_sample_list["user_id"] = user_id
+    list_id = client.post("/todo-lists", json=get_sample_list).json()["list_id"]
+    task_id = client.post(f"/todo-items/{list_id}/bulk", json=[get_sample_task]).json()["task_ids"][0]
+
+    assert client.get(f"/todo-lists/{list_id}").status_code == 200
+    assert client.get(f"/todo-items/{task_id}").status_code == 200
+
+    client.delete(f"/users/{user_id}")
+
+    assert client.get(f"/users/{user_id}").status_code == 404
+    assert client.get(f"/todo-lists/{list_id}").status_code == 404
+    assert client.get(f"/todo-items/{task_id}").status_code == 404
+
+
+def test_list_cache_invalidated_by_update(get_sample_user, get_sample_list):
+    user_id = client.post("/users", json=get_sample_user).json()["user_id"]
+    get_sample_list["user_id"] = user_id
+    list_id = client.post("/todo-lists", json=get_sample_list).json()["list_id"]
+    client.get(f"/todo-lists/{list_id}")
+
+    client.put(f"/todo-lists/{list_id}", json={"user_id": user_id, "title": "Renamed list"})
+    assert client.get(f"/todo-lists/{list_id}").json()["todo_list"]["title"] == "Renamed list"
+
+
+# Conditional Request Tests ---------------------------------
+
+def test_user_etag_returns_not_modified(get_sample_user):
+    user_id = client.post("/users", json=get_sample_user).json()["user_id"]
+    response = client.get(f"/users/{user_id}")
+    etag = response.headers["etag"]
+    assert "last-modified" in response.headers
+
+    not_modified = client.get(f"/users/{user_id}", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+    assert not_modified.headers["etag"] == etag
+
+    updated_user = dict(get_sample_user, username=f"renamed_{get_sample_user['username']}")
+    client.put(f"/users/{user_id}", json=updated_user)
+    modified = client.get(f"/users/{user_id}", headers={"If-None-Match": etag})
+    assert modified.status_code == 200
+    assert modified.headers["etag"] != etag
+
+
+def test_deleted_user_id_and_etag_not_reused(get_sample_user):
+    user_id = client.post("/users", json=get_sample_user).json()["user_id"]
+    etag = client.get(f"/users/{user_id}").headers["etag"]
+    client.delete(f"/users/{user_id}")
+
+    other_user = dict(get_sample_user, username=f"other_{get_sample_user['username']}")
+    other_id = client.post("/users", json=other_user).json()["user_id"]
+    assert other_id > user_id
+    response = client.get(f"/users/{other_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["user"]["username"] == other_user["username"]
+
+
+def test_list_etag_changes_with_owner(get_sample_user, get_sample_list):
+    user_id = client.post("/users", json=get_sample_user).json()["user_id"]
+    get_sample_list["user_id"] = user_id
+    list_id = client.post("/todo-lists", json=get_sample_list).json()["list_id"]
+    etag = client.get(f"/todo-lists/{list_id}").headers["etag"]
+
+    updated_user = dict(get_sample_user, username=f"renamed_{get_sample_user['username']}")
+    client.put(f"/users/{user_id}", json=updated_user)
+    assert client.get(f"/todo-lists/{list_id}", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_if_modified_since_returns_not_modified(get_sample_user, get_sample_list, get_sample_task):
+    user_id = client.post("/users", json=get_sample_user).json()["user_id"]
+    get_sample_list["user_id"] = user_id
+    list_id = client.post("/todo-lists", json=get_sample_list).json()["list_id"]
+    task_id = client.post(f"/todo-items/{list_id}/bulk", json=[get_sample_task]).json()["task_ids"][0]
+    last_modified = client.get(f"/todo-items/{task_id}").headers["last-modified"]
+
+    response = client.get(f"/todo-items/{task_id}", headers={"If-Modified-Since": last_modified})
+    assert response.status_code == 304
+    stale = client.get(f"/todo-items/{task_id}", headers={"If-Modified-Since": "Mon, 01 Jan 2001 00:00:00 GMT"})
+    assert stale.status_code == 200
+
+
+def test_collection_etag_tracks_writes(get_sample_user, get_sample_list, get_sample_task):
+    user_id = client.post("/users", json=get_sample_user).json()["user_id"]
+    get_sample_list["user_id"] = user_id
+    list_id = client.post("/todo-lists", json=get_sample_list).json()["list_id"]
+    etag = client.get("/todo-items?limit=5").headers["etag"]
+
+    assert client.get("/todo-items?limit=5", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/todo-items?limit=6", headers={"If-None-Match": etag}).status_code == 200
+
+    # Renaming a list changes the list titles embedded in the task listing
+    client.put(f"/todo-lists/{list_id}", json={"user_id": user_id, "title": "Renamed list"})
+    assert client.get("/todo-items?limit=5", headers={"If-None-Match": etag}).status_code == 200
+    etag = client.get("/todo-items?limit=5").headers["etag"]
+
+    client.post(f"/todo-items/{list_id}/bulk", json=[get_sample_task])
+    assert client.get("/todo-items?limit=5", headers={"If-None-Match": etag}).status_code == 200
+
+
+# Metrics Tests ---------------------------------
+
+def test_metrics_exposes_route_templates(get_sample_user):
+    user_id = client.post("/users", json=get_sample_user).json()["user_id"]
+    client.get(f"/users/{user_id}")
+    client.get("/no-such-endpoint")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'http_requests_total{method="GET",route="/users/{user_id}",status="200"}' in response.text
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/users/{user_id}",le="+Inf"}' in response.text
+    assert 'route="unmatched",status="404"' in response.text
+    assert 'db_statement_duration_seconds_count{operation="SELECT"}' in response.text
+    assert 'db_pool{database="my_test_todo.db",pool="read",stat=' in response.text
+
+
+# Replica Routing Tests ---------------------------------
+
+def test_reads_go_to_replica_unless_client_just_wrote(get_sample_user, tmp_path, monkeypatch):
+    replica = str(tmp_path / "replica.db")
+    with sqlite3.connect(get_database_path()) as primary, sqlite3.connect(replica) as copy:
+        primary.backup(copy)
+    monkeypatch.setenv("DATABASE_REPLICA_URLS", f"sqlite:///{replica}")
+
+    # Written after the copy, so only the primary has it
+    user_id = client.post("/users", json=get_sample_user).json()["user_id"]
+
+    assert client.get(f"/users/{user_id}").status_code == 404
+    response = client.get(f"/users/{user_id}", headers={"Cookie": f"{READ_YOUR_WRITES_COOKIE}={time.time()}"})
+    assert response.status_code == 200
+    # The primary's answer went into the entity cache, which serves the replica-routed reads from then on
+    expired = {"Cookie": f"{READ_YOUR_WRITES_COOKIE}={time.time() - 60}"}
+    assert client.get(f"/users/{user_id}", headers=expired).status_code == 200
+
+
+
+def test_login_reads_credentials_from_primary(get_sample_user, tmp_path, monkeypatch):
+    replica = str(tmp_path / "replica.db")
+    with sqlite3.connect(get_database_path()) as primary, sqlite3.connect(replica) as copy:
+        primary.backup(copy)
+    monkeypatch.setenv("DATABASE_REPLICA_URLS", f"sqlite:///{replica}")
+
+    # Signed up after the copy, and logging in without a recent write that would route the read to the primary
+    user_id = client.post("/users", json=get_sample_user).json()["user_id"]
+    expired = {"Cookie": f"{READ_YOUR_WRITES_COOKIE}={time.time() - 60}"}
+    response = client.post("/login", json={"username": get_sample_user["username"],
+                                           "password": get_sample_user["password"]}, headers=expired)
+    assert response.status_code == 200
+    assert response.json()["user_id"] == user_id
+
+# Startup Tests ---------------------------------
+
+def test_ready_only_after_warm_up(get_sample_user):
+    user_id = client.post("/users", json=get_sample_user).json()["user_id"]
+    # The module's client never runs the lifespan, so this worker has not warmed up
+    assert client.get("/readyz").status_code == 503
+
+    entity_cache.clear()
+    with TestClient(app) as started:
+        response = started.get("/readyz")
+        assert response.status_code == 200
+        warmup = response.json()["warmup"]
+        assert warmup["schema_version"] == len(load_migrations())
+        assert warmup["connections"] > 0
+        assert warmup["cached_entities"] > 0
+        assert entity_cache.get("user", user_id) is not None
+    entity_cache.clear()
+
+    assert client.get("/readyz").status_code == 503
+
+
+# Health Check Tests ---------------------------------
+
+def test_health_endpoints():
+    database_health.reset()
+    response = client.get("/healthz")
+    assert response.status_code == 200
+    database = response.json()["database"]
+    assert database["schema_version"] == len(load_migrations())
+    assert "probe_ms" in database
+    # Answered from the cache until HEALTH_CHECK_CACHE_TTL runs out
+    assert client.get("/healthz").json()["database"] == database
+
+    assert client.get("/livez").json() == {"status": "alive"}
+
+
+def test_not_ready_while_database_check_fails(monkeypatch):
+    monkeypatch.setattr(database_health, "_probe", lambda: {"status": "error", "error": "unreachable"})
+    database_health.reset()
+    try:
+        with TestClient(app) as started:
+            response = started.get("/readyz")
+            assert response.status_code == 503
+            assert response.json()["database"]["error"] == "unreachable"
+            assert started.get("/healthz").status_code == 503
+            assert started.get("/livez").status_code == 200
+    finally:
+        database_health.reset()
+        entity_cache.clear()
@@ -0,0 +1,48 @@
+import sqlite3
+from app.metrics import Counter, GaugeCallback, Histogram, InstrumentedConnection, Registry, statement_operation
+from app import metrics
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("latency_seconds", "Latency.", ("route",), buckets=(0.1, 1.0))
+    histogram.observe(("/a",), 0.05)
+    histogram.observe(("/a",), 0.5)
+    histogram.observe(("/a",), 5)
+
+    lines = histogram.collect()
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{route="/a",le="1.0"} 2' in lines
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 'latency_seconds_count{route="/a"} 3' in lines
+    assert 'latency_seconds_sum{route="/a"} 5.55' in lines
+
+
+def test_registry_renders_help_type_and_escaped_labels():
+    registry = Registry()
+    counter = registry.register(Counter("requests_total", "Requests.", ("path",)))
+    registry.register(GaugeCallback("pool_size", "Pool size.", lambda: [({"pool": "read"}, 3)]))
+    counter.inc(('/a"b',))
+    counter.inc(('/a"b',), 2)
+
+    text = registry.render()
+    assert "# HELP requests_total Requests.\n# TYPE requests_total counter\n" in text
+    assert 'requests_total{path="/a\\"b"} 3\n' in text
+    assert '# TYPE pool_size gauge\npool_size{pool="read"} 3\n' in text
+
+
+def test_instrumented_cursor_records_statements_and_rows():
+    connection = sqlite3.connect(":memory:", factory=InstrumentedConnection)
+    count_before = metrics.db_rows_returned._series.get(("SELECT",), [None, 0, 0])[2]
+    connection.execute("CREATE TABLE t (x INTEGER)")
+    connection.executemany("INSERT INTO t VALUES (?)", [(1,), (2,), (3,)])
+
+    assert connection.execute("SELECT x FROM t").fetchall() == [(1,), (2,), (3,)]
+    assert metrics.db_statement_duration._series[("INSERT",)][2] >= 1
+    assert metrics.db_rows_returned._series[("SELECT",)][2] == count_before + 1
+    connection.close()
+
+
+def test_statement_operation():
+    assert statement_operation("  select * from t") == "SELECT"
+    assert statement_operation("WITH x AS (SELECT 1) SELECT * FROM x") == "WITH"
+    assert statement_operation("") == ""
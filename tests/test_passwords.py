@@ -0,0 +1,69 @@
+import asyncio
+import hashlib
+import pytest
+from app.passwords import (Pbkdf2Hasher, ScryptHasher, check_password, check_unknown_user, dummy_hash, get_hasher,
+                           hash_password, identify_hasher, LEGACY_HASHER)
+
+# Cheap parameters so the tests stay fast; the format and checks are the same as in production
+scrypt = ScryptHasher(n=1024, r=8, p=1)
+pbkdf2 = Pbkdf2Hasher(iterations=1000)
+
+
+@pytest.mark.parametrize("hasher", [scrypt, pbkdf2])
+def test_hash_round_trip(hasher):
+    encoded = hasher.hash("s3cret")
+    assert encoded.startswith(f"{hasher.algorithm}$")
+    assert hasher.verify("s3cret", encoded)
+    assert not hasher.verify("wrong", encoded)
+
+
+def test_hashes_are_salted():
+    assert scrypt.hash("s3cret") != scrypt.hash("s3cret")
+
+
+def test_hash_records_its_parameters():
+    encoded = scrypt.hash("s3cret")
+    assert ScryptHasher(n=2048, r=8, p=1).verify("s3cret", encoded)
+    assert ScryptHasher(n=2048, r=8, p=1).needs_rehash(encoded)
+    assert not scrypt.needs_rehash(encoded)
+
+
+def test_identify_hasher():
+    assert identify_hasher(hashlib.sha256(b"s3cret").hexdigest()) is LEGACY_HASHER
+    assert identify_hasher(get_hasher("scrypt").hash("s3cret")) is get_hasher("scrypt")
+    assert identify_hasher("not a hash") is None
+
+
+def test_legacy_hash_is_upgraded():
+    legacy = hashlib.sha256(b"s3cret").hexdigest()
+    valid, new_hash = check_password("s3cret", legacy, hasher=scrypt)
+    assert valid
+    assert scrypt.verify("s3cret", new_hash)
+
+    assert check_password("wrong", legacy, hasher=scrypt) == (False, None)
+
+
+def test_current_hash_is_kept():
+    assert check_password("s3cret", scrypt.hash("s3cret"), hasher=scrypt) == (True, None)
+    valid, new_hash = check_password("s3cret", pbkdf2.hash("s3cret"), hasher=scrypt)
+    assert valid and new_hash.startswith("scrypt$")
+
+
+@pytest.mark.parametrize("encoded", ["", None, "scrypt$broken", "pbkdf2_sha256$1000$!!$!!"])
+def test_malformed_hashes_do_not_verify(encoded):
+    assert check_password("s3cret", encoded) == (False, None)
+
+
+@pytest.mark.parametrize("hasher", [scrypt, pbkdf2])
+def test_unknown_user_is_checked_like_a_real_one(hasher, monkeypatch):
+    verified = []
+    monkeypatch.setattr(hasher, "verify", lambda password, encoded: verified.append(encoded) or True)
+    assert check_unknown_user("s3cret", hasher=hasher) == (False, None)
+    # Against a hash made with the hasher's own parameters, the same one every time
+    assert verified == [dummy_hash(hasher)]
+    assert not hasher.needs_rehash(verified[0])
+
+
+def test_hash_password_runs_off_the_event_loop():
+    encoded = asyncio.run(hash_password("s3cret"))
+    assert get_hasher().verify("s3cret", encoded)
@@ -0,0 +1,136 @@
+import os
+import sqlite3
+import pytest
+from app import postgres
+from app.database_utils import connect, insert_returning_ids, streaming_cursor
+from app.migrations import load_migrations, migrate, MIGRATIONS_DIR, POSTGRES_MIGRATIONS_DIR
+from app.routers.todo_items import insert_task, update_list_tasks
+from app.routers.todo_lists import fetch_user_lists, insert_todo_list
+from app.routers.users import insert_user
+from app import search_index
+from app.search_index import build_tsquery
+from app.transactions import is_busy_error, run_write_transaction
+
+# Integration tests run against the database in TEST_POSTGRES_URL, which they empty first
+TEST_POSTGRES_URL = os.getenv("TEST_POSTGRES_URL")
+
+requires_postgres = pytest.mark.skipif(postgres.psycopg2 is None or not TEST_POSTGRES_URL,
+                                       reason="needs psycopg2 and TEST_POSTGRES_URL")
+
+
+def test_translate_sql_placeholders():
+    assert postgres.translate_sql("SELECT id FROM users WHERE id = ? AND email = ?") == \
+        "SELECT id FROM users WHERE id = %s AND email = %s"
+    assert postgres.translate_sql("SELECT '?' , 'x%' WHERE a LIKE ? || '%'") == \
+        "SELECT '?' , 'x%%' WHERE a LIKE %s || '%%'"
+    assert postgres.translate_sql("BEGIN IMMEDIATE") == "BEGIN"
+
+
+def test_parameters_are_bound_like_sqlite3():
+    assert postgres.adapt_parameters([True, False, 3, "text", None]) == (1, 0, 3, "text", None)
+
+
+def test_postgres_urls_select_the_backend():
+    assert postgres.is_postgres_url("postgresql://todo@localhost/todo")
+    assert postgres.is_postgres_url("postgres://todo@localhost/todo")
+    assert not postgres.is_postgres_url("./data/my_todo.db")
+
+
+def test_migrations_have_the_same_versions_on_both_backends():
+    assert [version for version, _, _ in load_migrations(MIGRATIONS_DIR)] == \
+        [version for version, _, _ in load_migrations(POSTGRES_MIGRATIONS_DIR)]
+
+
+def test_build_tsquery():
+    assert build_tsquery("buy milk*") == "'buy' & 'milk':*"
+
+
+def test_search_index_rebuild_skipped_on_postgres(monkeypatch, capsys):
+    monkeypatch.setattr("sys.argv", ["search_index", "--database", "postgresql://localhost/todo"])
+    search_index.main()
+    assert "Nothing to rebuild" in capsys.readouterr().out
+
+
+@pytest.fixture
+def connection():
+    connection = connect(TEST_POSTGRES_URL)
+    connection.execute("DROP TABLE IF EXISTS schema_version, collection_versions, todo_items, todo_lists, users")
+    connection.execute("DROP FUNCTION IF EXISTS bump_collection_version")
+    migrate(connection)
+    yield connection
+    connection.close()
+
+
+@requires_postgres
+def test_migrate_is_idempotent(connection):
+    version = migrate(connection)
+    assert version == load_migrations(POSTGRES_MIGRATIONS_DIR)[-1][0]
+    assert migrate(connection) == version
+
+
+@requires_postgres
+def test_write_functions_run_unchanged(connection):
+    user_id = run_write_transaction(connection, insert_user, ("pg_user", "pg@example.com", "hash"))
+    list_id = run_write_transaction(connection, insert_todo_list, (user_id, "Groceries"))
+    task_id = run_write_transaction(connection, insert_task, (list_id, "Buy milk", False))
+
+    cursor = connection.cursor()
+    assert fetch_user_lists(cursor, user_id, include_items=True) == \
+        [{"list_id": list_id, "title": "Groceries", "tasks": [{"task_id": task_id, "context": "Buy milk",
+                                                                "completed": 0}]}]
+    assert run_write_transaction(connection, update_list_tasks, (list_id, "Buy oat milk", True)) == [task_id]
+    updated_at = cursor.execute("SELECT updated_at FROM todo_items WHERE id = ?", (task_id,)).fetchone()[0]
+    assert len(updated_at) == len("2026-01-01 00:00:00")
+
+
+@requires_postgres
+def test_bulk_insert_returns_ids_in_order(connection):
+    user_id = run_write_transaction(connection, insert_user, ("pg_user", "pg@example.com", "hash"))
+    list_id = run_write_transaction(connection, insert_todo_list, (user_id, "Bulk"))
+
+    def insert(cursor):
+        return insert_returning_ids(cursor, "INSERT INTO todo_items (list_id, context, completed, updated_at) "
+                                            "VALUES (?, ?, ?, CURRENT_TIMESTAMP)",
+                                    [(list_id, f"task {n}", False) for n in range(50)])
+
+    task_ids = run_write_transaction(connection, insert, ())
+    rows = connection.execute("SELECT id, context FROM todo_items WHERE list_id = ? ORDER BY id", (list_id,))
+    assert [(task_id, f"task {n}") for n, task_id in enumerate(task_ids)] == rows.fetchall()
+
+
+@requires_postgres
+def test_errors_are_raised_as_sqlite3_errors(connection):
+    with pytest.raises(sqlite3.IntegrityError):
+        connection.execute("INSERT INTO todo_lists (user_id, title) VALUES (?, ?)", (999999, "Orphan"))
+
+    # lock_not_available is replayed by the transaction manager like SQLITE_BUSY
+    connection.execute("SET lock_timeout = 1")
+    other = connect(TEST_POSTGRES_URL)
+    try:
+        other.execute("BEGIN")
+        other.execute("LOCK TABLE users")
+        with pytest.raises(sqlite3.OperationalError) as raised:
+            connection.execute("SELECT id FROM users")
+        assert is_busy_error(raised.value)
+    finally:
+        other.rollback()
+        other.close()
+
+
+@requires_postgres
+def test_streaming_cursor_fetches_from_the_server(connection):
+    user_id = run_write_transaction(connection, insert_user, ("pg_user", "pg@example.com", "hash"))
+    list_id = run_write_transaction(connection, insert_todo_list, (user_id, "Stream"))
+    for n in range(5):
+        run_write_transaction(connection, insert_task, (list_id, f"task {n}", False))
+
+    cursor = streaming_cursor(connection).execute("SELECT context FROM todo_items WHERE list_id = ? ORDER BY id",
+                                                  (list_id,))
+    # A named cursor is a server-side cursor: execute() only declares it
+    assert cursor._cursor.name is not None
+    assert cursor.fetchmany(2) == [("task 0",), ("task 1",)]
+    assert cursor.fetchmany(10) == [("task 2",), ("task 3",), ("task 4",)]
+    connection.rollback()
+    # The connection is back in autocommit mode for the next borrower
+    assert not connection.in_transaction
+    assert run_write_transaction(connection, insert_todo_list, (user_id, "After")) > list_id
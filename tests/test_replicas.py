@@ -0,0 +1,92 @@
+import math
+import sqlite3
+import time
+import pytest
+from datetime import datetime, timedelta, timezone
+from app.connection_pool import PoolTimeoutError
+from app.database_utils import close_pools, collection_watermark, connect, get_read_pool, initialize_db
+from app.replicas import ReplicaSet, measure_lag
+
+NOW = datetime(2026, 1, 1, 12, 0, 0, tzinfo=timezone.utc)
+
+
+def make_replica_set(watermarks: dict, max_lag: float = 5) -> ReplicaSet:
+    def watermark(database):
+        value = watermarks[database]
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+    return ReplicaSet("primary", ["replica-1", "replica-2"], watermark, max_lag=max_lag, check_interval=60)
+
+
+def test_measure_lag():
+    assert measure_lag(10, 10, NOW - timedelta(hours=1), NOW) == 0.0
+    assert measure_lag(10, 8, NOW - timedelta(seconds=3), NOW) == 3.0
+    assert measure_lag(10, 0, None, NOW) == math.inf
+
+
+def test_reads_rotate_over_caught_up_replicas():
+    now = datetime.now(timezone.utc)
+    replica_set = make_replica_set({"primary": (5, now), "replica-1": (5, now), "replica-2": (5, now)})
+    replica_set.refresh()
+
+    assert [replica_set.choose() for _ in range(4)] == ["replica-1", "replica-2", "replica-1", "replica-2"]
+    assert replica_set.choose(primary_only=True) == "primary"
+    assert replica_set.stats()["replica_reads"] == 4
+
+
+def test_lagging_and_unreachable_replicas_are_skipped():
+    now = datetime.now(timezone.utc)
+    replica_set = make_replica_set({"primary": (9, now), "replica-1": (7, now - timedelta(minutes=5)),
+                                    "replica-2": ConnectionError("down")})
+    replica_set.refresh()
+
+    assert replica_set.choose() == "primary"
+    assert replica_set.stats()["fallbacks"] == 1
+    assert replica_set.stats()["health_check_failures"] == 1
+
+
+def test_health_is_checked_once_per_interval():
+    calls = []
+    now = datetime.now(timezone.utc)
+
+    def watermark(database):
+        calls.append(database)
+        return 1, now
+
+    replica_set = ReplicaSet("primary", ["replica"], watermark, max_lag=5, check_interval=60)
+    assert replica_set.refresh_due()
+    replica_set.refresh()
+    replica_set.refresh()
+
+    assert not replica_set.refresh_due()
+    assert calls == ["primary", "replica"]
+
+
+def test_replica_connections_leave_journal_mode_alone(tmp_path):
+    replica = str(tmp_path / "replica.db")
+    with sqlite3.connect(replica) as setup:
+        setup.execute("CREATE TABLE collection_versions (name TEXT, revision INTEGER, updated_at TEXT)")
+
+    connection = connect(replica, read_only=True)
+    try:
+        assert connection.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+    finally:
+        connection.close()
+
+
+def test_watermark_gives_up_on_an_exhausted_pool(tmp_path):
+    database = str(tmp_path / "primary.db")
+    initialize_db(database)
+    pool = get_read_pool(database)
+    held = [pool.acquire() for _ in range(pool.size)]
+    try:
+        started = time.monotonic()
+        with pytest.raises(PoolTimeoutError):
+            collection_watermark(database)
+        assert time.monotonic() - started < pool.timeout
+    finally:
+        for connection in held:
+            pool.release(connection)
+        close_pools()
@@ -0,0 +1,33 @@
+import argparse
+import importlib.util
+from app.serve import default_workers, server_config, worker_environment
+
+
+def make_args(**overrides) -> argparse.Namespace:
+    values = {"host": "127.0.0.1", "port": 8000, "workers": 3, "max_requests": 1000, "max_requests_jitter": 100,
+              "graceful_shutdown_timeout": 30, "backlog": 2048, "access_log": False, "log_level": "info"}
+    return argparse.Namespace(**{**values, **overrides})
+
+
+def test_server_config():
+    config = server_config(make_args())
+    assert config["workers"] == 3
+    assert config["limit_max_requests"] == 1000
+    assert config["timeout_graceful_shutdown"] == 30
+    assert config["loop"] == ("uvloop" if importlib.util.find_spec("uvloop") else "asyncio")
+    assert config["http"] == ("httptools" if importlib.util.find_spec("httptools") else "h11")
+
+
+def test_recycling_can_be_disabled():
+    config = server_config(make_args(max_requests=0))
+    assert config["limit_max_requests"] is None
+    assert "limit_max_requests_jitter" not in config
+
+
+def test_default_workers_follow_available_cores():
+    assert default_workers() >= 1
+
+
+def test_entity_cache_off_with_several_workers():
+    assert worker_environment(4) == {"ENTITY_CACHE_MAX_ENTRIES": "0"}
+    assert worker_environment(1) == {}
@@ -0,0 +1,70 @@
+import asyncio
+import json
+import sqlite3
+from types import SimpleNamespace
+import pytest
+from app import metrics
+from app.async_database import run_in_db_executor
+from app.metrics import InstrumentedConnection
+from app.slow_queries import SlowQueryLog, current_route, current_scope, redact_parameters
+
+
+@pytest.fixture
+def slow_log(tmp_path, monkeypatch):
+    log = SlowQueryLog(str(tmp_path / "slow.jsonl"), threshold=0)
+    monkeypatch.setattr(metrics, "slow_query_log", log)
+    connection = sqlite3.connect(":memory:", factory=InstrumentedConnection)
+    connection.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, email TEXT)")
+    connection.execute("CREATE INDEX idx_users_email ON users (email)")
+    yield log, connection
+    connection.close()
+
+
+def read_entries(log: SlowQueryLog) -> list:
+    with open(log.path) as lines:
+        return [json.loads(line) for line in lines]
+
+
+def test_redacts_text_but_keeps_ids():
+    assert redact_parameters((7, "someone@example.com", None, b"\x00\x01", 1.5)) == \
+        [7, "<str:19>", None, "<bytes:2>", "<float>"]
+    assert redact_parameters({"id": 3, "email": "a@b.c"}) == {"id": 3, "email": "<str:5>"}
+
+
+def test_slow_statement_is_logged_with_plan_and_route(slow_log):
+    log, connection = slow_log
+    token = current_scope.set({"route": SimpleNamespace(path="/users/{user_id}")})
+    try:
+        connection.execute("SELECT id FROM users WHERE email = ?", ("someone@example.com",)).fetchall()
+    finally:
+        current_scope.reset(token)
+
+    entry = read_entries(log)[-1]
+    assert entry["route"] == "/users/{user_id}"
+    assert entry["operation"] == "SELECT"
+    assert entry["parameters"] == ["<str:19>"]
+    assert "someone@example.com" not in json.dumps(entry)
+    assert any("idx_users_email" in step["detail"] for step in entry["plan"])
+
+
+def test_each_statement_is_logged_once(slow_log):
+    log, connection = slow_log
+    connection.executemany("INSERT INTO users (email) VALUES (?)", [("a",), ("b",), ("c",)])
+    cursor = connection.execute("SELECT id FROM users")
+    cursor.fetchone()
+    cursor.fetchall()
+
+    entries = read_entries(log)
+    assert [entry["operation"] for entry in entries[-2:]] == ["INSERT", "SELECT"]
+    assert entries[-2]["parameters"] == ["<str:1>"]
+
+
+def test_route_follows_requests_into_the_db_executor():
+    scope = {"route": SimpleNamespace(path="/todo-items")}
+
+    async def request():
+        current_scope.set(scope)
+        return await run_in_db_executor(current_route)
+
+    assert asyncio.run(request()) == "/todo-items"
+    assert current_route() is None
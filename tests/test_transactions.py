@@ -0,0 +1,134 @@
+import asyncio
+import sqlite3
+import threading
+import pytest
+from app.connection_pool import ConnectionPool
+from app.database_utils import connect
+from app.transactions import TransactionManager, WritePipeline, is_busy_error
+
+
+@pytest.fixture
+def database(tmp_path):
+    database = str(tmp_path / "transactions_test.db")
+    connection = sqlite3.connect(database)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT UNIQUE)")
+    connection.close()
+    return database
+
+
+@pytest.fixture
+def manager(database):
+    # busy_timeout 0 makes lock conflicts surface immediately as SQLITE_BUSY
+    pool = ConnectionPool(lambda: connect(database, pragmas={"busy_timeout": 0}), size=2, timeout=1)
+    yield TransactionManager(pool, retries=3, backoff=0.01, max_backoff=0.05)
+    pool.close()
+
+
+@pytest.fixture
+def pipeline(database):
+    pool = ConnectionPool(lambda: connect(database, pragmas={"busy_timeout": 0}), size=2, timeout=1)
+    yield WritePipeline(pool, retries=3, backoff=0.01, max_backoff=0.05, max_batch_size=16, max_latency=0.01)
+    pool.close()
+
+
+def count_items(database) -> int:
+    with sqlite3.connect(database) as connection:
+        return connection.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+
+
+def insert_items(cursor, *names):
+    for name in names:
+        cursor.execute("INSERT INTO items (name) VALUES (?)", (name,))
+    return cursor.lastrowid
+
+
+def test_write_commits_and_returns_result(manager, database):
+    assert asyncio.run(manager.write(insert_items, "a", "b")) == 2
+    assert count_items(database) == 2
+    assert manager.stats()["commits"] == 1
+
+
+def test_failed_write_is_rolled_back(manager, database):
+    with pytest.raises(sqlite3.IntegrityError):
+        asyncio.run(manager.write(insert_items, "a", "a"))
+
+    assert count_items(database) == 0
+    assert manager.stats()["rollbacks"] == 1
+    assert manager.stats()["busy_retries"] == 0
+
+
+def test_busy_write_is_retried(manager, database):
+    blocker = sqlite3.connect(database, check_same_thread=False)
+    blocker.execute("BEGIN IMMEDIATE")
+    threading.Timer(0.02, blocker.commit).start()
+    # Enough attempts that the jittered backoff always outlasts the blocker
+    manager.retries = 20
+
+    assert asyncio.run(manager.write(insert_items, "a")) == 1
+    assert manager.stats()["busy_retries"] >= 1
+    assert count_items(database) == 1
+    blocker.close()
+
+
+def test_busy_write_gives_up_after_retries(manager, database):
+    blocker = sqlite3.connect(database)
+    blocker.execute("BEGIN IMMEDIATE")
+    try:
+        with pytest.raises(sqlite3.OperationalError) as error:
+            asyncio.run(manager.write(insert_items, "a"))
+        assert is_busy_error(error.value)
+        assert manager.stats()["busy_retries"] == 3
+    finally:
+        blocker.rollback()
+        blocker.close()
+
+
+def test_read_only_connection_rejects_writes(database):
+    connection = connect(database, read_only=True)
+    try:
+        assert connection.execute("SELECT COUNT(*) FROM items").fetchone() == (0,)
+        with pytest.raises(sqlite3.OperationalError):
+            connection.execute("INSERT INTO items (name) VALUES ('a')")
+    finally:
+        connection.close()
+
+
+def test_pipeline_group_commits_concurrent_writes(pipeline, database):
+    async def scenario():
+        results = await asyncio.gather(*(pipeline.write(insert_items, f"item {i}") for i in range(40)))
+        await pipeline.close()
+        return results
+
+    assert sorted(asyncio.run(scenario())) == list(range(1, 41))
+    assert count_items(database) == 40
+    stats = pipeline.stats()
+    assert stats["batched_writes"] == 40
+    assert stats["largest_batch"] <= 16
+    assert stats["batches"] == stats["commits"] < 40
+
+
+def test_pipeline_isolates_failed_write(pipeline, database):
+    async def scenario():
+        return await asyncio.gather(pipeline.write(insert_items, "a"), pipeline.write(insert_items, "b", "a"),
+                                    pipeline.write(insert_items, "c"), return_exceptions=True)
+
+    first, failed, last = asyncio.run(scenario())
+    assert isinstance(failed, sqlite3.IntegrityError)
+    assert (first, last) == (1, 2)
+    # The failed write's own insert of "b" was rolled back with its savepoint
+    with sqlite3.connect(database) as connection:
+        assert [row[0] for row in connection.execute("SELECT name FROM items ORDER BY id")] == ["a", "c"]
+
+
+def test_pipeline_retries_busy_batch(pipeline, database):
+    blocker = sqlite3.connect(database, check_same_thread=False)
+    blocker.execute("BEGIN IMMEDIATE")
+    threading.Timer(0.02, blocker.commit).start()
+
+    async def scenario():
+        return await asyncio.gather(*(pipeline.write(insert_items, f"item {i}") for i in range(5)))
+
+    assert sorted(asyncio.run(scenario())) == [1, 2, 3, 4, 5]
+    assert pipeline.stats()["busy_retries"] >= 1
+    blocker.close()